@@ -29,12 +29,173 @@ STARTER CODE (Extended Below)
 -----------------------------------------
 """
 
+import argparse
+import asyncio
+import bisect
+import contextlib
+import csv
+import functools
+import gc
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import math
+import mmap
+import operator
+import os
+import pickle
 import random
+import shutil
+import sqlite3
+import statistics
+import struct
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only the vectorized engine needs it
+    np = None
+
+# -----------------------------
+# Combat Events and Sinks
+# -----------------------------
+# Instead of printing, combat code reports typed events to the character's sink:
+#   "attack", "heal", "regen", "ability_used", "defeated", "stats", "message" and "battle_end".
+# An event carries raw values only; turning it into text is left to the sink, so a headless run
+# with a NullSink never formats a string. health/max_health belong to the actor and target_health
+# is the target's health after the event; a heal has no target and carries the healer's health
+# from before it instead. Ability events and messages bring their own template.
+Event = namedtuple("Event", "kind actor target ability amount health max_health target_health template")
+
+class EventSink:
+    """
+    I am the interface every sink implements. enabled=False lets emitters skip building events.
+    """
+    enabled = True
+
+    def emit(self, event):
+        raise NotImplementedError
+
+    def begin_turn(self, turn):
+        """
+        I am told by battle() that turn number `turn` is starting. Most sinks don't care.
+        """
+        pass
+
+    def flush(self):
+        pass
+
+class NullSink(EventSink):
+    """
+    I drop every event without looking at it.
+    """
+    enabled = False
+
+    def emit(self, event):
+        pass
+
+class ConsoleSink(EventSink):
+    """
+    I render events as the game's classic text, written to a stream (sys.stdout by default).
+    """
+    TEMPLATES = {
+        "attack": "{actor} attacks {target} for {amount} damage!",
+        "heal": "{actor} heals for {amount}. Current health: {health}/{max_health}",
+        "regen": "{actor} regenerates {amount} health! (Health: {health}/{max_health})",
+        "defeated": "{actor} has been defeated!",
+        "stats": "{actor}'s Stats - Health: {health}/{max_health}, Attack Power: {amount}"
+    }
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def render(self, event):
+        template = event.template or self.TEMPLATES[event.kind]
+        return template.format(actor=event.actor, target=event.target, amount=event.amount,
+                               health=event.health, max_health=event.max_health)
+
+    def emit(self, event):
+        print(self.render(event), file=self.stream or sys.stdout)
+
+class JsonlSink(EventSink):
+    """
+    I collect events in memory and write them to a file as JSON lines, buffer_size events at a time.
+    Templates are not written; the JSON fields carry the same information as data.
+    """
+    FIELDS = [field for field in Event._fields if field != "template"]
+
+    def __init__(self, path, buffer_size=10_000):
+        self.file = open(path, "a", encoding="utf-8")
+        self.buffer_size = buffer_size
+        self.buffer = []
+
+    def emit(self, event):
+        self.buffer.append(event)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            fields = self.FIELDS
+            self.file.write("".join(json.dumps(dict(zip(fields, event))) + "\n" for event in self.buffer))
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+CONSOLE_SINK = ConsoleSink()
+NULL_SINK = NullSink()
+
+# -----------------------------
+# Balance Table
+# -----------------------------
+# Every class's starting stats, looked up by class name when a character is created. Ability bonus
+# ranges live in ABILITY_EFFECTS further below. load_balance() replaces both with a tuned table.
+CLASS_STATS = {
+    "Warrior": {"health": 140, "attack_power": 25},
+    "Mage": {"health": 100, "attack_power": 35},
+    "Archer": {"health": 110, "attack_power": 20},
+    "Paladin": {"health": 130, "attack_power": 22},
+    "Barbarian": {"health": 160, "attack_power": 30},
+    "Bard": {"health": 100, "attack_power": 18},
+    "Cleric": {"health": 120, "attack_power": 15},
+    "Druid": {"health": 115, "attack_power": 17},
+    "Fighter": {"health": 150, "attack_power": 28},
+    "Monk": {"health": 110, "attack_power": 24},
+    "Ranger": {"health": 105, "attack_power": 22},
+    "Rogue": {"health": 95, "attack_power": 24},
+    "Sorcerer": {"health": 90, "attack_power": 38},
+    "Warlock": {"health": 95, "attack_power": 36},
+    "Wizard": {"health": 85, "attack_power": 40},
+    "EvilWizard": {"health": 150, "attack_power": 15},
+    "Minion": {"health": 30, "attack_power": 8}
+}
 
 # -----------------------------
 # Base Character Class
 # -----------------------------
 class Character:
+    # I use __slots__ instead of a per-instance __dict__ so large populations of fighters stay small.
+    # Subclasses declare their own (usually empty) __slots__ for the same reason.
+    __slots__ = ("name", "health", "attack_power", "max_health", "sink", "rng", "effects")
+
     def __init__(self, name, health, attack_power):
         """
         I initialize a character with a name, health, attack power, and set max_health.
@@ -43,6 +204,12 @@ class Character:
         self.health = health
         self.attack_power = attack_power
         self.max_health = health
+        self.sink = CONSOLE_SINK
+        # Every roll goes through self.rng. The random module itself is the default, so plain play
+        # keeps using the global generator; a random.Random instance gives a private stream.
+        self.rng = random
+        # A StatusEngine while status effects are on (see Status Effects), otherwise None.
+        self.effects = None
 
     def attack(self, opponent):
         """
@@ -50,11 +217,13 @@ class Character:
         """
         lower = max(0, self.attack_power - 5)
         upper = self.attack_power + 5
-        damage = random.randint(lower, upper)
+        damage = self.rng.randint(lower, upper)
+        if self.effects is not None:
+            damage = self.effects.adjust_attack(self, opponent, damage)
         opponent.health = max(0, opponent.health - damage)
-        print(f"{self.name} attacks {opponent.name} for {damage} damage!")
+        self.emit("attack", target=opponent, amount=damage)
         if opponent.health == 0:
-            print(f"{opponent.name} has been defeated!")
+            opponent.emit("defeated")
         return damage
 
     def heal(self, amount):
@@ -62,32 +231,56 @@ class Character:
         I heal myself by a given amount without exceeding my maximum health.
         """
         if amount <= 0:
-            print("Heal amount must be positive.")
+            self.emit("message", "Heal amount must be positive.")
             return
+        before = self.health
         self.health = min(self.max_health, self.health + amount)
-        print(f"{self.name} heals for {amount}. Current health: {self.health}/{self.max_health}")
+        self.emit("heal", amount=amount, target_health=before)
 
     def display_stats(self):
         """
         I display my current stats: health and attack power.
         """
-        print(f"{self.name}'s Stats - Health: {self.health}/{self.max_health}, Attack Power: {self.attack_power}")
+        self.emit("stats", amount=self.attack_power)
 
     def random_bonus(self, min_bonus, max_bonus):
         """
         I generate a random bonus value between min_bonus and max_bonus.
         """
-        return random.randint(min_bonus, max_bonus)
+        return self.rng.randint(min_bonus, max_bonus)
+
+    def bonus_roll(self, ability):
+        """
+        I roll the random bonus of one of my abilities, using its range from the ability registry.
+        """
+        return self.random_bonus(*ABILITY_LOOKUP[ability_owner(type(self))][ability].bonus)
+
+    def emit(self, kind, template=None, target=None, ability=None, amount=None, target_health=None):
+        """
+        I report something that happened to me to my event sink.
+        I only build the Event when the sink wants it, so a NullSink costs a single attribute check.
+        """
+        sink = self.sink
+        if sink.enabled:
+            sink.emit(Event(kind, self.name, target.name if target is not None else None, ability, amount,
+                            self.health, self.max_health, target.health if target is not None else target_health,
+                            template))
 
 # -----------------------------
 # Evil Wizard Class (Enemy)
 # -----------------------------
 class EvilWizard(Character):
-    def __init__(self, name):
+    __slots__ = ("brain", "raid")
+
+    def __init__(self, name, brain=None):
         """
         I initialize the Evil Wizard with balanced health and attack power.
+        A brain (see WizardBrain) picks my abilities; without one I pick them at random.
         """
-        super().__init__(name, health=150, attack_power=15)
+        super().__init__(name, **CLASS_STATS["EvilWizard"])
+        self.brain = brain
+        # The Raid I fight in (see Raid Mode), otherwise None. Only a raid has room for my minions.
+        self.raid = None
 
     def regenerate(self):
         """
@@ -95,7 +288,7 @@ class EvilWizard(Character):
         """
         regen_amount = 5
         self.health = min(self.max_health, self.health + regen_amount)
-        print(f"{self.name} regenerates {regen_amount} health! (Health: {self.health}/{self.max_health})")
+        self.emit("regen", amount=regen_amount)
 
     # -----------------------------
     # Bonus: Extra Special Abilities for Evil Wizard
@@ -104,15 +297,17 @@ class EvilWizard(Character):
         """
         I summon minions to attack the opponent, dealing extra random bonus damage.
         """
-        bonus = self.random_bonus(3, 10)
-        print(f"{self.name} summons minions that swarm {opponent.name}!")
+        bonus = self.bonus_roll("summon_minions")
+        self.emit("ability_used", "{actor} summons minions that swarm {target}!", target=opponent, ability="summon_minions")
+        if self.raid is not None:
+            self.raid.summon(self)
         return self.attack(opponent) + bonus
 
     def dark_curse(self, opponent):
         """
         I cast a dark curse that weakens the opponent's abilities.
         """
-        print(f"{self.name} casts a Dark Curse on {opponent.name}, weakening their resolve!")
+        self.emit("ability_used", "{actor} casts a Dark Curse on {target}, weakening their resolve!", target=opponent, ability="dark_curse")
         # In a full implementation, I would modify opponent attributes temporarily.
         return
 
@@ -120,23 +315,23 @@ class EvilWizard(Character):
         """
         I deliver a devastating Shadow Strike that deals extra damage.
         """
-        bonus = self.random_bonus(4, 12)
-        print(f"{self.name} unleashes a Shadow Strike!")
+        bonus = self.bonus_roll("shadow_strike")
+        self.emit("ability_used", "{actor} unleashes a Shadow Strike!", target=opponent, ability="shadow_strike")
         return self.attack(opponent) + bonus
 
     def fear_induction(self, opponent):
         """
         I induce fear in the opponent, potentially causing them to lose their next turn.
         """
-        print(f"{self.name} instills terror in {opponent.name}! (Opponent might lose their next turn)")
+        self.emit("ability_used", "{actor} instills terror in {target}! (Opponent might lose their next turn)", target=opponent, ability="fear_induction")
         return
 
     def arcane_barrier(self):
         """
         I create an arcane barrier that heals me or protects me from the next attack.
         """
-        heal_amount = self.random_bonus(5, 12)
-        print(f"{self.name} conjures an Arcane Barrier, healing for {heal_amount}!")
+        heal_amount = self.bonus_roll("arcane_barrier")
+        self.emit("ability_used", "{actor} conjures an Arcane Barrier, healing for {amount}!", ability="arcane_barrier", amount=heal_amount)
         self.heal(heal_amount)
         return
 
@@ -144,641 +339,5649 @@ class EvilWizard(Character):
         """
         I unleash a Chaos Blast that deals a chaotic burst of extra damage.
         """
-        bonus = self.random_bonus(6, 15)
-        print(f"{self.name} unleashes a Chaos Blast!")
+        bonus = self.bonus_roll("chaos_blast")
+        self.emit("ability_used", "{actor} unleashes a Chaos Blast!", target=opponent, ability="chaos_blast")
         return self.attack(opponent) + bonus
 
+class Minion(Character):
+    __slots__ = ("master",)
+
+    def __init__(self, name, master=None):
+        """
+        I initialize a minion summoned by an Evil Wizard in a raid. I only have a normal attack.
+        """
+        super().__init__(name, **CLASS_STATS["Minion"])
+        self.master = master
+
 # -----------------------------
 # Predefined Character Classes: Warrior and Mage
 # -----------------------------
 class Warrior(Character):
+    __slots__ = ()
+
     def __init__(self, name):
         # I define Warrior with high health and moderate attack power.
-        super().__init__(name, health=140, attack_power=25)
+        super().__init__(name, **CLASS_STATS["Warrior"])
 
 class Mage(Character):
+    __slots__ = ()
+
     def __init__(self, name):
         # I define Mage with lower health but high attack power.
-        super().__init__(name, health=100, attack_power=35)
+        super().__init__(name, **CLASS_STATS["Mage"])
 
 # -----------------------------
 # New Character Classes: Archer and Paladin (Required)
 # -----------------------------
 class Archer(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=110, attack_power=20)
+        super().__init__(name, **CLASS_STATS["Archer"])
 
     # Six unique abilities for Archer
     def quick_shot(self, opponent):
-        bonus = self.random_bonus(3, 8)
-        print(f"{self.name} uses Quick Shot for a double arrow attack!")
+        bonus = self.bonus_roll("quick_shot")
+        self.emit("ability_used", "{actor} uses Quick Shot for a double arrow attack!", target=opponent, ability="quick_shot")
         return (self.attack(opponent) * 2) + bonus
 
     def evade(self, opponent):
-        print(f"{self.name} uses Evade to avoid the next attack!")
+        self.emit("ability_used", "{actor} uses Evade to avoid the next attack!", target=opponent, ability="evade")
         return
 
     def precision_strike(self, opponent):
-        bonus = self.random_bonus(4, 9)
-        print(f"{self.name} delivers a Precision Strike!")
+        bonus = self.bonus_roll("precision_strike")
+        self.emit("ability_used", "{actor} delivers a Precision Strike!", target=opponent, ability="precision_strike")
         return self.attack(opponent) + bonus
 
     def rapid_fire(self, opponent):
         total_damage = 0
-        print(f"{self.name} unleashes Rapid Fire!")
+        self.emit("ability_used", "{actor} unleashes Rapid Fire!", target=opponent, ability="rapid_fire")
         for _ in range(2):
             total_damage += self.attack(opponent)
         return total_damage
 
     def piercing_arrow(self, opponent):
-        bonus = self.random_bonus(5, 10)
-        print(f"{self.name} fires a Piercing Arrow that bypasses defenses!")
+        bonus = self.bonus_roll("piercing_arrow")
+        self.emit("ability_used", "{actor} fires a Piercing Arrow that bypasses defenses!", target=opponent, ability="piercing_arrow")
         return self.attack(opponent) + bonus
 
     def arrow_rain(self, opponent):
         total_damage = 0
-        print(f"{self.name} unleashes an Arrow Rain!")
+        self.emit("ability_used", "{actor} unleashes an Arrow Rain!", target=opponent, ability="arrow_rain")
         for _ in range(3):
             total_damage += self.attack(opponent)
         return total_damage
 
 class Paladin(Character):
+    __slots__ = ("divine_shield_active",)
+
     def __init__(self, name):
-        super().__init__(name, health=130, attack_power=22)
+        super().__init__(name, **CLASS_STATS["Paladin"])
         self.divine_shield_active = False
 
     # Six unique abilities for Paladin
     def holy_strike(self, opponent):
-        bonus = self.random_bonus(6, 12)
-        print(f"{self.name} uses Holy Strike!")
+        bonus = self.bonus_roll("holy_strike")
+        self.emit("ability_used", "{actor} uses Holy Strike!", target=opponent, ability="holy_strike")
         return self.attack(opponent) + bonus
 
     def divine_shield(self, opponent):
-        print(f"{self.name} activates Divine Shield to block the next attack!")
+        self.emit("ability_used", "{actor} activates Divine Shield to block the next attack!", target=opponent, ability="divine_shield")
         self.divine_shield_active = True
 
     def sacred_aura(self, opponent):
-        bonus = self.random_bonus(3, 8)
-        print(f"{self.name} radiates a Sacred Aura, weakening {opponent.name}!")
+        bonus = self.bonus_roll("sacred_aura")
+        self.emit("ability_used", "{actor} radiates a Sacred Aura, weakening {target}!", target=opponent, ability="sacred_aura")
         return self.attack(opponent) + bonus
 
     def smite_evil(self, opponent):
-        bonus = self.random_bonus(7, 14)
-        print(f"{self.name} smites evil in {opponent.name}!")
+        bonus = self.bonus_roll("smite_evil")
+        self.emit("ability_used", "{actor} smites evil in {target}!", target=opponent, ability="smite_evil")
         return self.attack(opponent) + bonus
 
     def blessing(self):
-        heal_amount = self.random_bonus(5, 10)
-        print(f"{self.name} bestows a Blessing and heals for {heal_amount}.")
+        heal_amount = self.bonus_roll("blessing")
+        self.emit("ability_used", "{actor} bestows a Blessing and heals for {amount}.", ability="blessing", amount=heal_amount)
         self.heal(heal_amount)
 
     def righteous_charge(self, opponent):
-        bonus = self.random_bonus(4, 10)
-        print(f"{self.name} performs a Righteous Charge!")
+        bonus = self.bonus_roll("righteous_charge")
+        self.emit("ability_used", "{actor} performs a Righteous Charge!", target=opponent, ability="righteous_charge")
         return self.attack(opponent) + bonus
 
 # -----------------------------
 # Bonus Character Classes (Additional 11 Classes)
 # -----------------------------
 class Barbarian(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=160, attack_power=30)
+        super().__init__(name, **CLASS_STATS["Barbarian"])
 
     def berserk(self, opponent):
-        bonus = self.random_bonus(5, 15)
-        print(f"{self.name} goes Berserk!")
+        bonus = self.bonus_roll("berserk")
+        self.emit("ability_used", "{actor} goes Berserk!", target=opponent, ability="berserk")
         return self.attack(opponent) + bonus
 
     def war_cry(self, opponent):
-        bonus = self.random_bonus(3, 10)
-        print(f"{self.name} roars a mighty War Cry!")
+        bonus = self.bonus_roll("war_cry")
+        self.emit("ability_used", "{actor} roars a mighty War Cry!", target=opponent, ability="war_cry")
         return self.attack(opponent) + bonus
 
     def rage(self, opponent):
-        bonus = self.random_bonus(4, 12)
-        print(f"{self.name} is consumed by Rage!")
+        bonus = self.bonus_roll("rage")
+        self.emit("ability_used", "{actor} is consumed by Rage!", target=opponent, ability="rage")
         return self.attack(opponent) + bonus
 
     def smash(self, opponent):
-        bonus = self.random_bonus(6, 14)
-        print(f"{self.name} smashes {opponent.name} with brute force!")
+        bonus = self.bonus_roll("smash")
+        self.emit("ability_used", "{actor} smashes {target} with brute force!", target=opponent, ability="smash")
         return self.attack(opponent) + bonus
 
     def intimidate(self, opponent):
-        bonus = self.random_bonus(2, 8)
-        print(f"{self.name} intimidates {opponent.name}!")
+        bonus = self.bonus_roll("intimidate")
+        self.emit("ability_used", "{actor} intimidates {target}!", target=opponent, ability="intimidate")
         return self.attack(opponent) + bonus
 
     def ground_slam(self, opponent):
-        bonus = self.random_bonus(7, 16)
-        print(f"{self.name} slams the ground, shaking {opponent.name}!")
+        bonus = self.bonus_roll("ground_slam")
+        self.emit("ability_used", "{actor} slams the ground, shaking {target}!", target=opponent, ability="ground_slam")
         return self.attack(opponent) + bonus
 
 class Bard(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=100, attack_power=18)
+        super().__init__(name, **CLASS_STATS["Bard"])
 
     def inspire(self, opponent):
-        bonus = self.random_bonus(3, 9)
-        print(f"{self.name} inspires allies with a rousing melody!")
+        bonus = self.bonus_roll("inspire")
+        self.emit("ability_used", "{actor} inspires allies with a rousing melody!", target=opponent, ability="inspire")
         return self.attack(opponent) + bonus
 
     def distract(self, opponent):
-        bonus = self.random_bonus(2, 8)
-        print(f"{self.name} distracts {opponent.name} with a clever tune!")
+        bonus = self.bonus_roll("distract")
+        self.emit("ability_used", "{actor} distracts {target} with a clever tune!", target=opponent, ability="distract")
         return self.attack(opponent) + bonus
 
     def serenade(self, opponent):
-        bonus = self.random_bonus(4, 10)
-        print(f"{self.name} serenades {opponent.name}!")
+        bonus = self.bonus_roll("serenade")
+        self.emit("ability_used", "{actor} serenades {target}!", target=opponent, ability="serenade")
         return self.attack(opponent) + bonus
 
     def charm(self, opponent):
-        bonus = self.random_bonus(3, 7)
-        print(f"{self.name} charms {opponent.name} with charisma!")
+        bonus = self.bonus_roll("charm")
+        self.emit("ability_used", "{actor} charms {target} with charisma!", target=opponent, ability="charm")
         return self.attack(opponent) + bonus
 
     def rally(self, opponent):
-        bonus = self.random_bonus(2, 6)
-        print(f"{self.name} rallies with an uplifting song!")
+        bonus = self.bonus_roll("rally")
+        self.emit("ability_used", "{actor} rallies with an uplifting song!", target=opponent, ability="rally")
         return self.attack(opponent) + bonus
 
     def echo_voice(self, opponent):
-        bonus = self.random_bonus(5, 12)
-        print(f"{self.name} uses an echoing voice to confuse {opponent.name}!")
+        bonus = self.bonus_roll("echo_voice")
+        self.emit("ability_used", "{actor} uses an echoing voice to confuse {target}!", target=opponent, ability="echo_voice")
         return self.attack(opponent) + bonus
 
 class Cleric(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=120, attack_power=15)
+        super().__init__(name, **CLASS_STATS["Cleric"])
 
     def smite(self, opponent):
-        bonus = self.random_bonus(8, 16)
-        print(f"{self.name} smites {opponent.name} with divine power!")
+        bonus = self.bonus_roll("smite")
+        self.emit("ability_used", "{actor} smites {target} with divine power!", target=opponent, ability="smite")
         return self.attack(opponent) + bonus
 
     def heal_self(self):
-        heal_amount = self.random_bonus(10, 20)
-        print(f"{self.name} calls upon divine mercy to heal!")
+        heal_amount = self.bonus_roll("heal_self")
+        self.emit("ability_used", "{actor} calls upon divine mercy to heal!", ability="heal_self")
         self.heal(heal_amount)
 
     def divine_intervention(self, opponent):
-        bonus = self.random_bonus(5, 12)
-        print(f"{self.name} invokes divine intervention against {opponent.name}!")
+        bonus = self.bonus_roll("divine_intervention")
+        self.emit("ability_used", "{actor} invokes divine intervention against {target}!", target=opponent, ability="divine_intervention")
         return self.attack(opponent) + bonus
 
     def sanctify(self, opponent):
-        bonus = self.random_bonus(4, 10)
-        print(f"{self.name} sanctifies the ground, weakening {opponent.name}!")
+        bonus = self.bonus_roll("sanctify")
+        self.emit("ability_used", "{actor} sanctifies the ground, weakening {target}!", target=opponent, ability="sanctify")
         return self.attack(opponent) + bonus
 
     def exorcise(self, opponent):
-        bonus = self.random_bonus(7, 14)
-        print(f"{self.name} exorcises evil from {opponent.name}!")
+        bonus = self.bonus_roll("exorcise")
+        self.emit("ability_used", "{actor} exorcises evil from {target}!", target=opponent, ability="exorcise")
         return self.attack(opponent) + bonus
 
     def bless(self, opponent):
-        bonus = self.random_bonus(3, 8)
-        print(f"{self.name} blesses {opponent.name}, turning the tide!")
+        bonus = self.bonus_roll("bless")
+        self.emit("ability_used", "{actor} blesses {target}, turning the tide!", target=opponent, ability="bless")
         return self.attack(opponent) + bonus
 
 class Druid(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=115, attack_power=17)
+        super().__init__(name, **CLASS_STATS["Druid"])
 
     def nature_call(self, opponent):
-        bonus = self.random_bonus(5, 12)
-        print(f"{self.name} calls upon nature's fury!")
+        bonus = self.bonus_roll("nature_call")
+        self.emit("ability_used", "{actor} calls upon nature's fury!", target=opponent, ability="nature_call")
         return self.attack(opponent) + bonus
 
     def wild_shape(self, opponent):
-        bonus = self.random_bonus(4, 10)
-        print(f"{self.name} transforms into a beast!")
+        bonus = self.bonus_roll("wild_shape")
+        self.emit("ability_used", "{actor} transforms into a beast!", target=opponent, ability="wild_shape")
         return self.attack(opponent) + bonus
 
     def entangle(self, opponent):
-        bonus = self.random_bonus(3, 9)
-        print(f"{self.name} entangles {opponent.name} with vines!")
+        bonus = self.bonus_roll("entangle")
+        self.emit("ability_used", "{actor} entangles {target} with vines!", target=opponent, ability="entangle")
         return self.attack(opponent) + bonus
 
     def rejuvenate(self):
-        heal_amount = self.random_bonus(8, 16)
-        print(f"{self.name} is rejuvenated by nature!")
+        heal_amount = self.bonus_roll("rejuvenate")
+        self.emit("ability_used", "{actor} is rejuvenated by nature!", ability="rejuvenate")
         self.heal(heal_amount)
 
     def earth_shock(self, opponent):
-        bonus = self.random_bonus(6, 13)
-        print(f"{self.name} unleashes an earth shock!")
+        bonus = self.bonus_roll("earth_shock")
+        self.emit("ability_used", "{actor} unleashes an earth shock!", target=opponent, ability="earth_shock")
         return self.attack(opponent) + bonus
 
     def storm_brew(self, opponent):
-        bonus = self.random_bonus(7, 15)
-        print(f"{self.name} conjures a storm!")
+        bonus = self.bonus_roll("storm_brew")
+        self.emit("ability_used", "{actor} conjures a storm!", target=opponent, ability="storm_brew")
         return self.attack(opponent) + bonus
 
 class Fighter(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=150, attack_power=28)
+        super().__init__(name, **CLASS_STATS["Fighter"])
 
     def power_attack(self, opponent):
-        bonus = self.random_bonus(5, 15)
-        print(f"{self.name} executes a Power Attack!")
+        bonus = self.bonus_roll("power_attack")
+        self.emit("ability_used", "{actor} executes a Power Attack!", target=opponent, ability="power_attack")
         return self.attack(opponent) + bonus
 
     def shield_bash(self, opponent):
-        bonus = self.random_bonus(3, 10)
-        print(f"{self.name} bashes {opponent.name} with a shield!")
+        bonus = self.bonus_roll("shield_bash")
+        self.emit("ability_used", "{actor} bashes {target} with a shield!", target=opponent, ability="shield_bash")
         return self.attack(opponent) + bonus
 
     def parry(self):
-        bonus = self.random_bonus(2, 8)
-        print(f"{self.name} parries the incoming attack!")
+        bonus = self.bonus_roll("parry")
+        self.emit("ability_used", "{actor} parries the incoming attack!", ability="parry")
         return bonus
 
     def riposte(self, opponent):
-        bonus = self.random_bonus(4, 12)
-        print(f"{self.name} ripostes after parrying!")
+        bonus = self.bonus_roll("riposte")
+        self.emit("ability_used", "{actor} ripostes after parrying!", target=opponent, ability="riposte")
         return self.attack(opponent) + bonus
 
     def charge(self, opponent):
-        bonus = self.random_bonus(6, 14)
-        print(f"{self.name} charges at {opponent.name}!")
+        bonus = self.bonus_roll("charge")
+        self.emit("ability_used", "{actor} charges at {target}!", target=opponent, ability="charge")
         return self.attack(opponent) + bonus
 
     def fortify(self):
-        heal_amount = self.random_bonus(5, 10)
-        print(f"{self.name} fortifies defenses and recovers!")
+        heal_amount = self.bonus_roll("fortify")
+        self.emit("ability_used", "{actor} fortifies defenses and recovers!", ability="fortify")
         self.heal(heal_amount)
 
 class Monk(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=110, attack_power=24)
+        super().__init__(name, **CLASS_STATS["Monk"])
 
     def flurry(self, opponent):
         total_damage = 0
-        print(f"{self.name} unleashes a flurry of strikes!")
+        self.emit("ability_used", "{actor} unleashes a flurry of strikes!", target=opponent, ability="flurry")
         for _ in range(3):
             total_damage += self.attack(opponent)
         return total_damage
 
     def meditative_strike(self, opponent):
-        bonus = self.random_bonus(3, 9)
-        print(f"{self.name} channels inner peace into a meditative strike!")
+        bonus = self.bonus_roll("meditative_strike")
+        self.emit("ability_used", "{actor} channels inner peace into a meditative strike!", target=opponent, ability="meditative_strike")
         return self.attack(opponent) + bonus
 
     def swift_kick(self, opponent):
-        bonus = self.random_bonus(2, 7)
-        print(f"{self.name} delivers a swift kick!")
+        bonus = self.bonus_roll("swift_kick")
+        self.emit("ability_used", "{actor} delivers a swift kick!", target=opponent, ability="swift_kick")
         return self.attack(opponent) + bonus
 
     def focus(self):
-        bonus = self.random_bonus(1, 5)
-        print(f"{self.name} focuses intensely, boosting attack power by {bonus} temporarily.")
+        bonus = self.bonus_roll("focus")
+        self.emit("ability_used", "{actor} focuses intensely, boosting attack power by {amount} temporarily.", ability="focus", amount=bonus)
         self.attack_power += bonus
         return bonus
 
     def inner_peace(self):
-        heal_amount = self.random_bonus(4, 8)
-        print(f"{self.name} achieves inner peace and heals for {heal_amount}.")
+        heal_amount = self.bonus_roll("inner_peace")
+        self.emit("ability_used", "{actor} achieves inner peace and heals for {amount}.", ability="inner_peace", amount=heal_amount)
         self.heal(heal_amount)
 
     def acrobatic_dodge(self):
-        print(f"{self.name} performs an acrobatic dodge, avoiding the next attack!")
+        self.emit("ability_used", "{actor} performs an acrobatic dodge, avoiding the next attack!", ability="acrobatic_dodge")
         return
 
 class Ranger(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=105, attack_power=22)
+        super().__init__(name, **CLASS_STATS["Ranger"])
 
     def rapid_fire(self, opponent):
         total_damage = 0
-        print(f"{self.name} unleashes rapid fire!")
+        self.emit("ability_used", "{actor} unleashes rapid fire!", target=opponent, ability="rapid_fire")
         for _ in range(2):
             total_damage += self.attack(opponent)
         return total_damage
 
     def aim_shot(self, opponent):
-        bonus = self.random_bonus(5, 12)
-        print(f"{self.name} takes careful aim for a powerful shot!")
+        bonus = self.bonus_roll("aim_shot")
+        self.emit("ability_used", "{actor} takes careful aim for a powerful shot!", target=opponent, ability="aim_shot")
         return self.attack(opponent) + bonus
 
     def track(self):
-        print(f"{self.name} meticulously tracks the enemy!")
+        self.emit("ability_used", "{actor} meticulously tracks the enemy!", ability="track")
         return
 
     def camouflage(self):
-        print(f"{self.name} blends into the surroundings, reducing incoming damage!")
+        self.emit("ability_used", "{actor} blends into the surroundings, reducing incoming damage!", ability="camouflage")
         return
 
     def double_strike(self, opponent):
-        bonus = self.random_bonus(3, 7)
-        print(f"{self.name} executes a double strike!")
+        bonus = self.bonus_roll("double_strike")
+        self.emit("ability_used", "{actor} executes a double strike!", target=opponent, ability="double_strike")
         return self.attack(opponent) + bonus
 
     def natures_favor(self):
-        heal_amount = self.random_bonus(3, 8)
-        print(f"{self.name} calls upon nature's favor and heals for {heal_amount}.")
+        heal_amount = self.bonus_roll("natures_favor")
+        self.emit("ability_used", "{actor} calls upon nature's favor and heals for {amount}.", ability="natures_favor", amount=heal_amount)
         self.heal(heal_amount)
 
 class Rogue(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=95, attack_power=24)
+        super().__init__(name, **CLASS_STATS["Rogue"])
 
     def backstab(self, opponent):
-        bonus = self.random_bonus(7, 15)
-        print(f"{self.name} performs a lethal backstab!")
+        bonus = self.bonus_roll("backstab")
+        self.emit("ability_used", "{actor} performs a lethal backstab!", target=opponent, ability="backstab")
         return self.attack(opponent) + bonus
 
     def stealth(self):
-        print(f"{self.name} vanishes into the shadows, preparing for a critical strike!")
+        self.emit("ability_used", "{actor} vanishes into the shadows, preparing for a critical strike!", ability="stealth")
         return
 
     def disarm_trap(self):
-        print(f"{self.name} skillfully disarms a trap!")
+        self.emit("ability_used", "{actor} skillfully disarms a trap!", ability="disarm_trap")
         return
 
     def evade(self):
-        print(f"{self.name} dodges swiftly, avoiding the next attack!")
+        self.emit("ability_used", "{actor} dodges swiftly, avoiding the next attack!", ability="evade")
         return
 
     def critical_strike(self, opponent):
-        bonus = self.random_bonus(5, 10)
-        print(f"{self.name} lands a critical strike!")
+        bonus = self.bonus_roll("critical_strike")
+        self.emit("ability_used", "{actor} lands a critical strike!", target=opponent, ability="critical_strike")
         return self.attack(opponent) + bonus
 
     def quick_escape(self):
-        print(f"{self.name} quickly escapes to a safer location!")
+        self.emit("ability_used", "{actor} quickly escapes to a safer location!", ability="quick_escape")
         return
 
 class Sorcerer(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=90, attack_power=38)
+        super().__init__(name, **CLASS_STATS["Sorcerer"])
 
     def arcane_blast(self, opponent):
-        bonus = self.random_bonus(6, 12)
-        print(f"{self.name} casts Arcane Blast!")
+        bonus = self.bonus_roll("arcane_blast")
+        self.emit("ability_used", "{actor} casts Arcane Blast!", target=opponent, ability="arcane_blast")
         return self.attack(opponent) + bonus
 
     def fireball(self, opponent):
-        bonus = self.random_bonus(5, 15)
-        print(f"{self.name} launches a Fireball!")
+        bonus = self.bonus_roll("fireball")
+        self.emit("ability_used", "{actor} launches a Fireball!", target=opponent, ability="fireball")
         return self.attack(opponent) + bonus
 
     def lightning_bolt(self, opponent):
-        bonus = self.random_bonus(7, 14)
-        print(f"{self.name} strikes with Lightning Bolt!")
+        bonus = self.bonus_roll("lightning_bolt")
+        self.emit("ability_used", "{actor} strikes with Lightning Bolt!", target=opponent, ability="lightning_bolt")
         return self.attack(opponent) + bonus
 
     def frost_nova(self, opponent):
-        bonus = self.random_bonus(3, 10)
-        print(f"{self.name} unleashes Frost Nova!")
+        bonus = self.bonus_roll("frost_nova")
+        self.emit("ability_used", "{actor} unleashes Frost Nova!", target=opponent, ability="frost_nova")
         return self.attack(opponent) + bonus
 
     def mana_surge(self):
-        print(f"{self.name} experiences a surge of mana!")
+        self.emit("ability_used", "{actor} experiences a surge of mana!", ability="mana_surge")
         return
 
     def mystic_shield(self):
-        print(f"{self.name} conjures a mystic shield to block incoming damage!")
+        self.emit("ability_used", "{actor} conjures a mystic shield to block incoming damage!", ability="mystic_shield")
         return
 
 class Warlock(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=95, attack_power=36)
+        super().__init__(name, **CLASS_STATS["Warlock"])
 
     def eldritch_blast(self, opponent):
-        bonus = self.random_bonus(6, 13)
-        print(f"{self.name} fires an Eldritch Blast!")
+        bonus = self.bonus_roll("eldritch_blast")
+        self.emit("ability_used", "{actor} fires an Eldritch Blast!", target=opponent, ability="eldritch_blast")
         return self.attack(opponent) + bonus
 
     def dark_pact(self):
-        sacrifice = self.random_bonus(3, 7)
-        print(f"{self.name} invokes Dark Pact, sacrificing {sacrifice} health!")
+        sacrifice = self.bonus_roll("dark_pact")
+        self.emit("ability_used", "{actor} invokes Dark Pact, sacrificing {amount} health!", ability="dark_pact", amount=sacrifice)
         self.health = max(0, self.health - sacrifice)
         return sacrifice
 
     def curse(self, opponent):
-        bonus = self.random_bonus(4, 10)
-        print(f"{self.name} casts a Curse on {opponent.name}!")
+        bonus = self.bonus_roll("curse")
+        self.emit("ability_used", "{actor} casts a Curse on {target}!", target=opponent, ability="curse")
         return self.attack(opponent) + bonus
 
     def summon_familiar(self):
-        print(f"{self.name} summons a familiar to aid in battle!")
+        self.emit("ability_used", "{actor} summons a familiar to aid in battle!", ability="summon_familiar")
         return
 
     def soul_drain(self, opponent):
-        bonus = self.random_bonus(5, 12)
-        print(f"{self.name} drains the soul of {opponent.name}!")
+        bonus = self.bonus_roll("soul_drain")
+        self.emit("ability_used", "{actor} drains the soul of {target}!", target=opponent, ability="soul_drain")
         damage = self.attack(opponent) + bonus
         heal_amount = bonus // 2
         self.heal(heal_amount)
         return damage
 
     def infernal_power(self, opponent):
-        bonus = self.random_bonus(7, 15)
-        print(f"{self.name} unleashes infernal power!")
+        bonus = self.bonus_roll("infernal_power")
+        self.emit("ability_used", "{actor} unleashes infernal power!", target=opponent, ability="infernal_power")
         return self.attack(opponent) + bonus
 
 class Wizard(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, health=85, attack_power=40)
+        super().__init__(name, **CLASS_STATS["Wizard"])
 
     def magic_missile(self, opponent):
-        bonus = self.random_bonus(5, 10)
-        print(f"{self.name} fires a Magic Missile!")
+        bonus = self.bonus_roll("magic_missile")
+        self.emit("ability_used", "{actor} fires a Magic Missile!", target=opponent, ability="magic_missile")
         return self.attack(opponent) + bonus
 
     def teleport(self):
-        print(f"{self.name} teleports to a strategic position!")
+        self.emit("ability_used", "{actor} teleports to a strategic position!", ability="teleport")
         return
 
     def shield_spell(self):
-        print(f"{self.name} casts a Shield Spell to reduce incoming damage!")
+        self.emit("ability_used", "{actor} casts a Shield Spell to reduce incoming damage!", ability="shield_spell")
         return
 
     def polymorph(self, opponent):
-        bonus = self.random_bonus(3, 8)
-        print(f"{self.name} casts Polymorph on {opponent.name}!")
+        bonus = self.bonus_roll("polymorph")
+        self.emit("ability_used", "{actor} casts Polymorph on {target}!", target=opponent, ability="polymorph")
         return self.attack(opponent) + bonus
 
     def time_warp(self):
-        print(f"{self.name} warps time and gains an extra turn!")
+        self.emit("ability_used", "{actor} warps time and gains an extra turn!", ability="time_warp")
         return
 
     def arcane_explosion(self, opponent):
-        bonus = self.random_bonus(6, 12)
-        print(f"{self.name} unleashes an Arcane Explosion!")
+        bonus = self.bonus_roll("arcane_explosion")
+        self.emit("ability_used", "{actor} unleashes an Arcane Explosion!", target=opponent, ability="arcane_explosion")
         return self.attack(opponent) + bonus
 
+# -----------------------------
+# Ability Registry
+# -----------------------------
+# What every special ability does to health and attack power, written as data so engines that do
+# not call the methods can still play them: (effect, hits, bonus range). Menu order is dict order.
+#   "strike"    lands `hits` normal attacks
+#   "heal"      heals by the bonus roll
+#   "drain"     lands one attack and heals by half the bonus roll
+#   "sacrifice" costs the bonus roll in health
+#   "focus"     raises attack power by the bonus roll
+#   "none"      only prints (the bonus roll, if any, is thrown away)
+# A strike's bonus is only added to the damage number the method returns; it never touches health.
+ABILITY_EFFECTS = {
+    Archer: {
+        "quick_shot": ("strike", 1, (3, 8)), "evade": ("none", 0, None),
+        "precision_strike": ("strike", 1, (4, 9)), "rapid_fire": ("strike", 2, None),
+        "piercing_arrow": ("strike", 1, (5, 10)), "arrow_rain": ("strike", 3, None)
+    },
+    Paladin: {
+        "holy_strike": ("strike", 1, (6, 12)), "divine_shield": ("none", 0, None),
+        "sacred_aura": ("strike", 1, (3, 8)), "smite_evil": ("strike", 1, (7, 14)),
+        "blessing": ("heal", 0, (5, 10)), "righteous_charge": ("strike", 1, (4, 10))
+    },
+    Barbarian: {
+        "berserk": ("strike", 1, (5, 15)), "war_cry": ("strike", 1, (3, 10)),
+        "rage": ("strike", 1, (4, 12)), "smash": ("strike", 1, (6, 14)),
+        "intimidate": ("strike", 1, (2, 8)), "ground_slam": ("strike", 1, (7, 16))
+    },
+    Bard: {
+        "inspire": ("strike", 1, (3, 9)), "distract": ("strike", 1, (2, 8)),
+        "serenade": ("strike", 1, (4, 10)), "charm": ("strike", 1, (3, 7)),
+        "rally": ("strike", 1, (2, 6)), "echo_voice": ("strike", 1, (5, 12))
+    },
+    Cleric: {
+        "smite": ("strike", 1, (8, 16)), "heal_self": ("heal", 0, (10, 20)),
+        "divine_intervention": ("strike", 1, (5, 12)), "sanctify": ("strike", 1, (4, 10)),
+        "exorcise": ("strike", 1, (7, 14)), "bless": ("strike", 1, (3, 8))
+    },
+    Druid: {
+        "nature_call": ("strike", 1, (5, 12)), "wild_shape": ("strike", 1, (4, 10)),
+        "entangle": ("strike", 1, (3, 9)), "rejuvenate": ("heal", 0, (8, 16)),
+        "earth_shock": ("strike", 1, (6, 13)), "storm_brew": ("strike", 1, (7, 15))
+    },
+    Fighter: {
+        "power_attack": ("strike", 1, (5, 15)), "shield_bash": ("strike", 1, (3, 10)),
+        "parry": ("none", 0, (2, 8)), "riposte": ("strike", 1, (4, 12)),
+        "charge": ("strike", 1, (6, 14)), "fortify": ("heal", 0, (5, 10))
+    },
+    Monk: {
+        "flurry": ("strike", 3, None), "meditative_strike": ("strike", 1, (3, 9)),
+        "swift_kick": ("strike", 1, (2, 7)), "focus": ("focus", 0, (1, 5)),
+        "inner_peace": ("heal", 0, (4, 8)), "acrobatic_dodge": ("none", 0, None)
+    },
+    Ranger: {
+        "rapid_fire": ("strike", 2, None), "aim_shot": ("strike", 1, (5, 12)),
+        "track": ("none", 0, None), "camouflage": ("none", 0, None),
+        "double_strike": ("strike", 1, (3, 7)), "natures_favor": ("heal", 0, (3, 8))
+    },
+    Rogue: {
+        "backstab": ("strike", 1, (7, 15)), "stealth": ("none", 0, None),
+        "disarm_trap": ("none", 0, None), "evade": ("none", 0, None),
+        "critical_strike": ("strike", 1, (5, 10)), "quick_escape": ("none", 0, None)
+    },
+    Sorcerer: {
+        "arcane_blast": ("strike", 1, (6, 12)), "fireball": ("strike", 1, (5, 15)),
+        "lightning_bolt": ("strike", 1, (7, 14)), "frost_nova": ("strike", 1, (3, 10)),
+        "mana_surge": ("none", 0, None), "mystic_shield": ("none", 0, None)
+    },
+    Warlock: {
+        "eldritch_blast": ("strike", 1, (6, 13)), "dark_pact": ("sacrifice", 0, (3, 7)),
+        "curse": ("strike", 1, (4, 10)), "summon_familiar": ("none", 0, None),
+        "soul_drain": ("drain", 1, (5, 12)), "infernal_power": ("strike", 1, (7, 15))
+    },
+    Wizard: {
+        "magic_missile": ("strike", 1, (5, 10)), "teleport": ("none", 0, None),
+        "shield_spell": ("none", 0, None), "polymorph": ("strike", 1, (3, 8)),
+        "time_warp": ("none", 0, None), "arcane_explosion": ("strike", 1, (6, 12))
+    },
+    EvilWizard: {
+        "summon_minions": ("strike", 1, (3, 10)), "dark_curse": ("none", 0, None),
+        "shadow_strike": ("strike", 1, (4, 12)), "fear_induction": ("none", 0, None),
+        "arcane_barrier": ("heal", 0, (5, 12)), "chaos_blast": ("strike", 1, (6, 15))
+    }
+}
+
+# Abilities whose returned damage number is a multiple of the attack roll.
+DAMAGE_MULTIPLIERS = {(Archer, "quick_shot"): 2}
+
+class AbilitySpec(namedtuple("AbilitySpec", "owner name label method arity effect hits bonus multiplier")):
+    """
+    I describe one special ability: the class that owns it, its menu label, the plain function that
+    implements it, how many arguments it takes besides self, and its effect data from ABILITY_EFFECTS.
+    """
+    __slots__ = ()
+
+    @property
+    def heal_range(self):
+        """
+        I give the (min, max) health this ability restores to its user, or None.
+        """
+        if self.effect == "heal":
+            return self.bonus
+        if self.effect == "drain":
+            return (self.bonus[0] // 2, self.bonus[1] // 2)
+        return None
+
+    @property
+    def self_cost(self):
+        """
+        I give the (min, max) health this ability costs its user, or None.
+        """
+        return self.bonus if self.effect == "sacrifice" else None
+
+    def use(self, character, opponent):
+        """
+        I call the ability for `character` against `opponent` and return its result.
+        """
+        result = self.method(character, opponent) if self.arity else self.method(character)
+        if character.effects is not None:
+            character.effects.trigger(self, character, opponent, result)
+        return result
+
+def _build_ability_registry():
+    """
+    I turn ABILITY_EFFECTS into AbilitySpec tuples once, at import time.
+    """
+    registry = {}
+    for cls, abilities in ABILITY_EFFECTS.items():
+        specs = []
+        for name, (effect, hits, bonus) in abilities.items():
+            method = getattr(cls, name)
+            specs.append(AbilitySpec(cls, name, name.replace('_', ' ').title(), method,
+                                     method.__code__.co_argcount - 1, effect, hits, bonus,
+                                     DAMAGE_MULTIPLIERS.get((cls, name), 1)))
+        registry[cls] = tuple(specs)
+    return registry
+
+# ABILITY_REGISTRY[cls] lists a class's abilities in menu order; ABILITY_LOOKUP[cls][name] finds one by name.
+ABILITY_REGISTRY = _build_ability_registry()
+ABILITY_LOOKUP = {cls: {spec.name: spec for spec in specs} for cls, specs in ABILITY_REGISTRY.items()}
+WIZARD_ABILITIES = ABILITY_REGISTRY[EvilWizard]
+_ABILITY_OWNERS = {}
+
+def ability_owner(cls):
+    """
+    I return the class whose abilities `cls` has: the first class in its MRO with an entry in
+    ABILITY_REGISTRY, or None. A subclass of a hero class fights with that class's abilities.
+    Each class's MRO is walked once; after that the answer is one dictionary lookup.
+    """
+    try:
+        return _ABILITY_OWNERS[cls]
+    except KeyError:
+        owner = _ABILITY_OWNERS[cls] = next((base for base in cls.__mro__ if base in ABILITY_REGISTRY), None)
+        return owner
+
+# -----------------------------
+# Status Effects
+# -----------------------------
+# Status effects are opt-in: battle(..., effects=StatusEngine()) turns them on for one battle and
+# everything else keeps the classic rules, which the solvers and the NumPy engine model. With
+# effects, the curse, fear, evasion, stealth, camouflage and shield abilities do what their text
+# promises, Divine Shield blocks the next attack, and Focus lasts three rounds instead of forever.
+# An effect lasts `duration` rounds and can stack up to `max_stacks` times; a new stack restarts
+# the duration. An effect put on my opponent counts from their next turn, since the rest of the
+# round it was cast in is mine: fear then really can cost a turn, and a curse weakens two attacks. Damage multipliers apply per stack to attacks I make (damage_out) or receive
+# (damage_in). A blocking effect makes the next attack against me miss, and `consume` says whether
+# an effect ends early when I "attack" or when I am "hit".
+# Expirations sit on a timer wheel with one slot per round modulo WHEEL_SLOTS. A round only visits
+# its own slot, so the cost of a tick is proportional to the effects that expire then, not to all
+# active effects. Refreshed or consumed effects leave their old wheel entry behind; it is skipped
+# when its slot comes up. Snapshots (see Battle Snapshots) include the active effects.
+StatusEffect = namedtuple("StatusEffect", "name label duration max_stacks damage_out damage_in block skip_chance consume")
+
+STATUS_EFFECTS = {effect.name: effect for effect in (
+    StatusEffect("cursed", "cursed", 2, 3, 0.75, 1.0, False, 0.0, None),
+    StatusEffect("feared", "afraid", 1, 1, 1.0, 1.0, False, 0.5, None),
+    StatusEffect("evading", "evading", 1, 1, 1.0, 1.0, True, 0.0, "hit"),
+    StatusEffect("divine_shield", "shielded by the divine", 3, 1, 1.0, 1.0, True, 0.0, "hit"),
+    StatusEffect("stealthed", "hidden", 2, 1, 2.0, 1.0, False, 0.0, "attack"),
+    StatusEffect("camouflaged", "camouflaged", 2, 1, 1.0, 0.6, False, 0.0, None),
+    StatusEffect("warded", "warded", 2, 1, 1.0, 0.5, False, 0.0, None),
+    StatusEffect("focused", "focused", 3, 5, 1.0, 1.0, False, 0.0, None)
+)}
+
+# (class, ability) -> (effect, "self" or "opponent")
+STATUS_TRIGGERS = {
+    (EvilWizard, "dark_curse"): ("cursed", "opponent"),
+    (EvilWizard, "fear_induction"): ("feared", "opponent"),
+    (Archer, "evade"): ("evading", "self"),
+    (Rogue, "evade"): ("evading", "self"),
+    (Monk, "acrobatic_dodge"): ("evading", "self"),
+    (Paladin, "divine_shield"): ("divine_shield", "self"),
+    (Rogue, "stealth"): ("stealthed", "self"),
+    (Ranger, "camouflage"): ("camouflaged", "self"),
+    (Wizard, "shield_spell"): ("warded", "self"),
+    (Sorcerer, "mystic_shield"): ("warded", "self"),
+    (Monk, "focus"): ("focused", "self")
+}
+
+WHEEL_SLOTS = 64
+
+class StatusEngine:
+    """
+    I keep the status effects of one battle: who has which effect, and when each one runs out.
+    """
+    def __init__(self):
+        self.round = 0
+        self.wheel = [[] for _ in range(WHEEL_SLOTS)]
+        # active[character][name] = [stacks, expires, token, magnitude]
+        self.active = {}
+        # modifiers[character] = (damage_out, damage_in, blocking effect or None)
+        self.modifiers = {}
+        self.tokens = 0
+
+    def _refresh(self, character):
+        damage_out = damage_in = 1.0
+        block = None
+        for name, (stacks, _, _, _) in self.active.get(character, {}).items():
+            effect = STATUS_EFFECTS[name]
+            damage_out *= effect.damage_out ** stacks
+            damage_in *= effect.damage_in ** stacks
+            if effect.block:
+                block = name
+        self.modifiers[character] = (damage_out, damage_in, block)
+
+    def apply(self, character, name, magnitude=0, delay=0):
+        """
+        I give `character` one stack of an effect, restarting its duration, which starts counting
+        after `delay` more rounds.
+        """
+        effect = STATUS_EFFECTS[name]
+        effects = self.active.setdefault(character, {})
+        self.tokens += 1
+        expires = self.round + delay + effect.duration
+        current = effects.get(name)
+        if current is None:
+            effects[name] = [1, expires, self.tokens, magnitude]
+        else:
+            current[0] = min(effect.max_stacks, current[0] + 1)
+            current[1:] = [expires, self.tokens, current[3] + magnitude]
+        self.wheel[expires % WHEEL_SLOTS].append((expires, character, name, self.tokens))
+        self._refresh(character)
+
+    def remove(self, character, name):
+        """
+        I end an effect now and undo what it changed.
+        """
+        _, _, _, magnitude = self.active[character].pop(name)
+        if name == "focused":
+            character.attack_power -= magnitude
+        elif name == "divine_shield":
+            character.divine_shield_active = False
+        self._refresh(character)
+        character.emit("status_expired", f"{{actor}} is no longer {STATUS_EFFECTS[name].label}.", ability=name)
+
+    def restore(self, character, name, stacks, expires, magnitude):
+        """
+        I put back an effect taken from a snapshot, with its stacks and absolute expiry round.
+        """
+        self.tokens += 1
+        self.active.setdefault(character, {})[name] = [stacks, expires, self.tokens, magnitude]
+        self.wheel[expires % WHEEL_SLOTS].append((expires, character, name, self.tokens))
+        self._refresh(character)
+        character.effects = self
+
+    def has(self, character, name):
+        return name in self.active.get(character, ())
+
+    def trigger(self, spec, character, opponent, result):
+        """
+        I apply the effect an ability promises, if it has one (see STATUS_TRIGGERS).
+        """
+        trigger = STATUS_TRIGGERS.get((spec.owner, spec.name))
+        if trigger is not None:
+            name, whom = trigger
+            if whom == "self":
+                self.apply(character, name, result if name == "focused" else 0)
+            else:
+                self.apply(opponent, name, delay=1)
+
+    def adjust_attack(self, attacker, defender, damage):
+        """
+        I return the damage of a basic attack after blocks and damage multipliers.
+        """
+        damage_out, _, _ = self.modifiers.get(attacker, (1.0, 1.0, None))
+        _, damage_in, block = self.modifiers.get(defender, (1.0, 1.0, None))
+        if damage_out != 1.0:
+            for name in [name for name in self.active[attacker] if STATUS_EFFECTS[name].consume == "attack"]:
+                self.remove(attacker, name)
+        if block is not None:
+            defender.emit("blocked", "{actor} avoids the attack from {target}!", target=attacker, ability=block)
+            self.remove(defender, block)
+            return 0
+        if damage_in != 1.0:
+            for name in [name for name in self.active[defender] if STATUS_EFFECTS[name].consume == "hit"]:
+                self.remove(defender, name)
+        return round(damage * damage_out * damage_in)
+
+    def loses_turn(self, character):
+        """
+        I decide whether fear (or another skip effect) costs `character` this turn.
+        """
+        for name in self.active.get(character, ()):
+            chance = STATUS_EFFECTS[name].skip_chance
+            if chance and character.rng.random() < chance:
+                character.emit("turn_lost", "{actor} is paralyzed by fear and loses the turn!", ability=name)
+                return True
+        return False
+
+    def tick(self):
+        """
+        I end the round and expire the effects that run out now.
+        """
+        self.round += 1
+        slot = self.round % WHEEL_SLOTS
+        due, self.wheel[slot] = self.wheel[slot], []
+        for entry in due:
+            expires, character, name, token = entry
+            if expires > self.round:
+                self.wheel[slot].append(entry)
+                continue
+            current = self.active.get(character, {}).get(name)
+            if current is not None and current[2] == token:
+                self.remove(character, name)
+
 # -----------------------------
 # Battle System and Menu
 # -----------------------------
-def create_character():
+# I keep the class menu at module level so the interactive menus and the headless simulator
+# (further below) read the same roster instead of rebuilding it on every call.
+CLASS_MENU = {
+    '1': Warrior,
+    '2': Mage,
+    '3': Archer,
+    '4': Paladin,
+    '5': Barbarian,
+    '6': Bard,
+    '7': Cleric,
+    '8': Druid,
+    '9': Fighter,
+    '10': Monk,
+    '11': Ranger,
+    '12': Rogue,
+    '13': Sorcerer,
+    '14': Warlock,
+    '15': Wizard
+}
+
+CLASS_ROSTER = {cls.__name__: cls for cls in CLASS_MENU.values()}
+
+# Small integer ids for every class (the 15 heroes in menu order, then the Evil Wizard), used by
+# compact storage formats.
+CLASS_BY_ID = list(CLASS_MENU.values()) + [EvilWizard]
+CLASS_IDS = {cls: class_id for class_id, cls in enumerate(CLASS_BY_ID)}
+
+# The hero classes' ability names in menu order (the Evil Wizard's abilities are in WIZARD_ABILITIES).
+SPECIAL_ABILITIES = {cls: [spec.name for spec in specs] for cls, specs in ABILITY_REGISTRY.items() if cls is not EvilWizard}
+
+# The prompts are written as dialogs: generators that show text through `write`, yield each prompt
+# and receive the typed reply. run_dialog answers them from the keyboard; the game server answers
+# them from a network connection, so both share exactly the same menus.
+def run_dialog(dialog):
     """
-    I prompt the user to choose a character class and enter their name.
-    I return an instance of the chosen character.
+    I drive a dialog from the keyboard, answering every prompt it yields with input().
+    """
+    try:
+        prompt = next(dialog)
+        while True:
+            prompt = dialog.send(input(prompt))
+    except StopIteration as finished:
+        return finished.value
+
+def character_dialog(write=print):
+    """
+    I show the class menu, ask for a class and a name, and return the new character.
     """
-    print("1. Warrior")
-    print("2. Mage")
-    print("3. Archer")
-    print("4. Paladin")
-    print("5. Barbarian")
-    print("6. Bard")
-    print("7. Cleric")
-    print("8. Druid")
-    print("9. Fighter")
-    print("10. Monk")
-    print("11. Ranger")
-    print("12. Rogue")
-    print("13. Sorcerer")
-    print("14. Warlock")
-    print("15. Wizard")
+    for key, cls in CLASS_MENU.items():
+        write(f"{key}. {cls.__name__}")
     
-    choice = input("Enter the number of your class choice: ").strip()
-    name = input("Enter your character's name: ").strip()
-
-    mapping = {
-        '1': Warrior,
-        '2': Mage,
-        '3': Archer,
-        '4': Paladin,
-        '5': Barbarian,
-        '6': Bard,
-        '7': Cleric,
-        '8': Druid,
-        '9': Fighter,
-        '10': Monk,
-        '11': Ranger,
-        '12': Rogue,
-        '13': Sorcerer,
-        '14': Warlock,
-        '15': Wizard
-    }
-    cls = mapping.get(choice)
+    choice = (yield "Enter the number of your class choice: ").strip()
+    name = (yield "Enter your character's name: ").strip()
+
+    cls = CLASS_MENU.get(choice)
     if cls is None:
-        print("Invalid choice. Defaulting to Warrior.")
+        write("Invalid choice. Defaulting to Warrior.")
         return Warrior(name)
     return cls(name)
 
-def choose_special_ability(character, opponent):
+# The menus are built once and then only written out. Ability menus are cached per class (and per
+# attack power when they show odds); load_balance() clears them along with the damage tables.
+TURN_MENU = ("\n--- Your Turn ---", "1. Normal Attack", "2. Use Special Ability", "3. Heal", "4. View Stats")
+
+@functools.lru_cache(maxsize=None)
+def ability_menu(cls, odds=False, attack_power=None):
     """
-    I prompt the user to choose one of my character's special abilities.
-    I map the character class to its 6 unique abilities and then call the chosen ability.
+    I return the numbered lines of a class's ability menu.
+    With `odds`, damaging abilities show their average damage, standard deviation and range.
     """
-    ability_mapping = {
-        Archer: ["quick_shot", "evade", "precision_strike", "rapid_fire", "piercing_arrow", "arrow_rain"],
-        Paladin: ["holy_strike", "divine_shield", "sacred_aura", "smite_evil", "blessing", "righteous_charge"],
-        Barbarian: ["berserk", "war_cry", "rage", "smash", "intimidate", "ground_slam"],
-        Bard: ["inspire", "distract", "serenade", "charm", "rally", "echo_voice"],
-        Cleric: ["smite", "heal_self", "divine_intervention", "sanctify", "exorcise", "bless"],
-        Druid: ["nature_call", "wild_shape", "entangle", "rejuvenate", "earth_shock", "storm_brew"],
-        Fighter: ["power_attack", "shield_bash", "parry", "riposte", "charge", "fortify"],
-        Monk: ["flurry", "meditative_strike", "swift_kick", "focus", "inner_peace", "acrobatic_dodge"],
-        Ranger: ["rapid_fire", "aim_shot", "track", "camouflage", "double_strike", "natures_favor"],
-        Rogue: ["backstab", "stealth", "disarm_trap", "evade", "critical_strike", "quick_escape"],
-        Sorcerer: ["arcane_blast", "fireball", "lightning_bolt", "frost_nova", "mana_surge", "mystic_shield"],
-        Warlock: ["eldritch_blast", "dark_pact", "curse", "summon_familiar", "soul_drain", "infernal_power"],
-        Wizard: ["magic_missile", "teleport", "shield_spell", "polymorph", "time_warp", "arcane_explosion"]
-    }
-    cls = type(character)
-    abilities = ability_mapping.get(cls)
-    if not abilities:
-        print("Your class does not have unique special abilities. Using normal attack instead.")
-        return character.attack(opponent)
+    lines = []
+    for idx, spec in enumerate(ABILITY_REGISTRY[cls], start=1):
+        if odds and spec.effect in ("strike", "drain"):
+            stats = ability_damage_stats(cls, spec.name, attack_power)
+            lines.append(f"{idx}. {spec.label} (avg {stats.mean:.1f}, sd {math.sqrt(stats.variance):.1f}, "
+                         f"{stats.low}-{stats.high} damage)")
+        else:
+            lines.append(f"{idx}. {spec.label}")
+    return tuple(lines)
 
-    print("\nChoose a special ability:")
-    for idx, ability in enumerate(abilities, start=1):
-        ability_name = ability.replace('_', ' ').title()
-        print(f"{idx}. {ability_name}")
+def ability_dialog(character, write=print, odds=False):
+    """
+    I list my character's special abilities and ask which one to use.
+    I return the chosen ability name, or None when the reply does not select an ability.
+    With `odds`, damaging abilities show their average damage, standard deviation and range.
+    """
+    cls = ability_owner(type(character))
+    abilities = ABILITY_REGISTRY[cls]
+    write("\nChoose a special ability:")
+    for line in ability_menu(cls, odds, character.attack_power if odds else None):
+        write(line)
     
     try:
-        choice = int(input("Enter the number of your ability choice: "))
+        choice = int((yield "Enter the number of your ability choice: "))
         if 1 <= choice <= len(abilities):
-            ability_method = getattr(character, abilities[choice - 1], None)
-            if callable(ability_method):
-                print()
-                try:
-                    result = ability_method(opponent)
-                except TypeError:
-                    result = ability_method()
-                return result
-            else:
-                print("Selected ability not implemented.")
-        else:
-            print("Invalid ability number. No action taken.")
+            write()
+            return abilities[choice - 1].name
+        write("Invalid ability number. No action taken.")
     except ValueError:
-        print("Invalid input. Must be a number.")
+        write("Invalid input. Must be a number.")
+    return None
+
+def turn_dialog(player, write=print, odds=False):
+    """
+    I show the turn menu, read the player's choice and translate it into an (action, argument) pair.
+    `odds` is passed on to the ability menu.
+    """
+    for line in TURN_MENU:
+        write(line)
+    action = (yield "Choose an action: ").strip()
+
+    if action == '1':
+        return ("attack", None)
+    elif action == '2':
+        if ability_owner(type(player)) not in SPECIAL_ABILITIES:
+            return ("ability", None)
+        ability = yield from ability_dialog(player, write, odds)
+        return ("ability", ability) if ability is not None else ("pass", None)
+    elif action == '3':
+        try:
+            return ("heal", int((yield "Enter heal amount: ")))
+        except ValueError:
+            write("Invalid heal amount. Please enter an integer.")
+            return ("pass", None)
+    elif action == '4':
+        return ("stats", None)
+    write("Invalid choice. Try again.")
+    return ("pass", None)
+
+def create_character():
+    """
+    I prompt the user to choose a character class and enter their name.
+    I return an instance of the chosen character.
+    """
+    return run_dialog(character_dialog())
+
+def prompt_special_ability(character):
+    """
+    I ask the user which of my character's special abilities to use and return its name (or None).
+    """
+    return run_dialog(ability_dialog(character))
+
+def use_special_ability(character, opponent, ability):
+    """
+    I call one of my character's special abilities by name and return its result.
+    Classes without unique abilities fall back to a normal attack.
+    """
+    owner = ability_owner(type(character))
+    abilities = ABILITY_LOOKUP.get(owner)
+    if abilities is None or owner is EvilWizard:
+        character.emit("message", "Your class does not have unique special abilities. Using normal attack instead.")
+        return character.attack(opponent)
+    spec = abilities.get(ability)
+    if spec is None:
+        character.emit("message", "Selected ability not implemented.")
+        return None
+    return spec.use(character, opponent)
+
+def choose_special_ability(character, opponent):
+    """
+    I prompt the user to choose one of my character's special abilities.
+    I map the character class to its 6 unique abilities and then call the chosen ability.
+    """
+    if ability_owner(type(character)) not in SPECIAL_ABILITIES:
+        return use_special_ability(character, opponent, None)
+    ability = prompt_special_ability(character)
+    if ability is not None:
+        return use_special_ability(character, opponent, ability)
+
+# -----------------------------
+# Action Policies
+# -----------------------------
+# A policy is any callable policy(player, wizard) that returns an (action, argument) pair:
+#   ("attack", None), ("ability", ability_name), ("heal", amount), ("stats", None) or ("pass", None).
+# The interactive game uses console_policy; the headless simulator plugs in one of the bots below.
+def console_policy(player, wizard, odds=False):
+    """
+    I show the turn menu, read the player's choice and translate it into an action.
+    With `odds` the ability menu shows damage statistics (see Damage Distributions).
+    """
+    return run_dialog(turn_dialog(player, odds=odds))
+
+def attack_policy(player, wizard):
+    """
+    I always use a normal attack.
+    """
+    return ("attack", None)
+
+def random_ability_policy(player, wizard):
+    """
+    I pick one of my special abilities uniformly at random (or attack if my class has none).
+    """
+    abilities = SPECIAL_ABILITIES.get(ability_owner(type(player)))
+    if not abilities:
+        return ("attack", None)
+    return ("ability", player.rng.choice(abilities))
+
+def cautious_policy(player, wizard):
+    """
+    I heal back to full when I drop below a third of my health; otherwise I act like random_ability_policy.
+    """
+    if player.health * 3 < player.max_health:
+        return ("heal", player.max_health - player.health)
+    return random_ability_policy(player, wizard)
+
+POLICIES = {
+    "attack": attack_policy,
+    "random": random_ability_policy,
+    "cautious": cautious_policy
+}
+
+# -----------------------------
+# Terminal Renderer
+# -----------------------------
+# Plain play prints every menu line and every event as it happens, which scrolls and lags over a
+# slow connection. A FrameRenderer is the battle's sink instead: it keeps the latest events in a
+# log, composes each turn into one frame (health bars for both fighters, the log and the current
+# menu), compares it with the frame already on screen and sends only the rows that changed, as
+# one write and one flush per prompt. It needs a terminal that understands ANSI cursor movement;
+# use_frames() decides, and anything else (pipes, TERM=dumb) keeps the classic scrolling text.
+# Every frame has to fit the terminal as it is right now, since a frame taller than the screen
+# scrolls and every later row lands in the wrong place. So each draw reads the terminal size again:
+# the log shows at most FRAME_LOG_LINES lines and shrinks to whatever the header, the menu and the
+# prompt row leave over. With fewer than FRAME_MIN_LOG_LINES left, the renderer prints plain
+# scrolling text for that prompt instead, and the first frame after a resize starts from a clear screen.
+UI_MODES = ("auto", "frames", "plain")
+FRAME_LOG_LINES = 12
+FRAME_MIN_LOG_LINES = 3
+FRAME_BAR_WIDTH = 30
+
+def use_frames(mode="auto", stream=None):
+    """
+    I tell whether to draw frames: always for "frames", never for "plain", and for "auto" only
+    when the stream is a terminal that is not dumb.
+    """
+    if mode != "auto":
+        return mode == "frames"
+    stream = stream or sys.stdout
+    if not (hasattr(stream, "isatty") and stream.isatty()):
+        return False
+    term = os.environ.get("TERM", "")
+    if os.name == "nt":
+        return term != "dumb" and bool(term or os.environ.get("WT_SESSION"))
+    return term not in ("", "dumb")
+
+def health_bar(health, max_health, width=FRAME_BAR_WIDTH, fill="#", empty="-"):
+    filled = min(width, max(0, round(width * health / max_health))) if max_health > 0 else 0
+    return fill * filled + empty * (width - filled)
+
+class FrameRenderer(EventSink):
+    """
+    I draw a battle as frames on an ANSI terminal. I am the sink for both fighters; dialogs write
+    their menu lines to me through write(), and draw() puts the frame on screen.
+    """
+
+    def __init__(self, player, wizard, stream=None, log_lines=FRAME_LOG_LINES, bar_width=FRAME_BAR_WIDTH):
+        self.player = player
+        self.wizard = wizard
+        self.stream = stream or sys.stdout
+        self.console = ConsoleSink()
+        self.log = deque(maxlen=log_lines)
+        self.log_lines = log_lines
+        self.bar_width = bar_width
+        self.menu = []
+        self.shown = []
+        self.height = 0
+        # Log lines not on screen yet and menu lines already printed, for plain output.
+        self.unseen = 0
+        self.printed = 0
+        self.size = None
+        unicode = (getattr(self.stream, "encoding", None) or "").lower().replace("-", "") == "utf8"
+        self.fill, self.empty = ("\u2588", "\u2591") if unicode else ("#", "-")
+        self.label_width = max(len(player.name), len(wizard.name), 6)
+        self.columns = 0
+
+    def emit(self, event):
+        self._log(line for line in self.console.render(event).split("\n") if line)
+
+    def _log(self, lines):
+        lines = list(lines)
+        self.log.extend(lines)
+        self.unseen += len(lines)
+
+    def write(self, text=""):
+        self.menu.extend(str(text).split("\n"))
+
+    def _bar(self, character):
+        bar = health_bar(character.health, character.max_health, self.bar_width, self.fill, self.empty)
+        return f"{character.name:<{self.label_width}} [{bar}] {max(0, character.health):>4}/{character.max_health}"
+
+    def _header(self):
+        return [f"Defeat the Evil Wizard - {type(self.player).__name__} vs Evil Wizard", "",
+                self._bar(self.player), self._bar(self.wizard), ""]
+
+    def compose(self, log_lines=None):
+        """
+        I return the frame as a list of lines, with the latest `log_lines` log lines (default: all I keep).
+        """
+        log_lines = self.log_lines if log_lines is None else log_lines
+        log = list(self.log)[max(0, len(self.log) - log_lines):] if log_lines > 0 else []
+        return self._header() + log + [""] * (log_lines - len(log)) + self.menu
+
+    def fit(self):
+        """
+        I read the terminal size and return how many log lines fit under it this time, or None
+        when the frame does not fit at all. A resize makes the next frame start from a clear screen.
+        """
+        size = shutil.get_terminal_size()
+        if size != self.size:
+            self.size = size
+            self.shown = []
+        # Longer lines would wrap and push every row below them out of place.
+        self.columns = max(20, size.columns - 1)
+        spare = size.lines - len(self._header()) - len(self.menu) - 1
+        return min(self.log_lines, spare) if spare >= FRAME_MIN_LOG_LINES else None
+
+    def draw(self):
+        """
+        I bring the screen up to date with one write and leave the cursor on the prompt row.
+        When the frame does not fit the terminal, I print plain text instead.
+        """
+        log_lines = self.fit()
+        if log_lines is None:
+            self.draw_plain()
+            return
+        lines = [line[:self.columns] for line in self.compose(log_lines)]
+        parts = [] if self.shown else ["\x1b[H\x1b[2J"]
+        for row, line in enumerate(lines):
+            if row >= len(self.shown) or self.shown[row] != line:
+                parts.append(f"\x1b[{row + 1};1H{line}\x1b[K")
+        # Rows left over from a taller frame, and the prompt row with the last reply on it.
+        for row in range(len(lines), max(self.height, len(lines) + 1)):
+            parts.append(f"\x1b[{row + 1};1H\x1b[K")
+        parts.append(f"\x1b[{len(lines) + 1};1H")
+        self.stream.write("".join(parts))
+        self.stream.flush()
+        self.shown = lines
+        self.height = len(lines) + 1
+        self.unseen = 0
+        self.printed = len(self.menu)
+
+    def draw_plain(self):
+        """
+        I print the log lines and menu lines that are not on screen yet, the way plain play does.
+        """
+        lines = list(self.log)[max(0, len(self.log) - self.unseen):] + self.menu[self.printed:]
+        self.stream.write("".join(f"{line}\n" for line in lines))
+        self.stream.flush()
+        # Whatever frame was on screen has scrolled away.
+        self.shown = []
+        self.height = 0
+        self.unseen = 0
+        self.printed = len(self.menu)
+
+    def run_dialog(self, dialog):
+        """
+        I drive a dialog like run_dialog does, but draw a frame before every prompt. Lines the
+        dialog writes after its last prompt (such as "Invalid choice") go to the log.
+        """
+        self.menu.clear()
+        self.printed = 0
+        shown = 0
+        try:
+            prompt = next(dialog)
+            while True:
+                self.draw()
+                shown = len(self.menu)
+                prompt = dialog.send(input(prompt))
+        except StopIteration as finished:
+            self._log(line for line in self.menu[shown:] if line)
+            self.menu.clear()
+            self.printed = 0
+            return finished.value
+
+    def policy(self, odds=False):
+        """
+        I return a policy that reads the player's turns through frames.
+        """
+        return lambda player, wizard: self.run_dialog(turn_dialog(player, self.write, odds))
 
-def battle(player, wizard):
+    def finish(self):
+        """
+        I draw the final frame and move below it, so the terminal scrolls normally again.
+        """
+        self.draw()
+        self.stream.write("\n")
+        self.stream.flush()
+
+# -----------------------------
+# Turn Engine
+# -----------------------------
+BattleResult = namedtuple("BattleResult", "class_name outcome turns damage_dealt damage_taken actions")
+
+def take_action(player, wizard, action, argument=None):
+    """
+    I carry out one (action, argument) pair chosen by a policy.
+    """
+    if action == "attack":
+        player.attack(wizard)
+    elif action == "ability":
+        use_special_ability(player, wizard, argument)
+    elif action == "heal":
+        player.heal(argument)
+    elif action == "stats":
+        player.display_stats()
+        wizard.display_stats()
+
+def play_round(player, wizard, action, argument=None, profiler=None):
+    """
+    I resolve one full round: my action, then the Evil Wizard's regeneration and counterattack.
+    I return (outcome, damage_dealt, damage_taken) where outcome is "victory", "defeat" or None.
+    With a Profiler, I time each phase and count every action (see Instrumentation).
+    """
+    clock = time.perf_counter
+    if profiler is not None:
+        class_name = type(player).__name__
+        player_before = player.health
+        started = clock()
+    wizard_before = wizard.health
+    take_action(player, wizard, action, argument)
+    damage_dealt = max(0, wizard_before - wizard.health)
+    if profiler is not None:
+        finished = clock()
+        key = argument if action == "ability" and argument else action
+        profiler.record_action(f"{class_name}.{key}", finished - started, damage_dealt,
+                               max(0, player.health - player_before))
+        profiler.record_phase("player_action", finished - started)
+
+    # Check if the Evil Wizard is defeated
+    if wizard.health <= 0:
+        player.emit("battle_end", "\nThe Evil Wizard {target} has been defeated by {actor}!", target=wizard, ability="victory")
+        if profiler is not None:
+            profiler.record_round(class_name, clock() - started)
+        return "victory", damage_dealt, 0
+
+    player.emit("message", "\n--- Evil Wizard's Turn ---")
+    if profiler is not None:
+        phase_started = clock()
+    wizard.regenerate()
+    if profiler is not None:
+        phase_finished = clock()
+        profiler.record_phase("regenerate", phase_finished - phase_started)
+        wizard_before = wizard.health
+    # I choose a special ability from the Evil Wizard's bonus list: at random, or with his brain
+    brain = wizard.brain
+    chosen_ability = wizard.rng.choice(WIZARD_ABILITIES) if brain is None else brain.choose(wizard, player)
+    player_before = player.health
+    chosen_ability.use(wizard, player)
+    damage_taken = max(0, player_before - player.health)
+    if profiler is not None:
+        finished = clock()
+        profiler.record_action(f"EvilWizard.{chosen_ability.name}", finished - phase_finished, damage_taken,
+                               max(0, wizard.health - wizard_before))
+        profiler.record_phase("wizard_ability", finished - phase_finished)
+        profiler.record_round(class_name, finished - started)
+    if player.health <= 0:
+        player.emit("battle_end", "\n{actor} has been defeated by the Evil Wizard {target}!", target=wizard, ability="defeat")
+        return "defeat", damage_dealt, damage_taken
+    return None, damage_dealt, damage_taken
+
+def battle(player, wizard, policy=None, max_turns=None, sink=None, rng=None, checkpoint=None, start=None,
+           effects=None, profiler=None):
     """
     I run the turn-based battle between my hero and the Evil Wizard.
     In each turn, I choose an action, and then the Evil Wizard regenerates and counterattacks.
+    Without a policy I read my actions from the keyboard; with one, the battle runs unattended.
+    I return a BattleResult; the outcome is "timeout" if max_turns runs out first, and `actions`
+    lists every (action, argument) taken so the battle can be replayed.
+    A sink or rng, if given, replaces both combatants' event sink or random stream for this battle.
+    A checkpoint, if given, is called as checkpoint(player, wizard, turns, damage_dealt, damage_taken)
+    after every round that does not end the battle, and once more with the outcome as a sixth
+    argument when the battle ends (see Checkpointer). `start` is the
+    (turns, damage_dealt, damage_taken) already played when a battle is resumed.
+    A StatusEngine as `effects` turns status effects on: fear can cost me my turn (which is not
+    recorded in `actions`), and effects run out at the end of every round.
+    A Profiler, if given, is passed on to play_round. Both sinks hear begin_turn(turns) before each turn.
+    """
+    if sink is not None:
+        player.sink = wizard.sink = sink
+    if rng is not None:
+        player.rng = wizard.rng = rng
+    if effects is not None:
+        player.effects = wizard.effects = effects
+    if policy is None:
+        policy = console_policy
+    rounds = battle_turns(player, wizard, max_turns, checkpoint, start, effects, profiler)
+    try:
+        next(rounds)
+        while True:
+            rounds.send(policy(player, wizard))
+    except StopIteration as finished:
+        return finished.value
+
+def battle_turns(player, wizard, max_turns=None, checkpoint=None, start=None, effects=None, profiler=None):
+    """
+    I am the loop of battle() as a generator, for callers that cannot answer a policy on the spot
+    (a GameSession awaits its player's reply). Whenever the hero has to choose I yield, and the
+    (action, argument) pair is sent back in; at the end I return the BattleResult. The arguments
+    mean what they mean for battle(), and the combatants' sinks, streams and effects are set already.
     """
+    turns, damage_dealt, damage_taken = start or (0, 0, 0)
+    outcome = None
+    actions = []
     while wizard.health > 0 and player.health > 0:
-        print("\n--- Your Turn ---")
-        print("1. Normal Attack")
-        print("2. Use Special Ability")
-        print("3. Heal")
-        print("4. View Stats")
-        action = input("Choose an action: ").strip()
-
-        if action == '1':
-            player.attack(wizard)
-        elif action == '2':
-            choose_special_ability(player, wizard)
-        elif action == '3':
-            try:
-                amount = int(input("Enter heal amount: "))
-                player.heal(amount)
-            except ValueError:
-                print("Invalid heal amount. Please enter an integer.")
-        elif action == '4':
-            player.display_stats()
-            wizard.display_stats()
+        if max_turns is not None and turns >= max_turns:
+            outcome = "timeout"
+            break
+        turns += 1
+        if player.sink.enabled:
+            player.sink.begin_turn(turns)
+        if wizard.sink is not player.sink and wizard.sink.enabled:
+            wizard.sink.begin_turn(turns)
+        if effects is not None and effects.loses_turn(player):
+            action, argument = "skip", None
         else:
-            print("Invalid choice. Try again.")
-
-        # Check if the Evil Wizard is defeated
-        if wizard.health <= 0:
-            print(f"\nThe Evil Wizard {wizard.name} has been defeated by {player.name}!")
+            action, argument = yield
+            actions.append((action, argument))
+        outcome, dealt, taken = play_round(player, wizard, action, argument, profiler)
+        damage_dealt += dealt
+        damage_taken += taken
+        if outcome is not None:
             break
+        if effects is not None:
+            effects.tick()
+        if checkpoint is not None:
+            checkpoint(player, wizard, turns, damage_dealt, damage_taken)
+    if checkpoint is not None and outcome is not None:
+        checkpoint(player, wizard, turns, damage_dealt, damage_taken, outcome)
+    return BattleResult(type(player).__name__, outcome, turns, damage_dealt, damage_taken, actions)
 
-        print("\n--- Evil Wizard's Turn ---")
-        wizard.regenerate()
-        # I choose a random special ability from the Evil Wizard's bonus list
-        evil_abilities = [
-            wizard.summon_minions,
-            wizard.dark_curse,
-            wizard.shadow_strike,
-            wizard.fear_induction,
-            wizard.arcane_barrier,
-            wizard.chaos_blast
-        ]
-        chosen_ability = random.choice(evil_abilities)
-        try:
-            chosen_ability(player)
-        except TypeError:
-            chosen_ability()
-        if player.health <= 0:
-            print(f"\n{player.name} has been defeated by the Evil Wizard {wizard.name}!")
-            break
+# -----------------------------
+# Seeded Streams and Replays
+# -----------------------------
+# A recorded battle is just the seed of its random stream plus the actions the player took.
+# Re-running those actions against a stream built from the same seed reproduces every roll.
+BattleRecord = namedtuple("BattleRecord", "class_name name seed actions wizard effects", defaults=("random", False))
 
-def main():
+def spawn_rng(master_seed, index, kind="mersenne"):
     """
-    I run the main game loop.
-    I introduce the adventure, create my hero, and then start the battle against the Evil Wizard.
+    I derive child stream number `index` from a master seed.
+    String seeds are hashed with SHA-512 by random.Random, so the children are independent of each
+    other and identical in every process. `kind` is one of RNG_KINDS (see Buffered Random Streams).
     """
-    # Exciting introduction to draw the player in
-    print("Welcome, brave adventurer!")
-    print("In this epic quest, you will choose a hero from an elite roster of champions, each with legendary abilities.")
-    print("Your mission is to defeat the powerful Evil Wizard who threatens to plunge the realm into darkness.")
-    print("Face challenging battles, master unique skills, and forge your destiny on the battlefield!")
-    print("Good luck, and may your hero triumph over evil!\n")
-    
-    player = create_character()
-    wizard = EvilWizard("The Dark Wizard")
-    battle(player, wizard)
-    print("Game Over.")
+    seed = f"{master_seed}/{index}"
+    return random.Random(seed) if kind == "mersenne" else make_rng(seed, kind)
+
+class ReplayPolicy:
+    """
+    I play back a recorded list of (action, argument) pairs, one per turn.
+    """
+    def __init__(self, actions):
+        self.actions = iter(actions)
+
+    def __call__(self, player, wizard):
+        try:
+            action, argument = next(self.actions)
+        except StopIteration:
+            raise ValueError("The recorded actions ran out before the battle ended.") from None
+        return action, argument
+
+def replay(record, sink=None):
+    """
+    I re-run a recorded battle without prompts and return its BattleResult.
+    Output goes to the given sink (nothing is shown by default).
+    """
+    player = CLASS_ROSTER[record.class_name](record.name)
+    wizard = EvilWizard("The Dark Wizard", wizard_brain(record.wizard))
+    return battle(player, wizard, ReplayPolicy(record.actions), sink=sink or NULL_SINK, rng=random.Random(record.seed),
+                  effects=StatusEngine() if record.effects else None)
+
+def write_json(path, data, **options):
+    """
+    I write `data` to a JSON file, replacing it in one step so a crash leaves either the old or
+    the new version. Options (indent, sort_keys) go to json.dump.
+    """
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(data, file, **options)
+        file.write("\n")
+    os.replace(temporary, path)
+
+def save_record(record, path):
+    """
+    I write a battle record to a JSON file.
+    """
+    write_json(path, record._asdict())
+
+def load_record(path):
+    """
+    I read a battle record written by save_record.
+    """
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    data["actions"] = [tuple(action) for action in data["actions"]]
+    return BattleRecord(**data)
+
+# -----------------------------
+# Buffered Random Streams
+# -----------------------------
+# A BlockRandom is a drop-in replacement for random.Random as Character.rng. Instead of running
+# randint's chain of Python calls for every roll, it keeps a buffer of ready-made offsets for each
+# range width and answers randint(low, high) with low plus one popped offset. A buffer is refilled
+# from one block of raw random bytes: bytes.translate() maps every byte to byte % width and drops
+# the few bytes that would bias the result, so a refill never loops in Python. Widths above 256
+# map 32-bit words by multiplying and shifting (Lemire's method) instead. Blocks start small and
+# double with every refill of a width, up to block_size, since many streams only live for one
+# battle. NumpyBlockRandom fills its blocks with a NumPy Generator, floats included.
+# Both are seedable and reproducible, but draw different numbers than random.Random with the same
+# seed, and a battle on one cannot be snapshotted (see Battle Snapshots).
+RNG_KINDS = ("mersenne", "block", "numpy")
+_WORD_BITS = 32
+_WORD_CODE = "I" if array("I").itemsize == 4 else "L"
+
+@functools.lru_cache(maxsize=None)
+def _byte_tables(width):
+    """
+    I return the bytes.translate() table and the bytes to delete for offsets 0..width-1.
+    """
+    limit = 256 - 256 % width
+    return bytes(value % width if value < limit else 0 for value in range(256)), bytes(range(limit, 256))
+
+class BlockRandom:
+    """
+    I serve randint(), randrange() and choice() from pre-drawn buffers, one per range width.
+    """
+    first_block = 64
+
+    def __init__(self, seed=None, block_size=1 << 16):
+        self.block_size = block_size
+        # Random.__new__ skips seeding from os.urandom; seed() seeds it right away.
+        self.source = random.Random.__new__(random.Random)
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self.source.seed(seed)
+        # width -> ready offsets; the end of each list is served first.
+        self.buffers = {}
+        self.blocks = {}
+
+    def _draw(self, width, count):
+        """
+        I return up to `count` unbiased offsets in 0..width-1 from one block of random bits.
+        """
+        if width <= 256:
+            return list(self.source.randbytes(count).translate(*_byte_tables(width)))
+        words = array(_WORD_CODE)
+        words.frombytes(self.source.getrandbits(_WORD_BITS * count).to_bytes(4 * count, "little"))
+        threshold = (1 << _WORD_BITS) % width
+        mask = (1 << _WORD_BITS) - 1
+        return [product >> _WORD_BITS for product in (word * width for word in words) if product & mask >= threshold]
+
+    def _next_block(self, key):
+        count = self.blocks[key] = min(self.block_size, 2 * self.blocks.get(key, self.first_block // 2))
+        return count
+
+    def _refill(self, width):
+        count = self._next_block(width)
+        offsets = self._draw(width, count)
+        while not offsets:
+            offsets = self._draw(width, count)
+        self.buffers[width] = offsets
+        return offsets.pop()
+
+    def randint(self, low, high):
+        try:
+            return low + self.buffers[high - low + 1].pop()
+        except (KeyError, IndexError):
+            if low > high:
+                raise ValueError(f"empty range for randint({low}, {high})") from None
+            if high - low >= 1 << _WORD_BITS:
+                return self.source.randint(low, high)
+            return low + self._refill(high - low + 1)
+
+    def randrange(self, start, stop=None):
+        if stop is None:
+            start, stop = 0, start
+        return self.randint(start, stop - 1)
+
+    def choice(self, sequence):
+        if not sequence:
+            raise IndexError("Cannot choose from an empty sequence")
+        return sequence[self.randint(0, len(sequence) - 1)]
+
+    def random(self):
+        # A single float is already one C call in random.Random, so I do not buffer them.
+        return self.source.random()
+
+    def uniform(self, low, high):
+        return low + (high - low) * self.random()
+
+    def getstate(self):
+        return (self.source.getstate(), {key: list(values) for key, values in self.buffers.items()}, dict(self.blocks))
+
+    def setstate(self, state):
+        source_state, buffers, blocks = state[:3]
+        self.source.setstate(source_state)
+        self.buffers = {key: list(values) for key, values in buffers.items()}
+        self.blocks = dict(blocks)
+
+class NumpyBlockRandom(BlockRandom):
+    """
+    I am a BlockRandom whose buffers, floats included, are filled a block at a time by a NumPy Generator.
+    """
+    def seed(self, seed=None):
+        if np is None:
+            raise RuntimeError("NumpyBlockRandom needs NumPy (pip install numpy).")
+        if seed is not None and not isinstance(seed, int):
+            # NumPy only takes integer seeds; I hash anything else the way random.Random does.
+            seed = random.Random(seed).getrandbits(128)
+        self.generator = np.random.default_rng(seed)
+        self.floats = []
+        super().seed(seed)
+
+    def _draw(self, width, count):
+        return self.generator.integers(0, width, size=count).tolist()
+
+    def random(self):
+        try:
+            return self.floats.pop()
+        except IndexError:
+            self.floats = self.generator.random(self._next_block("float")).tolist()
+            return self.floats.pop()
+
+    def getstate(self):
+        return (*super().getstate(), self.generator.bit_generator.state, list(self.floats))
+
+    def setstate(self, state):
+        super().setstate(state)
+        self.generator.bit_generator.state = state[3]
+        self.floats = list(state[4])
+
+def make_rng(seed=None, kind="mersenne"):
+    """
+    I build a random stream of one of the RNG_KINDS from a seed.
+    """
+    if kind == "mersenne":
+        return random.Random(seed)
+    if kind == "block":
+        return BlockRandom(seed)
+    if kind == "numpy":
+        return NumpyBlockRandom(seed)
+    raise ValueError(f"Unknown random stream {kind!r}; choose from {', '.join(RNG_KINDS)}.")
+
+# -----------------------------
+# Battle Snapshots
+# -----------------------------
+# A snapshot is one fixed-size little-endian record with everything a battle needs to go on:
+# both combatants (class id, flags, health, max health, attack power, name), the turn and damage
+# counters, the wizard's brain, the Mersenne Twister state of the shared random stream, the
+# outcome once the battle is over and, when status effects are on, the engine's round and every
+# active effect (stacks, expiry round, magnitude) of both combatants. Every record starts with a
+# magic tag and a format version. A checkpoint file is just records appended one after another,
+# so it can be memory-mapped and unpacked in bulk, and a record torn by a crash is simply left out.
+# The random state is 2,509 of the record's 2,842 bytes.
+SNAPSHOT_MAGIC = b"DEWS"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_NAME_BYTES = 64
+_SNAPSHOT_HEADER = "<4sHQIIIB"
+_SNAPSHOT_COMBATANT = f"BBiii{SNAPSHOT_NAME_BYTES}s"
+# Outcome id 0 means the battle is still going.
+SNAPSHOT_OUTCOMES = (None, "victory", "defeat", "timeout")
+SNAPSHOT_EFFECTS = tuple(STATUS_EFFECTS)
+_SNAPSHOT_EFFECT = "BIi"
+SNAPSHOT_RECORD = struct.Struct(_SNAPSHOT_HEADER + _SNAPSHOT_COMBATANT * 2 + "625I?d" + "B?I"
+                                + _SNAPSHOT_EFFECT * (2 * len(SNAPSHOT_EFFECTS)))
+_SNAPSHOT_BATTLE_ID = struct.Struct("<Q")
+_SNAPSHOT_BATTLE_ID_OFFSET = struct.calcsize("<4sH")
+# Position of the first field after the random state in an unpacked record.
+_SNAPSHOT_TAIL = 7 + 2 * 6 + 625 + 2
+BattleState = namedtuple("BattleState", "battle_id player wizard turn damage_dealt damage_taken outcome effects",
+                         defaults=(None, None))
+
+def _pack_combatant(character):
+    name = character.name.encode("utf-8")
+    if len(name) > SNAPSHOT_NAME_BYTES:
+        raise ValueError(f"The name {character.name!r} is longer than {SNAPSHOT_NAME_BYTES} bytes.")
+    flags = FLAG_DIVINE_SHIELD if getattr(character, "divine_shield_active", False) else 0
+    return CLASS_IDS[type(character)], flags, character.health, character.max_health, character.attack_power, name
+
+def _unpack_combatant(fields, rng):
+    class_id, flags, health, max_health, attack_power, name = fields
+    character = CLASS_BY_ID[class_id](name.rstrip(b"\0").decode("utf-8"))
+    character.health = health
+    character.max_health = max_health
+    character.attack_power = attack_power
+    if flags & FLAG_DIVINE_SHIELD:
+        character.divine_shield_active = True
+    character.rng = rng
+    return character
+
+def _pack_effects(engine, character):
+    active = engine.active.get(character, {}) if engine is not None else {}
+    fields = []
+    for name in SNAPSHOT_EFFECTS:
+        stacks, expires, _, magnitude = active.get(name, (0, 0, 0, 0))
+        fields += (stacks, expires, magnitude)
+    return fields
+
+def snapshot_battle(player, wizard, turn=0, damage_dealt=0, damage_taken=0, battle_id=0, outcome=None):
+    """
+    I pack a battle's state into one snapshot record (bytes). The random state comes from
+    player.rng, which battle() shares with the wizard, and the status effects from player.effects.
+    """
+    if isinstance(player.rng, BlockRandom):
+        raise TypeError("Snapshots record a Mersenne Twister state; this battle runs on a BlockRandom.")
+    _, internal_state, gauss_next = player.rng.getstate()
+    brain = WIZARD_BRAINS.index(wizard.brain.name) if wizard.brain is not None else 0
+    engine = player.effects
+    return SNAPSHOT_RECORD.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, battle_id, turn, damage_dealt, damage_taken, brain,
+                                *_pack_combatant(player), *_pack_combatant(wizard), *internal_state,
+                                gauss_next is not None, gauss_next or 0.0, SNAPSHOT_OUTCOMES.index(outcome),
+                                engine is not None, engine.round if engine is not None else 0,
+                                *_pack_effects(engine, player), *_pack_effects(engine, wizard))
+
+def restore_battle(buffer, offset=0):
+    """
+    I unpack the snapshot record at `offset` in `buffer` into a BattleState with fresh combatants
+    that share a restored random stream.
+    """
+    fields = SNAPSHOT_RECORD.unpack_from(buffer, offset)
+    magic, version, battle_id, turn, damage_dealt, damage_taken, brain = fields[:7]
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"No version {SNAPSHOT_VERSION} battle snapshot at offset {offset}.")
+    has_gauss, gauss_next, outcome, has_effects, effects_round = fields[_SNAPSHOT_TAIL - 2:_SNAPSHOT_TAIL + 3]
+    # Random.__new__ skips seeding from os.urandom, which would cost more than the rest of the restore.
+    rng = random.Random.__new__(random.Random)
+    rng.setstate((3, fields[19:_SNAPSHOT_TAIL - 2], gauss_next if has_gauss else None))
+    player = _unpack_combatant(fields[7:13], rng)
+    wizard = _unpack_combatant(fields[13:19], rng)
+    wizard.brain = wizard_brain(WIZARD_BRAINS[brain])
+    engine = None
+    if has_effects:
+        engine = StatusEngine()
+        engine.round = effects_round
+        player.effects = wizard.effects = engine
+        values = iter(fields[_SNAPSHOT_TAIL + 3:])
+        for character in (player, wizard):
+            for name in SNAPSHOT_EFFECTS:
+                stacks, expires, magnitude = next(values), next(values), next(values)
+                if stacks:
+                    engine.restore(character, name, stacks, expires, magnitude)
+    return BattleState(battle_id, player, wizard, turn, damage_dealt, damage_taken, SNAPSHOT_OUTCOMES[outcome], engine)
+
+class Checkpointer:
+    """
+    I append a snapshot to a checkpoint file after every `every` rounds of a battle, and a final
+    one with the outcome when it ends.
+    Pass me to battle() as its checkpoint; set battle_id before each battle when several share a file.
+    """
+    def __init__(self, path, battle_id=0, every=1):
+        self.file = open(path, "ab")
+        self.battle_id = battle_id
+        self.every = every
+
+    def __call__(self, player, wizard, turn, damage_dealt, damage_taken, outcome=None):
+        if outcome is not None or turn % self.every == 0:
+            self.file.write(snapshot_battle(player, wizard, turn, damage_dealt, damage_taken, self.battle_id, outcome))
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def load_checkpoints(path):
+    """
+    I memory-map a checkpoint file and return {battle_id: BattleState} with the latest snapshot of
+    every battle in it. Only the battle ids are read from older records.
+    """
+    size = SNAPSHOT_RECORD.size
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < size:
+            return {}
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            latest = {}
+            for offset in range(0, len(mapped) - size + 1, size):
+                battle_id, = _SNAPSHOT_BATTLE_ID.unpack_from(mapped, offset + _SNAPSHOT_BATTLE_ID_OFFSET)
+                latest[battle_id] = offset
+            return {battle_id: restore_battle(mapped, offset) for battle_id, offset in latest.items()}
+
+def resume_battle(state, policy=None, max_turns=None, sink=None, checkpoint=None):
+    """
+    I continue a restored battle where its snapshot left off and return its BattleResult.
+    Turns and damage count from the start of the battle; `actions` only holds the resumed part.
+    A battle whose last snapshot has an outcome is over: I return that result without playing.
+    Status effects carry on when the snapshot had them.
+    """
+    if state.outcome is not None:
+        return BattleResult(type(state.player).__name__, state.outcome, state.turn, state.damage_dealt,
+                            state.damage_taken, [])
+    return battle(state.player, state.wizard, policy, max_turns, sink, None, checkpoint,
+                  (state.turn, state.damage_dealt, state.damage_taken), state.effects)
+
+def benchmark_snapshots(number=10_000):
+    """
+    I compare a snapshot record with pickling the same battle: {format: (bytes, save us, restore us)}.
+    """
+    rng = random.Random(0)
+    player = Paladin("Hero")
+    wizard = EvilWizard("The Dark Wizard")
+    for character in (player, wizard):
+        character.sink = NULL_SINK
+        character.rng = rng
+    record = snapshot_battle(player, wizard, 7, 120, 80)
+    pickled = pickle.dumps((player, wizard, 7, 120, 80), protocol=pickle.HIGHEST_PROTOCOL)
+    return {
+        "snapshot": (len(record), _best_time(lambda: snapshot_battle(player, wizard, 7, 120, 80), number, 3) * 1e6,
+                     _best_time(lambda: restore_battle(record), number, 3) * 1e6),
+        "pickle": (len(pickled),
+                   _best_time(lambda: pickle.dumps((player, wizard, 7, 120, 80), pickle.HIGHEST_PROTOCOL), number, 3) * 1e6,
+                   _best_time(lambda: pickle.loads(pickled), number, 3) * 1e6)
+    }
+
+# -----------------------------
+# Battle Event Log
+# -----------------------------
+# A battle log is a directory of append-only files that a BattleLog sink fills while battles run:
+#   events.bin   one LOG_EVENT record per combat event: battle id, turn, kind, side (0 for the
+#                hero, 1 for the wizard), ability, amount and the actor's and target's health
+#                afterwards (-1 without a target; a heal has the healer's health before it).
+#                An attack made by an ability carries its name.
+#   battles.bin  one LOG_BATTLE record per battle: its first event, event count, hero class,
+#                outcome and turns. The record's position is the battle id.
+#   <field>.<name>.idx  sorted uint64 battle ids per hero class, per outcome and per ability used.
+#   meta.json    the names behind the class, ability, kind and outcome ids.
+# Records are written in that order (events, indexes, battle), so the battle record commits a
+# battle. Opening a log for writing cuts everything behind the last committed battle away.
+# BattleLogReader memory-maps the files: find() intersects the indexes by bisection and then only
+# reads the events of the candidate battles, and scan() walks the whole event file block by block.
+# Turns are numbered by battle() itself (see EventSink.begin_turn), and an event's side comes from
+# the sink it arrived through, so a hero who shares the wizard's name is still logged as the hero.
+# Turns are stored as uint32 and amounts and health as int32, so a battle may run up to 2**32 - 1
+# turns and health may reach 2**31 - 1 (tuned balance tables and max_turns=None get nowhere near
+# either); version 2 logs used 16-bit fields and are refused.
+LOG_VERSION = 3
+LOG_KINDS = ("attack", "ability_used", "heal", "regen", "defeated", "blocked", "turn_lost", "status_expired", "summoned")
+LOG_OUTCOMES = ("victory", "defeat", "timeout")
+LOG_EVENT = struct.Struct("<QIBBBxiii")
+LOG_BATTLE = struct.Struct("<QIBBI")
+LOG_INDEX_FIELDS = ("class", "outcome", "ability")
+LOG_NO_ABILITY = 255
+LogEvent = namedtuple("LogEvent", "battle turn kind side ability amount health target_health")
+LogBattle = namedtuple("LogBattle", "battle class_name outcome turns first_event events")
+
+def _log_meta():
+    return {"version": LOG_VERSION, "classes": [cls.__name__ for cls in CLASS_BY_ID],
+            "abilities": sorted({name for abilities in ABILITY_EFFECTS.values() for name in abilities}),
+            "kinds": list(LOG_KINDS), "outcomes": list(LOG_OUTCOMES)}
+
+def _read_log_meta(path):
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as file:
+        meta = json.load(file)
+    if meta["version"] != LOG_VERSION:
+        raise ValueError(f"{path} is a version {meta['version']} battle log; I read version {LOG_VERSION}.")
+    return meta
+
+def _map_file(path):
+    """
+    I memory-map a whole file read-only, or return empty bytes for an empty or missing one.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+class EventRecorder(EventSink):
+    """
+    I am a sink that turns the events of one battle at a time into LogEvents: I number the turns,
+    tell the hero's events from the wizard's and file the attacks an ability makes under it.
+    Call begin_battle(player, wizard) before a battle and end_battle(result) after it, and don't
+    hand me to battle() as its sink: begin_battle gives the hero a sink of its own, which is how I
+    know whose events are whose. I keep the current battle's LogEvents in `events`; BattleLog
+    writes them to disk instead.
+    """
+    def __init__(self):
+        self.battle_count = 0
+        self.event_count = 0
+        self.hero = None
+        self.hero_sink = HeroSink(self)
+        self.events = []
+
+    def begin_battle(self, player, wizard):
+        """
+        I start recording a new battle between `player` and `wizard`.
+        """
+        self.hero = player
+        player.sink = self.hero_sink
+        wizard.sink = self
+        self.first_event = self.event_count
+        self.turn = 0
+        # The ability each side is in the middle of using, so the attacks it makes are filed under it.
+        self.pending = [None, None]
+        self.used = set()
+        self.events = []
+
+    def begin_turn(self, turn):
+        if turn != self.turn:
+            self.turn = turn
+            self.pending[0] = self.pending[1] = None
+
+    def emit(self, event):
+        self.log_event(event, 1)
+
+    def log_event(self, event, side):
+        """
+        I log one event of the current battle for side 0 (the hero) or 1 (the wizard).
+        """
+        kind = event.kind
+        if kind not in LOG_KINDS or self.hero is None:
+            return
+        pending = self.pending
+        ability = None
+        if kind == "attack":
+            ability = pending[side]
+        elif kind == "ability_used":
+            ability = pending[side] = event.ability
+            self.used.add(ability)
+        target_health = event.target_health
+        self.record(LogEvent(self.battle_count, self.turn, kind, side, ability, event.amount or 0, event.health,
+                             -1 if target_health is None else target_health))
+        self.event_count += 1
+
+    def record(self, event):
+        self.events.append(event)
+
+    def end_battle(self, result):
+        """
+        I close the current battle with its BattleResult and return its LogBattle.
+        """
+        battle_record = LogBattle(self.battle_count, result.class_name, result.outcome, result.turns, self.first_event,
+                                  self.event_count - self.first_event)
+        self.commit(battle_record)
+        self.battle_count += 1
+        self.hero = None
+        return battle_record
+
+    def commit(self, battle_record):
+        pass
+
+class HeroSink(EventSink):
+    """
+    I pass the hero's events on to an EventRecorder, marked as the hero's.
+    """
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def emit(self, event):
+        self.recorder.log_event(event, 0)
+
+    def begin_turn(self, turn):
+        self.recorder.begin_turn(turn)
+
+class BattleLog(EventRecorder):
+    """
+    I am a sink that appends the combat events of battles to a battle log directory.
+    """
+    def __init__(self, path, buffer_size=1 << 20):
+        super().__init__()
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, "meta.json")):
+            meta = _read_log_meta(path)
+        else:
+            meta = _log_meta()
+            write_json(os.path.join(path, "meta.json"), meta)
+        self.class_ids = {name: index for index, name in enumerate(meta["classes"])}
+        self.ability_ids = {name: index for index, name in enumerate(meta["abilities"])}
+        self.kind_ids = {name: index for index, name in enumerate(meta["kinds"])}
+        self.outcome_ids = {name: index for index, name in enumerate(meta["outcomes"])}
+        self.buffer_size = buffer_size
+        self._recover()
+        self.buffer = bytearray()
+        self.battles = bytearray()
+        self.index = {}
+
+    def _recover(self):
+        """
+        I drop whatever a crash left behind the last committed battle.
+        """
+        battles_path = os.path.join(self.path, "battles.bin")
+        events_path = os.path.join(self.path, "events.bin")
+        with open(battles_path, "ab+") as file:
+            self.battle_count = file.seek(0, os.SEEK_END) // LOG_BATTLE.size
+            file.truncate(self.battle_count * LOG_BATTLE.size)
+            self.event_count = 0
+            if self.battle_count:
+                file.seek((self.battle_count - 1) * LOG_BATTLE.size)
+                first, count, *_ = LOG_BATTLE.unpack(file.read(LOG_BATTLE.size))
+                self.event_count = first + count
+        with open(events_path, "ab") as file:
+            file.truncate(self.event_count * LOG_EVENT.size)
+        for name in os.listdir(self.path):
+            if name.endswith(".idx"):
+                index_path = os.path.join(self.path, name)
+                keep = 0
+                ids = _map_file(index_path)
+                if ids:
+                    with memoryview(ids) as raw, raw.cast("Q") as view:
+                        keep = bisect.bisect_left(view, self.battle_count)
+                    ids.close()
+                with open(index_path, "ab") as file:
+                    file.truncate(keep * 8)
+
+    def record(self, event):
+        battle_id, turn, kind, side, ability, amount, health, target_health = event
+        self.buffer += LOG_EVENT.pack(battle_id, turn, self.kind_ids[kind], side,
+                                      LOG_NO_ABILITY if ability is None else self.ability_ids[ability],
+                                      amount, health, target_health)
+
+    def commit(self, battle_record):
+        self.battles += LOG_BATTLE.pack(battle_record.first_event, battle_record.events,
+                                        self.class_ids[battle_record.class_name],
+                                        self.outcome_ids[battle_record.outcome], battle_record.turns)
+        keys = [f"class.{battle_record.class_name}", f"outcome.{battle_record.outcome}"]
+        keys += [f"ability.{ability}" for ability in self.used]
+        for key in keys:
+            ids = self.index.get(key)
+            if ids is None:
+                ids = self.index[key] = array("Q")
+            ids.append(battle_record.battle)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        I write buffered events, index entries and battle records, in that order.
+        """
+        with open(os.path.join(self.path, "events.bin"), "ab") as file:
+            file.write(self.buffer)
+        for key, ids in self.index.items():
+            with open(os.path.join(self.path, key + ".idx"), "ab") as file:
+                ids.tofile(file)
+        with open(os.path.join(self.path, "battles.bin"), "ab") as file:
+            file.write(self.battles)
+        self.buffer.clear()
+        self.battles.clear()
+        self.index.clear()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class BattleLogReader:
+    """
+    I answer queries against a battle log through memory maps, without loading it into memory.
+    """
+    def __init__(self, path):
+        self.path = path
+        meta = _read_log_meta(path)
+        self.classes = meta["classes"]
+        self.abilities = meta["abilities"]
+        self.kinds = meta["kinds"]
+        self.outcomes = meta["outcomes"]
+        self._events = _map_file(os.path.join(path, "events.bin"))
+        self._battles = _map_file(os.path.join(path, "battles.bin"))
+        self._indexes = {}
+        self.battle_count = len(self._battles) // LOG_BATTLE.size
+
+    def __len__(self):
+        return self.battle_count
+
+    def battle(self, battle_id):
+        """
+        I return one battle's LogBattle record.
+        """
+        first, count, class_id, outcome, turns = LOG_BATTLE.unpack_from(self._battles, battle_id * LOG_BATTLE.size)
+        return LogBattle(battle_id, self.classes[class_id], self.outcomes[outcome], turns, first, count)
+
+    def events(self, battle):
+        """
+        I return the LogEvents of a battle (a LogBattle or a battle id), with names instead of ids.
+        """
+        if not isinstance(battle, LogBattle):
+            battle = self.battle(battle)
+        view = memoryview(self._events)[battle.first_event * LOG_EVENT.size:
+                                        (battle.first_event + battle.events) * LOG_EVENT.size]
+        return [self._event(fields) for fields in LOG_EVENT.iter_unpack(view)]
+
+    def _event(self, fields):
+        battle, turn, kind, side, ability, amount, health, target_health = fields
+        return LogEvent(battle, turn, self.kinds[kind], side, self.abilities[ability] if ability != LOG_NO_ABILITY else None,
+                        amount, health, target_health)
+
+    def index(self, field, name):
+        """
+        I return the sorted battle ids filed under one index (e.g. "class", "Rogue") as a memoryview.
+        """
+        if field not in LOG_INDEX_FIELDS:
+            raise ValueError(f"Unknown index {field!r}; choose from {', '.join(LOG_INDEX_FIELDS)}.")
+        key = f"{field}.{name}"
+        if key not in self._indexes:
+            ids = _map_file(os.path.join(self.path, key + ".idx"))
+            self._indexes[key] = memoryview(ids).cast("Q") if ids else memoryview(array("Q"))
+        return self._indexes[key]
+
+    def battle_ids(self, class_name=None, outcome=None, ability=None):
+        """
+        I yield, in order, the ids of the battles that match every given index.
+        I walk the shortest index and look the others up by bisection.
+        """
+        indexes = [self.index(field, name) for field, name in
+                   (("class", class_name), ("outcome", outcome), ("ability", ability)) if name is not None]
+        if not indexes:
+            yield from range(self.battle_count)
+            return
+        indexes.sort(key=len)
+        shortest, others = indexes[0], indexes[1:]
+        for battle_id in shortest:
+            if battle_id >= self.battle_count:
+                break
+            for ids in others:
+                position = bisect.bisect_left(ids, battle_id)
+                if position == len(ids) or ids[position] != battle_id:
+                    break
+            else:
+                yield battle_id
+
+    def find(self, class_name=None, outcome=None, ability=None, max_turns=None, min_hits=0, where=None):
+        """
+        I yield the LogBattles that match the indexes, last at most max_turns turns, in which
+        `ability` landed (dealt damage) at least min_hits times, and for which where(battle, events)
+        is true. Events are only read for battles that pass the cheaper tests.
+        """
+        if ability is not None and min_hits:
+            ability_id = self.abilities.index(ability)
+            attack = self.kinds.index("attack")
+        for battle_id in self.battle_ids(class_name, outcome, ability):
+            battle = self.battle(battle_id)
+            if max_turns is not None and battle.turns > max_turns:
+                continue
+            if ability is not None and min_hits:
+                view = memoryview(self._events)[battle.first_event * LOG_EVENT.size:
+                                                (battle.first_event + battle.events) * LOG_EVENT.size]
+                hits = sum(1 for _, _, kind, _, used, amount, _, _ in LOG_EVENT.iter_unpack(view)
+                           if kind == attack and used == ability_id and amount > 0)
+                if hits < min_hits:
+                    continue
+            if where is not None and not where(battle, self.events(battle)):
+                continue
+            yield battle
+
+    def scan(self, block_events=65_536):
+        """
+        I yield every LogEvent in the log, reading the event file one block at a time.
+        """
+        size = LOG_EVENT.size
+        total = len(self._events) // size
+        for start in range(0, total, block_events):
+            view = memoryview(self._events)[start * size:min(total, start + block_events) * size]
+            for fields in LOG_EVENT.iter_unpack(view):
+                yield self._event(fields)
+
+    def close(self):
+        self._indexes.clear()
+        for mapped in (self._events, self._battles):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def log_battles(path, battles, classes=None, policy="random", seed=0, max_turns=200, brain="random"):
+    """
+    I play `battles` seeded battles per class and append them to the battle log at `path`.
+    Battle i of every class uses the stream spawn_rng(seed, i), like the simulator.
+    I return (battles logged, events logged).
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    strategy = POLICIES[policy]
+    with BattleLog(path) as log:
+        first_battle, first_event = log.battle_count, log.event_count
+        for class_name in classes or CLASS_ROSTER:
+            cls = CLASS_ROSTER[class_name]
+            for index in range(battles):
+                player, wizard = cls("Hero"), EvilWizard("The Dark Wizard", wizard_brain(brain))
+                log.begin_battle(player, wizard)
+                result = battle(player, wizard, strategy, max_turns, rng=spawn_rng(seed, index))
+                log.end_battle(result)
+        return log.battle_count - first_battle, log.event_count - first_event
+
+# -----------------------------
+# Streaming Analytics
+# -----------------------------
+# The analytics pipeline is a chain of generators over (LogBattle, [LogEvent, ...]) pairs, one
+# pair per battle, so it never holds more than one battle's events. simulated_battles() plays
+# battles through an EventRecorder and logged_battles() reads them back from a battle log; both
+# feed analyze(), which folds them into a BattleAnalytics and yields a snapshot every `every`
+# battles. BattleAnalytics keeps exact counters per class and per ability ("Rogue.backstab",
+# "EvilWizard.chaos_blast") and HDR-style histograms for damage per landed hit, turns to victory
+# ("time to kill") and turns to defeat. Snapshots are JSON-ready dicts, and merge_analytics() adds
+# them together, so worker processes send back snapshots instead of events.
+ANALYTICS_VERSION = 1
+HISTOGRAM_BITS = 7
+
+class Histogram:
+    """
+    I count non-negative integers in log-linear buckets, like an HDR histogram: values below
+    2**bits get a bucket each, and larger ones share buckets at most 2**(1 - bits) of their size
+    wide. Histograms with the same `bits` merge by adding their counts.
+    """
+    __slots__ = ("bits", "counts", "count", "total", "min", "max")
+
+    def __init__(self, bits=HISTOGRAM_BITS):
+        self.bits = bits
+        self.counts = {}
+        self.count = self.total = 0
+        self.min = self.max = None
+
+    def bucket(self, value):
+        shift = value.bit_length() - self.bits
+        if shift <= 0:
+            return value
+        return (shift << (self.bits - 1)) + (value >> shift)
+
+    def bounds(self, bucket):
+        """
+        I give the smallest and largest value that fall into a bucket.
+        """
+        half = 1 << (self.bits - 1)
+        if bucket < 2 * half:
+            return bucket, bucket
+        shift, mantissa = divmod(bucket - half, half)
+        return (half + mantissa) << shift, ((half + mantissa + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        bucket = self.bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.bits != self.bits:
+            raise ValueError("Only histograms with the same number of bits can be merged.")
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction):
+        """
+        I estimate the value below which `fraction` of the recorded values fall.
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                low, high = self.bounds(bucket)
+                return min(max((low + high) / 2, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"bits": self.bits, "counts": {str(bucket): count for bucket, count in sorted(self.counts.items())},
+                "count": self.count, "total": self.total, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["bits"])
+        histogram.counts = {int(bucket): count for bucket, count in data["counts"].items()}
+        histogram.count, histogram.total = data["count"], data["total"]
+        histogram.min, histogram.max = data["min"], data["max"]
+        return histogram
+
+def _new_class_analytics():
+    return {"battles": 0, "wins": 0, "timeouts": 0, "turns": 0, "heal_requested": 0, "heal_effective": 0,
+            "time_to_kill": Histogram(), "time_to_defeat": Histogram()}
+
+def _new_ability_analytics():
+    return {"uses": 0, "hits": 0, "damage": 0, "damage_per_hit": Histogram()}
+
+class BattleAnalytics:
+    """
+    I fold battles, one (LogBattle, events) pair at a time, into counters and histograms.
+    """
+    def __init__(self):
+        self.battles = 0
+        self.events = 0
+        self.classes = {}
+        self.abilities = {}
+
+    def add(self, battle_record, events):
+        """
+        I take one battle into account.
+        """
+        class_name = battle_record.class_name
+        stats = self.classes.get(class_name)
+        if stats is None:
+            stats = self.classes[class_name] = _new_class_analytics()
+        stats["battles"] += 1
+        stats["turns"] += battle_record.turns
+        if battle_record.outcome == "victory":
+            stats["wins"] += 1
+            stats["time_to_kill"].record(battle_record.turns)
+        elif battle_record.outcome == "defeat":
+            stats["time_to_defeat"].record(battle_record.turns)
+        else:
+            stats["timeouts"] += 1
+        actors = (class_name, "EvilWizard")
+        abilities = self.abilities
+        for event in events:
+            kind, side = event.kind, event.side
+            if kind == "attack" or kind == "ability_used":
+                key = f"{actors[side]}.{event.ability or 'attack'}"
+                ability = abilities.get(key)
+                if ability is None:
+                    ability = abilities[key] = _new_ability_analytics()
+                if kind == "ability_used":
+                    ability["uses"] += 1
+                else:
+                    if event.ability is None:
+                        ability["uses"] += 1
+                    if event.amount > 0:
+                        ability["hits"] += 1
+                        ability["damage"] += event.amount
+                        ability["damage_per_hit"].record(event.amount)
+            elif kind == "heal" and side == 0:
+                # A heal logs the hero's health before it as target_health, so overhealing is exact.
+                stats["heal_requested"] += event.amount
+                stats["heal_effective"] += event.health - event.target_health
+        self.battles += 1
+        self.events += len(events)
+
+    def snapshot(self):
+        """
+        I return my state as a JSON-ready dict.
+        """
+        def plain(stats):
+            return {field: value.to_dict() if isinstance(value, Histogram) else value for field, value in stats.items()}
+        return {"version": ANALYTICS_VERSION, "battles": self.battles, "events": self.events,
+                "classes": {name: plain(stats) for name, stats in sorted(self.classes.items())},
+                "abilities": {name: plain(stats) for name, stats in sorted(self.abilities.items())}}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        if snapshot["version"] != ANALYTICS_VERSION:
+            raise ValueError(f"Analytics snapshot version {snapshot['version']} is not {ANALYTICS_VERSION}.")
+        def live(stats):
+            return {field: Histogram.from_dict(value) if isinstance(value, dict) else value for field, value in stats.items()}
+        analytics = cls()
+        analytics.battles, analytics.events = snapshot["battles"], snapshot["events"]
+        analytics.classes = {name: live(stats) for name, stats in snapshot["classes"].items()}
+        analytics.abilities = {name: live(stats) for name, stats in snapshot["abilities"].items()}
+        return analytics
+
+    def merge(self, other):
+        """
+        I add another BattleAnalytics (for example a worker's) into myself.
+        """
+        self.battles += other.battles
+        self.events += other.events
+        for mine, theirs, new in ((self.classes, other.classes, _new_class_analytics),
+                                  (self.abilities, other.abilities, _new_ability_analytics)):
+            for name, stats in theirs.items():
+                target = mine.setdefault(name, new())
+                for field, value in stats.items():
+                    if isinstance(value, Histogram):
+                        target[field].merge(value)
+                    else:
+                        target[field] += value
+        return self
+
+def merge_analytics(*snapshots):
+    """
+    I add analytics snapshots together into a new snapshot.
+    """
+    merged = BattleAnalytics()
+    for snapshot in snapshots:
+        merged.merge(BattleAnalytics.from_snapshot(snapshot))
+    return merged.snapshot()
+
+def simulated_battles(class_name, start, stop, policy="random", seed=0, max_turns=200, brain="random"):
+    """
+    I play battles start..stop-1 of one class (battle i on spawn_rng(seed, i), like the simulator)
+    and yield each one's (LogBattle, events) as soon as it ends.
+    """
+    cls = CLASS_ROSTER[class_name]
+    strategy = POLICIES[policy]
+    recorder = EventRecorder()
+    for index in range(start, stop):
+        player, wizard = cls("Hero"), EvilWizard("The Dark Wizard", wizard_brain(brain))
+        recorder.begin_battle(player, wizard)
+        result = battle(player, wizard, strategy, max_turns, rng=spawn_rng(seed, index))
+        yield recorder.end_battle(result), recorder.events
+
+def logged_battles(path):
+    """
+    I yield the (LogBattle, events) of every battle in a battle log, reading it through memory maps.
+    """
+    with BattleLogReader(path) as reader:
+        for battle_id in range(len(reader)):
+            battle_record = reader.battle(battle_id)
+            yield battle_record, reader.events(battle_record)
+
+def analyze(battles, every=None, analytics=None):
+    """
+    I fold a stream of (LogBattle, events) pairs into a BattleAnalytics and yield a snapshot after
+    every `every` battles and once more at the end.
+    """
+    analytics = analytics or BattleAnalytics()
+    for count, (battle_record, events) in enumerate(battles, 1):
+        analytics.add(battle_record, events)
+        if every and count % every == 0:
+            yield analytics.snapshot()
+    yield analytics.snapshot()
+
+def _analytics_chunk(task):
+    """
+    I analyze one chunk of simulated battles in a worker and return only the snapshot.
+    """
+    class_name, start, stop, policy, seed, max_turns, brain = task
+    for snapshot in analyze(simulated_battles(class_name, start, stop, policy, seed, max_turns, brain)):
+        pass
+    return snapshot
+
+def analyze_simulations(battles, classes=None, policy="random", workers=None, chunk_size=None, seed=0,
+                        max_turns=200, wizard="random"):
+    """
+    I analyze `battles` simulated battles per class across worker processes and yield the merged
+    snapshot every time a chunk comes back; the last one covers every battle.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    class_names = list(classes) if classes else list(CLASS_ROSTER)
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, battles // (workers * 4))
+    wizard_brain(wizard)
+    tasks = [(class_name, start, min(start + chunk_size, battles), policy, seed, max_turns, wizard)
+             for class_name in class_names for start in range(0, battles, chunk_size)]
+    merged = BattleAnalytics()
+    if workers == 1:
+        chunks = map(_analytics_chunk, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=load_balance, initargs=(balance_table(),))
+        chunks = executor.map(_analytics_chunk, tasks)
+    try:
+        for snapshot in chunks:
+            yield merged.merge(BattleAnalytics.from_snapshot(snapshot)).snapshot()
+    finally:
+        if workers != 1:
+            executor.shutdown(cancel_futures=True)
+
+def print_analytics(snapshot, limit=15):
+    """
+    I print time to kill and heal efficiency per class and damage percentiles of the busiest abilities.
+    """
+    analytics = BattleAnalytics.from_snapshot(snapshot)
+    print(f"{'Class':<10} {'Battles':>8} {'Win %':>7} {'TTK p50':>8} {'p90':>6} {'p99':>6} {'Heal eff.':>9}")
+    for class_name, stats in analytics.classes.items():
+        ttk = stats["time_to_kill"]
+        cells = [ttk.percentile(fraction) for fraction in (0.5, 0.9, 0.99)]
+        efficiency = stats["heal_effective"] / stats["heal_requested"] * 100 if stats["heal_requested"] else None
+        print(f"{class_name:<10} {stats['battles']:>8} {stats['wins'] / stats['battles'] * 100:>6.1f}% "
+              + " ".join(f"{cell:>{width}.0f}" if cell is not None else f"{'-':>{width}}"
+                         for cell, width in zip(cells, (8, 6, 6)))
+              + (f" {efficiency:>8.1f}%" if efficiency is not None else f" {'-':>9}"))
+    print()
+    print(f"{'Ability':<32} {'Uses':>9} {'Hits':>9} {'Mean':>6} {'p50':>5} {'p90':>5} {'p99':>5}")
+    busiest = sorted(analytics.abilities.items(), key=lambda item: -item[1]["hits"])[:limit]
+    for name, stats in busiest:
+        damage = stats["damage_per_hit"]
+        if not damage.count:
+            continue
+        print(f"{name:<32} {stats['uses']:>9} {stats['hits']:>9} {damage.mean():>6.1f} "
+              + " ".join(f"{damage.percentile(fraction):>5.0f}" for fraction in (0.5, 0.9, 0.99)))
+
+# -----------------------------
+# Instrumentation
+# -----------------------------
+# Profiling is opt-in: battle(..., profiler=Profiler()) hands the profiler to play_round, which
+# then times each phase and counts every action; without one it only skips a few checks per round.
+# Damage and healing per action go into the mergeable Histograms of Streaming Analytics.
+# Snapshots are plain dicts, so worker processes can send theirs back and the parent can merge them.
+PROFILE_PHASES = ("player_action", "regenerate", "wizard_ability")
+
+def _new_action_stats():
+    return {"calls": 0, "seconds": 0.0, "damage": 0, "healing": 0,
+            "damage_histogram": Histogram(), "healing_histogram": Histogram()}
+
+def _action_snapshot(stats):
+    return {field: value.to_dict() if isinstance(value, Histogram) else value for field, value in stats.items()}
+
+class Profiler:
+    """
+    I count calls, damage, healing (totals and histograms) and wall time per action, per class and
+    per battle phase of the battles I am given to.
+    """
+    def __init__(self):
+        self.actions = {}
+        self.classes = {}
+        self.phases = {phase: {"calls": 0, "seconds": 0.0} for phase in PROFILE_PHASES}
+
+    def record_action(self, key, seconds, damage, healing):
+        stats = self.actions.get(key)
+        if stats is None:
+            stats = self.actions[key] = _new_action_stats()
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        if damage > 0:
+            stats["damage"] += damage
+            stats["damage_histogram"].record(damage)
+        if healing > 0:
+            stats["healing"] += healing
+            stats["healing_histogram"].record(healing)
+
+    def record_phase(self, phase, seconds):
+        stats = self.phases[phase]
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+
+    def record_round(self, class_name, seconds):
+        stats = self.classes.get(class_name)
+        if stats is None:
+            stats = self.classes[class_name] = {"rounds": 0, "seconds": 0.0}
+        stats["rounds"] += 1
+        stats["seconds"] += seconds
+
+    def snapshot(self):
+        """
+        I return my counters as a JSON-ready dict (a deep copy).
+        """
+        actions = {key: _action_snapshot(stats) for key, stats in self.actions.items()}
+        return json.loads(json.dumps({"actions": actions, "classes": self.classes, "phases": self.phases}))
+
+    def dump(self, path):
+        write_json(path, self.snapshot(), indent=2, sort_keys=True)
+
+def merge_snapshots(*snapshots):
+    """
+    I add profiler snapshots together (for example one per worker process) into a new snapshot.
+    """
+    merged = Profiler().snapshot()
+    for snapshot in snapshots:
+        for key, stats in snapshot["actions"].items():
+            target = merged["actions"].get(key)
+            if target is None:
+                target = merged["actions"][key] = _action_snapshot(_new_action_stats())
+            for field in ("calls", "seconds", "damage", "healing"):
+                target[field] += stats[field]
+            for field in ("damage_histogram", "healing_histogram"):
+                target[field] = Histogram.from_dict(target[field]).merge(Histogram.from_dict(stats[field])).to_dict()
+        for section in ("classes", "phases"):
+            for key, stats in snapshot[section].items():
+                target = merged[section].setdefault(key, dict.fromkeys(stats, 0))
+                for field, value in stats.items():
+                    target[field] += value
+    return merged
+
+def print_profile(snapshot, limit=15):
+    """
+    I print phase timings and the busiest actions of a profiler snapshot.
+    """
+    for phase, stats in snapshot["phases"].items():
+        mean = stats["seconds"] / stats["calls"] * 1e6 if stats["calls"] else 0.0
+        print(f"{phase:<16} {stats['calls']:>10} calls {mean:>8.2f} us/call")
+    print(f"\n{'Action':<32} {'Calls':>10} {'us/call':>8} {'Avg dmg':>8} {'Avg heal':>8}")
+    ranked = sorted(snapshot["actions"].items(), key=lambda item: -item[1]["calls"])
+    for key, stats in ranked[:limit]:
+        calls = stats["calls"]
+        print(f"{key:<32} {calls:>10} {stats['seconds'] / calls * 1e6:>8.2f} "
+              f"{stats['damage'] / calls:>8.2f} {stats['healing'] / calls:>8.2f}")
+
+# -----------------------------
+# Headless Batch Simulator
+# -----------------------------
+# I fan seeded battles out across worker processes. Each worker runs a chunk of battles for one
+# class with a NullSink and sends back only running totals, so the parent never has to hold
+# per-battle results and throughput grows with the number of cores.
+def _new_totals():
+    return {"battles": 0, "wins": 0, "timeouts": 0, "turns": 0, "damage_dealt": 0, "damage_taken": 0}
+
+def _simulate_chunk(task):
+    """
+    I run battles start..stop-1 for one class and return their totals.
+    Battle i gets its own stream spawn_rng(seed, i, rng_kind), so a run is reproducible no matter how it is chunked.
+    """
+    class_name, start, stop, policy_name, seed, max_turns, profile, brain_name, effects, rng_kind = task
+    cls = CLASS_ROSTER[class_name]
+    policy = POLICIES[policy_name]
+    brain = wizard_brain(brain_name)
+    totals = _new_totals()
+    profiler = Profiler() if profile else None
+    for index in range(start, stop):
+        result = battle(cls("Hero"), EvilWizard("The Dark Wizard", brain), policy, max_turns, NULL_SINK,
+                        spawn_rng(seed, index, rng_kind), effects=StatusEngine() if effects else None,
+                        profiler=profiler)
+        totals["battles"] += 1
+        totals["wins"] += result.outcome == "victory"
+        totals["timeouts"] += result.outcome == "timeout"
+        totals["turns"] += result.turns
+        totals["damage_dealt"] += result.damage_dealt
+        totals["damage_taken"] += result.damage_taken
+    if profiler is None:
+        return class_name, totals, None
+    return class_name, totals, profiler.snapshot()
+
+def run_simulations(battles, classes=None, policy="random", workers=None, chunk_size=None, seed=0, max_turns=200,
+                    profile=None, wizard="random", effects=False, rng="mersenne", start=0, cache=None):
+    """
+    I simulate `battles` headless battles for every requested class and return a summary per class.
+    workers=1 runs everything in this process; otherwise a ProcessPoolExecutor gets chunks of
+    chunk_size battles (by default about four chunks per worker and class).
+    If `profile` is a dict, every worker profiles its chunks and the merged snapshot is stored in it.
+    `wizard` names the Evil Wizard's brain (see WIZARD_BRAINS); `effects` turns status effects on.
+    `rng` is the kind of random stream every battle gets (see RNG_KINDS).
+    The battles are numbers start .. start + battles - 1. With a SimulationCache, only the battles
+    it does not already hold are played (see Simulation Cache), and each class's summary says how
+    many were `cached`. Profiled runs play every battle and leave the cache alone.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    if wizard not in WIZARD_BRAINS:
+        raise ValueError(f"Unknown wizard brain {wizard!r}; choose from {', '.join(WIZARD_BRAINS)}.")
+    if rng not in RNG_KINDS:
+        raise ValueError(f"Unknown random stream {rng!r}; choose from {', '.join(RNG_KINDS)}.")
+    class_names = list(classes) if classes else list(CLASS_ROSTER)
+    for class_name in class_names:
+        if class_name not in CLASS_ROSTER:
+            raise ValueError(f"Unknown class {class_name!r}.")
+    workers = workers or os.cpu_count() or 1
+    if profile is not None:
+        cache = None
+    totals = {class_name: _new_totals() for class_name in class_names}
+    cached = dict.fromkeys(class_names, 0)
+    gaps = {class_name: [(start, start + battles)] for class_name in class_names}
+    if cache is not None:
+        keys = {class_name: simulation_key(class_name, policy, wizard, seed, max_turns, effects, rng)
+                for class_name in class_names}
+        for class_name in class_names:
+            found, gaps[class_name] = cache.lookup(keys[class_name], start, start + battles)
+            totals[class_name] = found
+            cached[class_name] = found["battles"]
+    missing = sum(stop - first for ranges in gaps.values() for first, stop in ranges)
+    if chunk_size is None:
+        chunk_size = max(1, missing // (len(class_names) * workers * 4))
+    if missing and policy == "optimal":
+        # I solve (or load) every table once here, so the workers do not all solve the same class.
+        for class_name in class_names:
+            optimal_solver(class_name)
+    wizard_brain(wizard)
+
+    tasks = [
+        (class_name, first, min(first + chunk_size, stop), policy, seed, max_turns, profile is not None, wizard, effects,
+         rng)
+        for class_name in class_names
+        for gap_start, stop in gaps[class_name]
+        for first in range(gap_start, stop, chunk_size)
+    ]
+    # I add every chunk into the gap it came from as well, so each gap can be cached on its own.
+    played = {(class_name, gap): _new_totals() for class_name in class_names for gap in gaps[class_name]}
+    owners = [(task[0], next(gap for gap in gaps[task[0]] if gap[0] <= task[1] < gap[1])) for task in tasks]
+    if workers == 1 or not tasks:
+        chunks = map(_simulate_chunk, tasks)
+    else:
+        # Workers get the current balance explicitly, in case it was loaded from a file.
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=load_balance, initargs=(balance_table(),))
+        chunks = executor.map(_simulate_chunk, tasks)
+    try:
+        snapshots = []
+        for owner, (class_name, chunk, snapshot) in zip(owners, chunks):
+            for key, value in chunk.items():
+                totals[class_name][key] += value
+                played[owner][key] += value
+            if snapshot is not None:
+                snapshots.append(snapshot)
+    finally:
+        if workers != 1 and tasks:
+            executor.shutdown()
+    if cache is not None:
+        for (class_name, (first, stop)), gap_totals in played.items():
+            cache.store(keys[class_name], first, stop, gap_totals)
+        for class_name in class_names:
+            # A run that stitched pieces together is also kept whole, so the next one needs one row.
+            if cached[class_name] and gaps[class_name]:
+                cache.store(keys[class_name], start, start + battles, totals[class_name])
+        cache.evict()
+
+    if profile is not None:
+        profile.update(merge_snapshots(*snapshots))
+    summary = {}
+    for class_name, total in totals.items():
+        count = total["battles"] or 1
+        summary[class_name] = dict(
+            total,
+            cached=cached[class_name],
+            win_rate=total["wins"] / count,
+            avg_turns=total["turns"] / count,
+            avg_damage_dealt=total["damage_dealt"] / count,
+            avg_damage_taken=total["damage_taken"] / count
+        )
+    return summary
+
+def print_simulation_summary(summary):
+    """
+    I print one line per class with its win rate, average battle length and damage totals.
+    """
+    print(f"{'Class':<10} {'Battles':>8} {'Win %':>7} {'Turns':>6} {'Dealt':>10} {'Taken':>10} {'Timeouts':>8}")
+    for class_name, stats in summary.items():
+        print(f"{class_name:<10} {stats['battles']:>8} {stats['win_rate'] * 100:>6.1f}% {stats['avg_turns']:>6.1f} "
+              f"{stats['damage_dealt']:>10} {stats['damage_taken']:>10} {stats['timeouts']:>8}")
+
+# -----------------------------
+# Simulation Cache
+# -----------------------------
+# The same simulations get rerun constantly, and battle i of a run only depends on its class, the
+# balance, the policy, the wizard's brain, the rules and spawn_rng(seed, i). So a SimulationCache
+# keeps the totals of battle ranges [start, stop) in SQLite, under a key hashed from all of those.
+# The key includes the class's and the Evil Wizard's stats and ability table, so changing a stat
+# constant, loading another balance or bumping SIM_CACHE_VERSION (for rule changes in code) simply
+# stops old rows from matching; they age out through eviction. Totals are sums, so a lookup
+# covers the requested range with stored pieces and returns the gaps still to be played: asking
+# for battles 0-1M after 0-500k plays only 500k-1M. Every row remembers when it was last used, and
+# evict() drops the least recently used rows beyond `max_rows`.
+SIM_CACHE_VERSION = 1
+SIM_CACHE_PATH = "simulation_cache.sqlite"
+SIM_CACHE_ROWS = 10_000
+SIM_CACHE_FIELDS = tuple(_new_totals())
+
+def simulation_key(class_name, policy="random", wizard="random", seed=0, max_turns=200, effects=False,
+                   rng="mersenne"):
+    """
+    I hash everything a class's simulated battles depend on, except which battles they are.
+    """
+    fighters = [(name, CLASS_STATS[name], sorted((ability, list(effect)) for ability, effect in
+                                                 ABILITY_EFFECTS.get(cls, {}).items()))
+                for name, cls in ((class_name, CLASS_ROSTER[class_name]), ("EvilWizard", EvilWizard))]
+    text = json.dumps([SIM_CACHE_VERSION, fighters, policy, wizard, str(seed), max_turns, effects, rng],
+                      sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class SimulationCache:
+    """
+    I keep simulation totals for battle ranges in an SQLite file. Use me as a context manager or
+    call close(); run_simulations(..., cache=cache) does the lookups and stores.
+    """
+
+    def __init__(self, path=SIM_CACHE_PATH, max_rows=SIM_CACHE_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SIM_CACHE_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS ranges")
+            self.connection.execute(f"PRAGMA user_version = {SIM_CACHE_VERSION}")
+        columns = ", ".join(f"{field} INTEGER NOT NULL" for field in SIM_CACHE_FIELDS)
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS ranges (key TEXT NOT NULL, start INTEGER NOT NULL, "
+                                f"stop INTEGER NOT NULL, {columns}, used REAL NOT NULL, PRIMARY KEY (key, start, stop))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ranges_used ON ranges (used)")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM ranges").fetchone()[0]
+
+    def lookup(self, key, start, stop):
+        """
+        I add up stored ranges inside [start, stop) and return (totals, gaps), where gaps are the
+        (start, stop) ranges no stored row covers. At every point I take the row that starts
+        first, and the longest of those, so a stitched-together range wins over its pieces.
+        """
+        totals = _new_totals()
+        gaps = []
+        position = start
+        used = []
+        rows = self.connection.execute(
+            f"SELECT start, stop, {', '.join(SIM_CACHE_FIELDS)} FROM ranges "
+            "WHERE key = ? AND start >= ? AND stop <= ? ORDER BY start, stop DESC", (key, start, stop))
+        for row in rows:
+            first, last = row[0], row[1]
+            if first < position:
+                continue
+            if first > position:
+                gaps.append((position, first))
+            for field, value in zip(SIM_CACHE_FIELDS, row[2:]):
+                totals[field] += value
+            used.append((time.time(), key, first, last))
+            position = last
+        if position < stop:
+            gaps.append((position, stop))
+        with self.connection:
+            self.connection.executemany("UPDATE ranges SET used = ? WHERE key = ? AND start = ? AND stop = ?", used)
+        return totals, gaps
+
+    def store(self, key, start, stop, totals):
+        """
+        I save the totals of battles start .. stop - 1.
+        """
+        if stop <= start:
+            return
+        with self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO ranges (key, start, stop, {', '.join(SIM_CACHE_FIELDS)}, used) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(SIM_CACHE_FIELDS))}, ?)",
+                (key, start, stop, *(totals[field] for field in SIM_CACHE_FIELDS), time.time()))
+
+    def evict(self):
+        """
+        I drop the least recently used rows until at most max_rows are left, and return how many went.
+        """
+        excess = len(self) - self.max_rows
+        if excess <= 0:
+            return 0
+        with self.connection:
+            self.connection.execute("DELETE FROM ranges WHERE rowid IN "
+                                    "(SELECT rowid FROM ranges ORDER BY used LIMIT ?)", (excess,))
+        return excess
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM ranges")
+
+    def close(self):
+        self.connection.close()
+
+# -----------------------------
+# Paired Comparisons
+# -----------------------------
+# Two classes' win rates measured with independent battles need huge samples, because most of
+# the noise comes from the Evil Wizard's rolls. compare_classes() uses common random numbers
+# instead: in battle i the wizard draws his abilities and damage from his own stream,
+# spawn_rng(f"{seed}/wizard", i), and every class under test meets the same wizard stream. The hero
+# draws from spawn_rng(f"{seed}/hero", i). Each battle is played a second time with an
+# AntitheticRandom hero, whose rolls mirror the first ones (low damage becomes high damage). The
+# wizard is mirrored in that battle as well, still shared by all classes: against the unmirrored
+# wizard the two battles share his luck, which made the pair noisier than two independent
+# battles. A class's result for index i is the mean of the two battles, and the difference
+# between two classes is taken index by index, so shared luck cancels out.
+# Workers only send back sums, and the report gives paired confidence intervals and the gain:
+# how many times more independent battles per class plain sampling would need for the same
+# interval width.
+class AntitheticRandom(random.Random):
+    """
+    I mirror every draw of random.Random seeded the same way: randint(a, b) returns a + b - x where
+    random.Random would return x, choice() counts from the other end and random() returns 1 - u.
+    """
+
+    def _randbelow(self, n):
+        return n - 1 - super()._randbelow(n)
+
+    def random(self):
+        value = super().random()
+        # 1 - u would be 1.0 for u = 0.0, which random() must never return.
+        return 1.0 - value if value else 0.0
+
+def _paired_chunk(task):
+    """
+    I play indexes start..stop-1 for every class, each once with plain streams and once mirrored,
+    and return sums per class and per pair of classes (see compare_classes).
+    """
+    class_names, start, stop, policy_name, seed, max_turns, brain_name, effects = task
+    policy = POLICIES[policy_name]
+    brain = wizard_brain(brain_name)
+    classes = {name: {"plain": 0, "mirrored": 0, "squares": 0.0} for name in class_names}
+    pairs = {pair: {"total": 0.0, "squares": 0.0, "plain_total": 0, "plain_squares": 0}
+             for pair in itertools.combinations(class_names, 2)}
+    for index in range(start, stop):
+        plain = {}
+        means = {}
+        for class_name in class_names:
+            wins = []
+            for stream in (random.Random, AntitheticRandom):
+                player = CLASS_ROSTER[class_name]("Hero")
+                wizard = EvilWizard("The Dark Wizard", brain)
+                player.rng = stream(f"{seed}/hero/{index}")
+                wizard.rng = stream(f"{seed}/wizard/{index}")
+                result = battle(player, wizard, policy, max_turns, NULL_SINK,
+                                effects=StatusEngine() if effects else None)
+                wins.append(int(result.outcome == "victory"))
+            plain[class_name] = wins[0]
+            means[class_name] = (wins[0] + wins[1]) / 2
+            stats = classes[class_name]
+            stats["plain"] += wins[0]
+            stats["mirrored"] += wins[1]
+            stats["squares"] += means[class_name] ** 2
+        for (first, second), stats in pairs.items():
+            difference = means[first] - means[second]
+            stats["total"] += difference
+            stats["squares"] += difference ** 2
+            plain_difference = plain[first] - plain[second]
+            stats["plain_total"] += plain_difference
+            stats["plain_squares"] += plain_difference ** 2
+    return stop - start, classes, pairs
+
+def _sample_variance(count, total, squares):
+    if count < 2:
+        return 0.0
+    return max(0.0, (squares - total * total / count) / (count - 1))
+
+def _gain(naive, paired):
+    return naive / paired if paired else float("inf")
+
+def compare_classes(classes, pairs=10_000, policy="random", seed=0, max_turns=200, wizard="random", effects=False,
+                    workers=None, chunk_size=None, confidence=0.95):
+    """
+    I compare classes with common random numbers and antithetic draws over `pairs` indexes,
+    so every class plays 2 * pairs battles. I return {"classes": {...}, "pairs": [...]}:
+    per class the win rate, its confidence interval and the gain from the antithetic pairs; per
+    pair of classes the difference in win rate (first minus second), its paired confidence
+    interval, the gain over independent battles with common random numbers alone ("crn_gain")
+    and with the antithetic pairs as well ("gain"), and the independent battles per class that
+    would match the interval ("effective_battles").
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    if wizard not in WIZARD_BRAINS:
+        raise ValueError(f"Unknown wizard brain {wizard!r}; choose from {', '.join(WIZARD_BRAINS)}.")
+    class_names = list(dict.fromkeys(classes))
+    if len(class_names) < 2:
+        raise ValueError("Give at least two classes to compare.")
+    for class_name in class_names:
+        if class_name not in CLASS_ROSTER:
+            raise ValueError(f"Unknown class {class_name!r}.")
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, pairs // (workers * 4))
+    if policy == "optimal":
+        for class_name in class_names:
+            optimal_solver(class_name)
+    tasks = [(class_names, start, min(start + chunk_size, pairs), policy, seed, max_turns, wizard, effects)
+             for start in range(0, pairs, chunk_size)]
+    count = 0
+    class_sums = {name: {"plain": 0, "mirrored": 0, "squares": 0.0} for name in class_names}
+    pair_sums = {pair: {"total": 0.0, "squares": 0.0, "plain_total": 0, "plain_squares": 0}
+                 for pair in itertools.combinations(class_names, 2)}
+    if workers == 1:
+        chunks = map(_paired_chunk, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=load_balance, initargs=(balance_table(),))
+        chunks = executor.map(_paired_chunk, tasks)
+    try:
+        for chunk_count, chunk_classes, chunk_pairs in chunks:
+            count += chunk_count
+            for sums, chunk_sums in itertools.chain(zip(class_sums.values(), chunk_classes.values()),
+                                                    zip(pair_sums.values(), chunk_pairs.values())):
+                for key, value in chunk_sums.items():
+                    sums[key] += value
+    finally:
+        if workers != 1:
+            executor.shutdown()
+
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    report = {"pairs": count, "battles_per_class": 2 * count, "confidence": confidence, "classes": {},
+              "comparisons": []}
+    bernoulli = {}
+    for class_name, sums in class_sums.items():
+        wins = sums["plain"] + sums["mirrored"]
+        rate = wins / (2 * count) if count else 0.0
+        bernoulli[class_name] = rate * (1 - rate)
+        variance = _sample_variance(count, wins / 2, sums["squares"]) / max(count, 1)
+        half_width = z * math.sqrt(variance)
+        report["classes"][class_name] = {
+            "win_rate": rate, "low": rate - half_width, "high": rate + half_width,
+            "antithetic_gain": _gain(bernoulli[class_name] / max(2 * count, 1), variance)
+        }
+    for (first, second), sums in pair_sums.items():
+        difference = sums["total"] / count if count else 0.0
+        variance = _sample_variance(count, sums["total"], sums["squares"]) / max(count, 1)
+        plain_variance = _sample_variance(count, sums["plain_total"], sums["plain_squares"]) / max(count, 1)
+        naive = bernoulli[first] + bernoulli[second]
+        gain = _gain(naive / max(2 * count, 1), variance)
+        half_width = z * math.sqrt(variance)
+        report["comparisons"].append({
+            "first": first, "second": second, "difference": difference,
+            "low": difference - half_width, "high": difference + half_width,
+            "crn_gain": _gain(naive / max(count, 1), plain_variance), "gain": gain,
+            "effective_battles": gain * 2 * count
+        })
+    return report
+
+def print_comparison(report):
+    """
+    I print the per-class win rates and the paired differences of a compare_classes report.
+    """
+    percent = round(report["confidence"] * 100)
+    print(f"{report['pairs']} antithetic pairs ({report['battles_per_class']} battles) per class\n")
+    print(f"{'Class':<10} {'Win %':>7} {f'{percent}% CI':>17} {'Antithetic gain':>16}")
+    for class_name, stats in report["classes"].items():
+        print(f"{class_name:<10} {stats['win_rate'] * 100:>6.2f}% [{stats['low'] * 100:>6.2f}, {stats['high'] * 100:>6.2f}] "
+              f"{stats['antithetic_gain']:>15.2f}x")
+    print(f"\n{'Comparison':<22} {'Diff %':>7} {f'{percent}% CI':>17} {'CRN gain':>9} {'Gain':>7} {'Effective':>12}")
+    for row in report["comparisons"]:
+        name = f"{row['first']} - {row['second']}"
+        print(f"{name:<22} {row['difference'] * 100:>+7.2f} [{row['low'] * 100:>+6.2f}, {row['high'] * 100:>+6.2f}] "
+              f"{row['crn_gain']:>8.2f}x {row['gain']:>6.2f}x {row['effective_battles']:>12,.0f}")
+
+# -----------------------------
+# Balance Tuning
+# -----------------------------
+# The balance is the CLASS_STATS table plus every ability's bonus range in ABILITY_EFFECTS. It is
+# saved as JSON {"classes": {name: {"health": h, "attack_power": a}}, "abilities": {name: {ability: [min, max]}}},
+# and load_balance() accepts the whole table or any part of it.
+# tune_balance() searches it with successive halving: every class starts with a set of perturbed
+# candidates, all candidates play the same seeded battles, and after each rung only the best third
+# survive to play more battles. Only ability ranges that change health or attack power are tuned;
+# a strike's bonus only changes the damage number that is printed.
+TUNABLE_EFFECTS = ("heal", "drain", "sacrifice", "focus")
+
+def balance_table():
+    """
+    I return the current balance as a JSON-ready dict.
+    """
+    return {
+        "classes": {name: dict(stats) for name, stats in CLASS_STATS.items()},
+        "abilities": {cls.__name__: {name: list(bonus) for name, (effect, hits, bonus) in abilities.items() if bonus}
+                      for cls, abilities in ABILITY_EFFECTS.items()}
+    }
+
+def load_balance(table):
+    """
+    I replace class stats and ability bonus ranges with those in `table` (a dict or a JSON file path)
+    and rebuild the ability registry. Characters created afterwards use the new numbers.
+    """
+    global WIZARD_ABILITIES
+    if isinstance(table, (str, os.PathLike)):
+        with open(table, encoding="utf-8") as file:
+            table = json.load(file)
+    classes = dict(CLASS_ROSTER, EvilWizard=EvilWizard, Minion=Minion)
+    for name, stats in table.get("classes", {}).items():
+        if name not in classes:
+            raise ValueError(f"Unknown class {name!r} in balance table.")
+        CLASS_STATS[name] = {"health": int(stats["health"]), "attack_power": int(stats["attack_power"])}
+    for name, bonuses in table.get("abilities", {}).items():
+        if name not in classes:
+            raise ValueError(f"Unknown class {name!r} in balance table.")
+        abilities = ABILITY_EFFECTS.get(classes[name], {})
+        for ability, (low, high) in bonuses.items():
+            if ability not in abilities:
+                raise ValueError(f"{name} has no ability {ability!r}.")
+            if not 0 <= low <= high:
+                raise ValueError(f"Bad bonus range {low}..{high} for {name}.{ability}.")
+            effect, hits, _ = abilities[ability]
+            abilities[ability] = (effect, hits, (int(low), int(high)))
+    # I update the registry dicts in place, so code holding a reference to them sees the new ranges.
+    ABILITY_REGISTRY.update(_build_ability_registry())
+    for cls, specs in ABILITY_REGISTRY.items():
+        ABILITY_LOOKUP[cls] = {spec.name: spec for spec in specs}
+    WIZARD_ABILITIES = ABILITY_REGISTRY[EvilWizard]
+    # Solved optimal-play tables, wizard brains and damage distributions belong to the old balance.
+    _OPTIMAL_SOLVERS.clear()
+    wizard_brain.cache_clear()
+    for cache in (ability_damage_pmf, ability_damage_stats, ability_sampler, ability_menu):
+        cache.cache_clear()
+
+def save_balance(path, table=None):
+    """
+    I write a balance table (the current one by default) to `path` as JSON.
+    """
+    write_json(path, balance_table() if table is None else table, indent=2)
+
+def _class_balance(table, class_name):
+    """
+    I cut the part of a balance table that belongs to one class.
+    """
+    return {"classes": {class_name: table["classes"][class_name]},
+            "abilities": {class_name: table["abilities"].get(class_name, {})}}
+
+def _perturb_balance(table, class_name, rng, spread):
+    """
+    I make one candidate for a class: health, attack power and every tunable bonus range are
+    scaled by independent factors drawn from 1 +/- spread.
+    """
+    cls = CLASS_ROSTER[class_name]
+    stats = table["classes"][class_name]
+    candidate = {
+        "classes": {class_name: {key: max(1, round(value * rng.uniform(1 - spread, 1 + spread)))
+                                 for key, value in stats.items()}},
+        "abilities": {class_name: {}}
+    }
+    for name, (effect, hits, bonus) in ABILITY_EFFECTS.get(cls, {}).items():
+        if bonus is None:
+            continue
+        low, high = table["abilities"][class_name].get(name, bonus)
+        if effect in TUNABLE_EFFECTS:
+            scale = rng.uniform(1 - spread, 1 + spread)
+            low = max(1, round(low * scale))
+            high = max(low, round(high * scale))
+        candidate["abilities"][class_name][name] = [low, high]
+    return candidate
+
+def _evaluate_candidate(task):
+    """
+    I run battles start..stop-1 for one candidate table and return (key, wins, battles).
+    The candidate is loaded for the duration of the chunk and the previous balance restored afterwards.
+    """
+    key, candidate, class_name, start, stop, policy, seed, max_turns = task
+    saved = balance_table()
+    load_balance(candidate)
+    try:
+        _, totals, _ = _simulate_chunk((class_name, start, stop, policy, seed, max_turns, False, "random", False, "mersenne"))
+    finally:
+        load_balance(saved)
+    return key, totals["wins"], totals["battles"]
+
+def _band_loss(win_rate, band):
+    """
+    I score a win rate: 0 inside the target band, otherwise its distance from the band.
+    """
+    low, high = band
+    return max(low - win_rate, 0.0, win_rate - high)
+
+def tune_balance(band=(0.45, 0.55), classes=None, candidates=27, eta=3, min_battles=200, max_battles=5400,
+                 rounds=2, spread=0.25, workers=None, seed=0, policy="random", max_turns=200):
+    """
+    I search each hero class's stats, against the current Evil Wizard, toward a win rate inside
+    `band` and return (table, report).
+    Every round runs one successive-halving search per class around the best table so far, with
+    half the spread of the round before. A rung plays the next battles of the common seed range for
+    all surviving candidates of all classes in parallel, then keeps the best 1/eta of each class;
+    the battle count grows by eta per rung up to max_battles. The current stats are always a
+    candidate, so a class that is already in the band stays as it is. The module's own balance is
+    left untouched; load the returned table to use it.
+    report[class_name] is (win_rate, battles) of the chosen candidate.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    class_names = list(classes) if classes else list(CLASS_ROSTER)
+    for class_name in class_names:
+        if class_name not in CLASS_ROSTER:
+            raise ValueError(f"Unknown class {class_name!r}.")
+    rng = random.Random(seed)
+    table = balance_table()
+    report = {}
+    workers = workers or os.cpu_count() or 1
+    # Workers get the current balance explicitly, in case it was loaded from a file.
+    executor = (ProcessPoolExecutor(max_workers=workers, initializer=load_balance, initargs=(table,))
+                if workers != 1 else None)
+    try:
+        for round_index in range(rounds):
+            round_spread = spread / 2 ** round_index
+            # pool[class_name][key] = [candidate, wins, battles]
+            pool = {}
+            for class_name in class_names:
+                pool[class_name] = {0: [_class_balance(table, class_name), 0, 0]}
+                for key in range(1, candidates):
+                    pool[class_name][key] = [_perturb_balance(table, class_name, rng, round_spread), 0, 0]
+            played, target = 0, min_battles
+            while True:
+                tasks = []
+                for class_name, entries in pool.items():
+                    for key, (candidate, _, _) in entries.items():
+                        for start in range(played, target, max(1, min_battles // 2)):
+                            stop = min(start + max(1, min_battles // 2), target)
+                            tasks.append(((class_name, key), candidate, class_name, start, stop, policy, seed, max_turns))
+                results = executor.map(_evaluate_candidate, tasks) if executor else map(_evaluate_candidate, tasks)
+                for (class_name, key), wins, battles in results:
+                    pool[class_name][key][1] += wins
+                    pool[class_name][key][2] += battles
+                played = target
+                finished = True
+                for class_name, entries in pool.items():
+                    ranked = sorted(entries.items(), key=lambda item: (_band_loss(item[1][1] / item[1][2], band), item[0]))
+                    keep = max(1, len(ranked) // eta)
+                    pool[class_name] = dict(ranked[:keep])
+                    finished &= keep == 1
+                if finished or played >= max_battles:
+                    break
+                target = min(played * eta, max_battles)
+            for class_name, entries in pool.items():
+                key, (candidate, wins, battles) = min(
+                    entries.items(), key=lambda item: (_band_loss(item[1][1] / item[1][2], band), item[0]))
+                table["classes"].update(candidate["classes"])
+                table["abilities"].update(candidate["abilities"])
+                report[class_name] = (wins / battles, battles)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return table, report
+
+# -----------------------------
+# Tournament
+# -----------------------------
+# A tournament plays every class in the class menu against every wizard brain for `seeds` seeds.
+# Battle k of the matrix is (class k // (brains * seeds), brain (k // seeds) % brains, seed k % seeds),
+# and seed s uses the stream spawn_rng(master_seed, s) in every pairing, so the classes and brains
+# face the same dice. Workers play contiguous batches of battles and return one summary row per
+# battle. The parent appends each batch to the CSV file in a single write and updates running
+# totals per (class, brain). After every batch it atomically rewrites a small progress file with
+# the number of finished batches, the CSV size and the totals. A restarted tournament truncates
+# the CSV back to that size and continues with the next batch.
+TOURNAMENT_COLUMNS = ("battle", "class_name", "wizard", "seed", "outcome", "turns", "damage_dealt", "damage_taken")
+TOURNAMENT_VERSION = 1
+
+def _tournament_batch(task):
+    """
+    I play battles start..stop-1 of a tournament matrix and return their rows.
+    """
+    start, stop, class_names, brains, seeds, policy_name, master_seed, max_turns = task
+    policy = POLICIES[policy_name]
+    rows = []
+    for index in range(start, stop):
+        pairing, seed = divmod(index, seeds)
+        class_index, brain_index = divmod(pairing, len(brains))
+        class_name, brain_name = class_names[class_index], brains[brain_index]
+        wizard = EvilWizard("The Dark Wizard", wizard_brain(brain_name))
+        result = battle(CLASS_ROSTER[class_name]("Hero"), wizard, policy, max_turns, NULL_SINK, spawn_rng(master_seed, seed))
+        rows.append((index, class_name, brain_name, seed, result.outcome, result.turns,
+                     result.damage_dealt, result.damage_taken))
+    return rows
+
+def run_tournament(path, seeds, brains=None, policy="random", batch_size=1000, workers=None, seed=0,
+                   max_turns=200, progress_path=None, overwrite=False):
+    """
+    I run (or resume) a tournament that writes its rows to the CSV file at `path` and return
+    (totals, finished batches, all batches), where totals is {"class_name/wizard": totals}. Progress
+    is kept in `progress_path` (path + ".progress.json" by default). Resuming with a different
+    configuration raises ValueError. `brains` defaults to all of WIZARD_BRAINS.
+    A non-empty CSV without a progress file is not mine to resume: I raise FileExistsError
+    unless `overwrite` is set.
+    """
+    brains = list(brains or WIZARD_BRAINS)
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    for brain in brains:
+        if brain not in WIZARD_BRAINS:
+            raise ValueError(f"Unknown wizard brain {brain!r}; choose from {', '.join(WIZARD_BRAINS)}.")
+    progress_path = progress_path or path + ".progress.json"
+    class_names = [cls.__name__ for cls in CLASS_MENU.values()]
+    config = {"version": TOURNAMENT_VERSION, "classes": class_names, "brains": brains, "seeds": seeds,
+              "policy": policy, "batch_size": batch_size, "seed": seed, "max_turns": max_turns,
+              "balance": balance_fingerprint()}
+    total = len(class_names) * len(brains) * seeds
+    batches = -(-total // batch_size)
+
+    progress = {"config": config, "batches": 0, "csv_bytes": 0,
+                "totals": {f"{class_name}/{brain}": _new_totals() for class_name in class_names for brain in brains}}
+    if os.path.exists(progress_path):
+        with open(progress_path, encoding="utf-8") as file:
+            saved = json.load(file)
+        if saved["config"] != config:
+            raise ValueError(f"{progress_path} belongs to a tournament with a different configuration.")
+        progress = saved
+    elif not overwrite and os.path.exists(path) and os.path.getsize(path) > 0:
+        raise FileExistsError(f"{path} is not empty and has no progress file {progress_path}; "
+                              "pass overwrite=True (--overwrite) to start it over.")
+
+    with open(path, "ab") as output:
+        # Rows of a batch that was being written when the last run stopped are dropped.
+        output.truncate(progress["csv_bytes"])
+        output.seek(progress["csv_bytes"])
+        if progress["csv_bytes"] == 0:
+            output.write((",".join(TOURNAMENT_COLUMNS) + "\r\n").encode("utf-8"))
+            progress["csv_bytes"] = output.tell()
+        tasks = ((start, min(start + batch_size, total), class_names, tuple(brains), seeds, policy, seed, max_turns)
+                 for start in range(progress["batches"] * batch_size, total, batch_size))
+        for brain in brains:
+            wizard_brain(brain)
+        workers = workers or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=load_balance,
+                                       initargs=(balance_table(),)) if workers != 1 else None
+
+        def commit(batch):
+            rows = batch.result() if executor else _tournament_batch(batch)
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            output.write(buffer.getvalue().encode("utf-8"))
+            output.flush()
+            for _, class_name, brain, _, outcome, turns, dealt, taken in rows:
+                totals = progress["totals"][f"{class_name}/{brain}"]
+                totals["battles"] += 1
+                totals["wins"] += outcome == "victory"
+                totals["timeouts"] += outcome == "timeout"
+                totals["turns"] += turns
+                totals["damage_dealt"] += dealt
+                totals["damage_taken"] += taken
+            progress["batches"] += 1
+            progress["csv_bytes"] = output.tell()
+            write_json(progress_path, progress)
+
+        try:
+            # I keep at most two batches per worker in flight, so finished rows never pile up in memory.
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(_tournament_batch, task) if executor else task)
+                if len(pending) >= 2 * workers:
+                    commit(pending.popleft())
+            while pending:
+                commit(pending.popleft())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    return progress["totals"], progress["batches"], batches
+
+def print_tournament(totals, brains):
+    """
+    I print the win-rate matrix: one row per class, one column per wizard brain.
+    """
+    class_names = list(dict.fromkeys(key.split("/")[0] for key in totals))
+    print(f"{'Class':<10} " + " ".join(f"{brain:>10}" for brain in brains))
+    for class_name in class_names:
+        cells = []
+        for brain in brains:
+            stats = totals[f"{class_name}/{brain}"]
+            cells.append(f"{stats['wins'] / (stats['battles'] or 1) * 100:>9.1f}%")
+        print(f"{class_name:<10} " + " ".join(cells))
+
+# -----------------------------
+# Raid Mode
+# -----------------------------
+# A raid pits a party of heroes (any Character subclasses, up to thousands of them) against a group
+# of Evil Wizards. In a raid, Summon Minions really summons: MINIONS_PER_SUMMON minions join the
+# wizards' side, up to MINION_LIMIT living minions per wizard. A round is two batches: every living
+# hero acts once, then every living wizard and minion. Units summoned or killed during a batch are
+# picked up by the next one.
+# Each side keeps its living units in a RaidSide, which answers the targeting rules without
+# scanning: "lowest" (least health) and "threat" (most damage dealt so far, attack power before
+# the first hit) come from heaps, and "random" from a list with O(1) swap-removal. Heap entries go
+# stale when a unit's health or threat changes or it dies; a changed unit gets a fresh entry and
+# stale ones are dropped when they reach the top, or all at once when they outnumber the living.
+# So every action costs O(log n) in the size of the raid.
+RAID_TARGETS = ("lowest", "threat", "random")
+MINIONS_PER_SUMMON = 2
+MINION_LIMIT = 6
+
+RaidResult = namedtuple("RaidResult", "outcome rounds actions heroes_left enemies_left minions_summoned damage_dealt damage_taken")
+
+class RaidSide:
+    """
+    I index the living units of one side of a raid for the targeting rules in RAID_TARGETS.
+    """
+    def __init__(self, units=()):
+        self.alive = []
+        self.position = {}
+        self.threat = {}
+        # The health each unit was last entered in health_heap with.
+        self.recorded = {}
+        # (health, serial, unit) and (-threat, serial, unit); the serial breaks ties between units.
+        self.health_heap = []
+        self.threat_heap = []
+        self.serial = 0
+        for unit in units:
+            self.add(unit)
+
+    def __len__(self):
+        return len(self.alive)
+
+    def _push(self, heap, key, unit):
+        self.serial += 1
+        heapq.heappush(heap, (key, self.serial, unit))
+        if len(heap) > 2 * len(self.alive) + 64:
+            self._compact()
+
+    def _compact(self):
+        """
+        I rebuild both heaps from the living units, dropping every stale entry.
+        """
+        self.health_heap = []
+        self.threat_heap = []
+        for unit in self.alive:
+            self.serial += 1
+            self.health_heap.append((unit.health, self.serial, unit))
+            self.threat_heap.append((-self.threat[unit], self.serial, unit))
+        heapq.heapify(self.health_heap)
+        heapq.heapify(self.threat_heap)
+
+    def add(self, unit):
+        """
+        I add a living unit to my side.
+        """
+        self.position[unit] = len(self.alive)
+        self.alive.append(unit)
+        self.threat[unit] = unit.attack_power
+        self.recorded[unit] = unit.health
+        self._push(self.health_heap, unit.health, unit)
+        self._push(self.threat_heap, -unit.attack_power, unit)
+
+    def remove(self, unit):
+        """
+        I take a dead unit off my side: the last living unit moves into its place.
+        """
+        index = self.position.pop(unit)
+        last = self.alive.pop()
+        if last is not unit:
+            self.alive[index] = last
+            self.position[last] = index
+        del self.threat[unit]
+        del self.recorded[unit]
+
+    def update(self, unit):
+        """
+        I re-index a unit whose health may have changed, or remove it if it died.
+        I return True if the unit is still alive.
+        """
+        if unit not in self.position:
+            return False
+        if unit.health <= 0:
+            self.remove(unit)
+            return False
+        if self.recorded[unit] != unit.health:
+            self.recorded[unit] = unit.health
+            self._push(self.health_heap, unit.health, unit)
+        return True
+
+    def add_threat(self, unit, amount):
+        """
+        I raise a living unit's threat by the damage it just dealt.
+        """
+        if amount > 0 and unit in self.position:
+            self.threat[unit] += amount
+            self._push(self.threat_heap, -self.threat[unit], unit)
+
+    def pick(self, rule, rng):
+        """
+        I return the unit a targeting rule selects, or None if my side is wiped out.
+        """
+        if not self.alive:
+            return None
+        if rule == "random":
+            return self.alive[rng.randrange(len(self.alive))]
+        if rule == "lowest":
+            heap, current = self.health_heap, self.recorded
+        elif rule == "threat":
+            heap, current = self.threat_heap, self.threat
+        else:
+            raise ValueError(f"Unknown targeting rule {rule!r}; choose from {', '.join(RAID_TARGETS)}.")
+        sign = -1 if rule == "threat" else 1
+        while True:
+            key, _, unit = heap[0]
+            if current.get(unit) == key * sign:
+                return unit
+            heapq.heappop(heap)
+
+class Raid:
+    """
+    I run one raid: a party of heroes against Evil Wizards and the minions they summon.
+    """
+    def __init__(self, heroes, wizards, policy=None, hero_target="lowest", wizard_target="threat", sink=None,
+                 rng=None, effects=None):
+        for rule in (hero_target, wizard_target):
+            if rule not in RAID_TARGETS:
+                raise ValueError(f"Unknown targeting rule {rule!r}; choose from {', '.join(RAID_TARGETS)}.")
+        self.policy = policy or random_ability_policy
+        self.hero_target = hero_target
+        self.wizard_target = wizard_target
+        self.sink = sink or NULL_SINK
+        self.rng = rng or random.Random()
+        self.effects = effects
+        for unit in (*heroes, *wizards):
+            self._enlist(unit)
+        for wizard in wizards:
+            wizard.raid = self
+        self.heroes = RaidSide(heroes)
+        self.enemies = RaidSide(wizards)
+        # Living minions per wizard, and how many were summoned in all.
+        self.minions = {}
+        self.summoned = 0
+        self.rounds = self.actions = self.damage_dealt = self.damage_taken = 0
+
+    def _enlist(self, unit):
+        unit.sink = self.sink
+        unit.rng = self.rng
+        unit.effects = self.effects
+
+    def summon(self, wizard):
+        """
+        I add `wizard`'s freshly summoned minions to the enemy side, up to MINION_LIMIT alive at once.
+        """
+        living = self.minions.get(wizard, 0)
+        count = min(MINIONS_PER_SUMMON, MINION_LIMIT - living)
+        for _ in range(count):
+            self.summoned += 1
+            minion = Minion(f"Minion {self.summoned}", wizard)
+            self._enlist(minion)
+            self.enemies.add(minion)
+            minion.emit("summoned", "{actor} answers the call of {target}!", target=wizard)
+        self.minions[wizard] = living + count
+
+    def _hit(self, side, unit):
+        """
+        I re-index a unit after it was acted on and forget a minion that died.
+        """
+        if not side.update(unit) and isinstance(unit, Minion) and unit.master is not None:
+            self.minions[unit.master] -= 1
+
+    def _hero_batch(self):
+        heroes, enemies, policy, effects = self.heroes, self.enemies, self.policy, self.effects
+        for hero in list(heroes.alive):
+            if not enemies:
+                return
+            if hero.health <= 0 or (effects is not None and effects.loses_turn(hero)):
+                continue
+            target = enemies.pick(self.hero_target, self.rng)
+            action, argument = policy(hero, target)
+            before = target.health
+            take_action(hero, target, action, argument)
+            dealt = max(0, before - target.health)
+            self.actions += 1
+            self.damage_dealt += dealt
+            self._hit(enemies, target)
+            heroes.update(hero)
+            heroes.add_threat(hero, dealt)
+
+    def _enemy_batch(self):
+        heroes, enemies, effects = self.heroes, self.enemies, self.effects
+        for enemy in list(enemies.alive):
+            if not heroes:
+                return
+            if enemy.health <= 0 or (effects is not None and effects.loses_turn(enemy)):
+                continue
+            target = heroes.pick(self.wizard_target, self.rng)
+            before = target.health
+            if type(enemy) is Minion:
+                enemy.attack(target)
+            else:
+                enemy.regenerate()
+                brain = enemy.brain
+                ability = self.rng.choice(WIZARD_ABILITIES) if brain is None else brain.choose(enemy, target)
+                ability.use(enemy, target)
+            dealt = max(0, before - target.health)
+            self.actions += 1
+            self.damage_taken += dealt
+            heroes.update(target)
+            self._hit(enemies, enemy)
+            enemies.add_threat(enemy, dealt)
+
+    def play(self, max_rounds=None):
+        """
+        I play rounds until one side is wiped out or max_rounds runs out, and return a RaidResult.
+        """
+        outcome = "timeout"
+        while max_rounds is None or self.rounds < max_rounds:
+            self.rounds += 1
+            self._hero_batch()
+            if not self.enemies:
+                outcome = "victory"
+                break
+            self._enemy_batch()
+            if not self.heroes:
+                outcome = "defeat"
+                break
+            if self.effects is not None:
+                self.effects.tick()
+        return RaidResult(outcome, self.rounds, self.actions, len(self.heroes), len(self.enemies), self.summoned,
+                          self.damage_dealt, self.damage_taken)
+
+def raid_party(size, classes=None):
+    """
+    I build a party of `size` heroes, cycling through the given class names (default: all classes).
+    """
+    class_names = list(classes or CLASS_ROSTER)
+    return [CLASS_ROSTER[class_names[index % len(class_names)]](f"{class_names[index % len(class_names)]} {index + 1}")
+            for index in range(size)]
+
+def run_raid(heroes, wizards, classes=None, policy="random", hero_target="lowest", wizard_target="threat",
+             brain="random", seed=None, max_rounds=500, sink=None, effects=False, rng="mersenne"):
+    """
+    I build a party of `heroes` heroes and `wizards` Evil Wizards, play one raid and return its RaidResult.
+    The whole raid shares one random stream of the kind `rng` (see RNG_KINDS).
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    party = raid_party(heroes, classes)
+    enemies = [EvilWizard(f"Evil Wizard {index + 1}", wizard_brain(brain)) for index in range(wizards)]
+    raid = Raid(party, enemies, POLICIES[policy], hero_target, wizard_target, sink, make_rng(seed, rng),
+                StatusEngine() if effects else None)
+    return raid.play(max_rounds)
+
+def benchmark_raid(sizes=(10, 100, 1000, 10_000), wizard_ratio=20, rounds=20, seed=0):
+    """
+    I time the first `rounds` rounds of raids of growing size (one wizard per `wizard_ratio` heroes)
+    and return {heroes: microseconds per action}, so the per-action cost can be watched as n grows.
+    """
+    results = {}
+    for size in sizes:
+        party = raid_party(size)
+        enemies = [EvilWizard(f"Evil Wizard {index + 1}") for index in range(max(1, size // wizard_ratio))]
+        for wizard in enemies:
+            # Tough enough that both sides are still standing after `rounds` rounds.
+            wizard.health = wizard.max_health = wizard.health * wizard_ratio * rounds
+        raid = Raid(party, enemies, attack_policy, rng=random.Random(seed))
+        started = time.perf_counter()
+        result = raid.play(rounds)
+        results[size] = (time.perf_counter() - started) / max(1, result.actions) * 1e6
+    return results
+
+# -----------------------------
+# Vectorized Battle Engine (NumPy)
+# -----------------------------
+# Action codes the vectorized engine stores per battle; ability codes are 0..5.
+_VEC_ATTACK = -1
+_VEC_HEAL = -2
+
+def _roll_attacks(generator, attack_power, hits):
+    """
+    I roll `hits` normal attacks for every selected battle at once (attack_power ± 5, never below 0).
+    """
+    if hits > 1 and attack_power.min() >= 5:
+        # One alias-table draw per battle covers every hit (see Damage Distributions).
+        return hits * (attack_power - 5) + attack_offset_sampler(hits).sample_array(generator, len(attack_power))
+    low = np.maximum(0, attack_power - 5)
+    total = np.zeros_like(attack_power)
+    for _ in range(hits):
+        total += generator.integers(low, attack_power + 6)
+    return total
+
+def _apply_effect(generator, spec, sel, user_hp, user_max, user_ap, target_hp):
+    """
+    I apply one ability's effect (see ABILITY_EFFECTS) to the battles indexed by sel.
+    """
+    kind, hits, bonus = spec.effect, spec.hits, spec.bonus
+    if kind in ("strike", "drain"):
+        target_hp[sel] = np.maximum(0, target_hp[sel] - _roll_attacks(generator, user_ap[sel], hits))
+    if kind == "none" or bonus is None:
+        return
+    roll = generator.integers(bonus[0], bonus[1] + 1, size=len(sel))
+    if kind == "heal":
+        user_hp[sel] = np.minimum(user_max, user_hp[sel] + roll)
+    elif kind == "drain":
+        user_hp[sel] = np.minimum(user_max, user_hp[sel] + roll // 2)
+    elif kind == "sacrifice":
+        user_hp[sel] = np.maximum(0, user_hp[sel] - roll)
+    elif kind == "focus":
+        user_ap[sel] += roll
+
+def simulate_vectorized(class_name, battles, policy="random", seed=0, max_turns=200, batch_size=100_000):
+    """
+    I play `battles` battles of one class against the Evil Wizard with NumPy, batch_size at a time.
+    Health and attack power live in arrays with one slot per running battle; each turn rolls every
+    attack, bonus, regeneration and wizard ability for all of them at once and drops the battles
+    that ended. The policies mirror the scalar ones in POLICIES, so the returned summary (the same
+    keys as run_simulations, plus a turn-count histogram) follows the same distribution as battle().
+    """
+    if np is None:
+        raise RuntimeError("The vectorized engine needs NumPy (pip install numpy).")
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}; choose from {', '.join(POLICIES)}.")
+    if policy == "optimal":
+        raise ValueError("The vectorized engine has no optimal policy; use the process engine.")
+    cls = CLASS_ROSTER[class_name]
+    hero = cls("Hero")
+    wizard = EvilWizard("The Dark Wizard")
+    effects = ABILITY_REGISTRY.get(cls, ())
+    wizard_effects = WIZARD_ABILITIES
+    generator = np.random.default_rng(seed)
+
+    totals = _new_totals()
+    turn_histogram = np.zeros(max_turns + 1, dtype=np.int64)
+    for batch_start in range(0, battles, batch_size):
+        size = min(batch_size, battles - batch_start)
+        player_hp = np.full(size, hero.health, dtype=np.int64)
+        player_ap = np.full(size, hero.attack_power, dtype=np.int64)
+        wizard_hp = np.full(size, wizard.health, dtype=np.int64)
+        wizard_ap = np.full(size, wizard.attack_power, dtype=np.int64)
+        dealt = np.zeros(size, dtype=np.int64)
+        taken = np.zeros(size, dtype=np.int64)
+
+        def finish(ended, won):
+            # I fold the battles that just ended into the totals and drop them from the active arrays.
+            nonlocal player_hp, player_ap, wizard_hp, wizard_ap, dealt, taken
+            count = int(ended.sum())
+            if count:
+                totals["battles"] += count
+                totals["wins"] += count if won else 0
+                totals["turns"] += count * turn
+                totals["damage_dealt"] += int(dealt[ended].sum())
+                totals["damage_taken"] += int(taken[ended].sum())
+                turn_histogram[turn] += count
+                keep = ~ended
+                player_hp, player_ap = player_hp[keep], player_ap[keep]
+                wizard_hp, wizard_ap = wizard_hp[keep], wizard_ap[keep]
+                dealt, taken = dealt[keep], taken[keep]
+
+        for turn in range(1, max_turns + 1):
+            active = len(player_hp)
+            if not active:
+                break
+            if policy == "attack" or not effects:
+                choice = np.full(active, _VEC_ATTACK)
+            else:
+                choice = generator.integers(0, len(effects), size=active)
+            if policy == "cautious":
+                choice = np.where(player_hp * 3 < hero.max_health, _VEC_HEAL, choice)
+
+            wizard_before = wizard_hp.copy()
+            sel = np.flatnonzero(choice == _VEC_ATTACK)
+            if len(sel):
+                wizard_hp[sel] = np.maximum(0, wizard_hp[sel] - _roll_attacks(generator, player_ap[sel], 1))
+            sel = np.flatnonzero(choice == _VEC_HEAL)
+            if len(sel):
+                player_hp[sel] = hero.max_health
+            for index, effect in enumerate(effects):
+                sel = np.flatnonzero(choice == index)
+                if len(sel):
+                    _apply_effect(generator, effect, sel, player_hp, hero.max_health, player_ap, wizard_hp)
+            dealt += wizard_before - wizard_hp
+            finish(wizard_hp <= 0, True)
+
+            active = len(player_hp)
+            if not active:
+                break
+            wizard_hp = np.minimum(wizard.max_health, wizard_hp + 5)
+            player_before = player_hp.copy()
+            choice = generator.integers(0, len(wizard_effects), size=active)
+            for index, effect in enumerate(wizard_effects):
+                sel = np.flatnonzero(choice == index)
+                if len(sel):
+                    _apply_effect(generator, effect, sel, wizard_hp, wizard.max_health, wizard_ap, player_hp)
+            taken += player_before - player_hp
+            finish(player_hp <= 0, False)
+
+        remaining = len(player_hp)
+        if remaining:
+            totals["battles"] += remaining
+            totals["timeouts"] += remaining
+            totals["turns"] += remaining * max_turns
+            totals["damage_dealt"] += int(dealt.sum())
+            totals["damage_taken"] += int(taken.sum())
+            turn_histogram[max_turns] += remaining
+
+    count = totals["battles"] or 1
+    return dict(
+        totals,
+        win_rate=totals["wins"] / count,
+        avg_turns=totals["turns"] / count,
+        avg_damage_dealt=totals["damage_dealt"] / count,
+        avg_damage_taken=totals["damage_taken"] / count,
+        turn_histogram=turn_histogram.tolist()
+    )
+
+def compare_engines(class_name, battles, policy="random", seed=0, max_turns=200):
+    """
+    I run the scalar battle() loop and the vectorized engine side by side for one class and return
+    z-scores for the difference in win rate and in mean battle length. Values within about ±3 mean
+    the two engines agree.
+    """
+    scalar = run_simulations(battles, [class_name], policy, workers=1, seed=seed, max_turns=max_turns)[class_name]
+    vector = simulate_vectorized(class_name, battles, policy, seed, max_turns)
+    pooled = (scalar["wins"] + vector["wins"]) / (2 * battles)
+    rate_error = math.sqrt(max(pooled * (1 - pooled), 1e-12) * 2 / battles)
+    histogram = vector["turn_histogram"]
+    mean = vector["avg_turns"]
+    variance = sum(count * (turns - mean) ** 2 for turns, count in enumerate(histogram)) / battles
+    turn_error = math.sqrt(max(variance, 1e-12) * 2 / battles)
+    return {
+        "scalar": scalar,
+        "vectorized": vector,
+        "win_rate_z": (vector["win_rate"] - scalar["win_rate"]) / rate_error,
+        "avg_turns_z": (vector["avg_turns"] - scalar["avg_turns"]) / turn_error
+    }
+
+# -----------------------------
+# Exact Battle Solver (Markov Chain)
+# -----------------------------
+# Health values are small integers and every roll is a bounded uniform, so a battle under a fixed
+# or stochastic policy is a finite Markov chain. A round has two stages: my action takes the state
+# (player_hp, wizard_hp, attack_power) to an intermediate state (or a win), then the Evil Wizard's
+# regeneration and ability take that to the next round's state (or a loss). Regeneration, heals and
+# the Arcane Barrier can push health back up, so the chain has cycles; I solve it by Gauss-Seidel
+# value iteration over the reachable states until the largest change drops below the tolerance.
+SolverResult = namedtuple("SolverResult", "win_probability expected_turns states iterations residual")
+
+@functools.lru_cache(maxsize=None)
+def attack_damage_pmf(attack_power, hits=1):
+    """
+    I return the exact distribution of the total damage of `hits` normal attacks as ((damage, probability), ...).
+    """
+    low = max(0, attack_power - 5)
+    high = attack_power + 5
+    chance = 1 / (high - low + 1)
+    pmf = {0: 1.0}
+    for _ in range(hits):
+        rolled = {}
+        for total, probability in pmf.items():
+            for damage in range(low, high + 1):
+                rolled[total + damage] = rolled.get(total + damage, 0.0) + probability * chance
+        pmf = rolled
+    return tuple(sorted(pmf.items()))
+
+@functools.lru_cache(maxsize=None)
+def uniform_pmf(low, high, divisor=1):
+    """
+    I return the distribution of randint(low, high) // divisor as ((value, probability), ...).
+    """
+    chance = 1 / (high - low + 1)
+    pmf = {}
+    for value in range(low, high + 1):
+        pmf[value // divisor] = pmf.get(value // divisor, 0.0) + chance
+    return tuple(sorted(pmf.items()))
+
+def _normalize_action(action):
+    """
+    I accept "attack", an ability name, ("heal", amount) or a full (action, argument) pair.
+    """
+    if isinstance(action, tuple):
+        return action
+    if action in ("attack", "stats", "pass"):
+        return (action, None)
+    return ("ability", action)
+
+def _policy_distribution(policy, cls, player_hp, wizard_hp, attack_power):
+    """
+    I turn a solver policy into ((action, probability), ...) for one state.
+    A policy is an action, a dict {action: weight}, or a callable (player_hp, wizard_hp, attack_power)
+    returning either of those.
+    """
+    if callable(policy):
+        policy = policy(player_hp, wizard_hp, attack_power)
+    if not isinstance(policy, dict):
+        policy = {policy: 1.0}
+    total = sum(policy.values())
+    distribution = []
+    for action, weight in policy.items():
+        action = _normalize_action(action)
+        if action[0] == "ability" and action[1] not in ABILITY_LOOKUP.get(cls, {}):
+            if cls in SPECIAL_ABILITIES:
+                raise ValueError(f"{cls.__name__} has no ability {action[1]!r}.")
+            action = ("attack", None)
+        distribution.append((action, weight / total))
+    return distribution
+
+def _effect_outcomes(spec, user_hp, user_max, user_ap, target_hp, ap_cap):
+    """
+    I list ((user_hp, user_ap, target_hp), probability) after one ability, with the game's clamping.
+    """
+    effect = spec.effect
+    if effect in ("strike", "drain"):
+        hits = [(max(0, target_hp - damage), probability)
+                for damage, probability in attack_damage_pmf(user_ap, spec.hits)]
+    else:
+        hits = [(target_hp, 1.0)]
+    if effect == "heal":
+        rolls = [(min(user_max, user_hp + amount), probability) for amount, probability in uniform_pmf(*spec.bonus)]
+    elif effect == "drain":
+        rolls = [(min(user_max, user_hp + amount), probability) for amount, probability in uniform_pmf(*spec.bonus, 2)]
+    elif effect == "sacrifice":
+        rolls = [(max(0, user_hp - amount), probability) for amount, probability in uniform_pmf(*spec.bonus)]
+    else:
+        rolls = [(user_hp, 1.0)]
+    if effect == "focus":
+        return [((user_hp, min(ap_cap, user_ap + amount), target_hp), probability)
+                for amount, probability in uniform_pmf(*spec.bonus)]
+    return [((hp, user_ap, target), p_roll * p_hit) for hp, p_roll in rolls for target, p_hit in hits]
+
+def _player_outcomes(cls, action, player_hp, player_max, attack_power, wizard_hp, ap_cap):
+    """
+    I list ((player_hp, wizard_hp, attack_power), probability) after one of my actions.
+    """
+    kind, argument = action
+    if kind == "attack":
+        return [((player_hp, attack_power, max(0, wizard_hp - damage)), probability)
+                for damage, probability in attack_damage_pmf(attack_power)]
+    if kind == "ability":
+        return _effect_outcomes(ABILITY_LOOKUP[cls][argument], player_hp, player_max, attack_power, wizard_hp, ap_cap)
+    if kind == "heal" and argument > 0:
+        return [((min(player_max, player_hp + argument), attack_power, wizard_hp), 1.0)]
+    return [((player_hp, attack_power, wizard_hp), 1.0)]
+
+def solve_battle(class_name, policy="attack", tolerance=1e-12, max_iterations=100_000):
+    """
+    I compute the exact win probability and expected number of turns for one class against the
+    Evil Wizard under a policy (see _policy_distribution). Monk's Focus is tracked in the state,
+    with attack power capped where every attack already kills.
+    """
+    cls = CLASS_ROSTER[class_name]
+    hero = cls("Hero")
+    wizard = EvilWizard("The Dark Wizard")
+    player_max, wizard_max = hero.max_health, wizard.max_health
+    ap_cap = wizard_max + 5
+    wizard_chance = 1 / len(WIZARD_ABILITIES)
+
+    # I discover the reachable states breadth-first and record both stages' transitions by index.
+    states, middles = {}, {}
+    state_moves, middle_moves = [], []
+    start = (player_max, wizard_max, hero.attack_power)
+    states[start] = 0
+    state_moves.append(None)
+    frontier = [start]
+    while frontier:
+        next_frontier = []
+        for state in frontier:
+            player_hp, wizard_hp, attack_power = state
+            win = 0.0
+            moves = {}
+            for action, p_action in _policy_distribution(policy, cls, player_hp, wizard_hp, attack_power):
+                for (hp, ap, target), probability in _player_outcomes(cls, action, player_hp, player_max,
+                                                                      attack_power, wizard_hp, ap_cap):
+                    if target <= 0:
+                        win += p_action * probability
+                        continue
+                    middle = (hp, target, ap)
+                    index = middles.get(middle)
+                    if index is None:
+                        index = middles[middle] = len(middle_moves)
+                        wizard_moves = {}
+                        middle_moves.append(wizard_moves)
+                        hp_m, wizard_m, ap_m = middle
+                        wizard_m = min(wizard_max, wizard_m + 5)
+                        for spec in WIZARD_ABILITIES:
+                            for (wizard_hp2, _, hp2), p_wizard in _effect_outcomes(spec, wizard_m, wizard_max,
+                                                                                   wizard.attack_power, hp_m, ap_cap):
+                                if hp2 <= 0:
+                                    continue
+                                successor = (hp2, wizard_hp2, ap_m)
+                                target_index = states.get(successor)
+                                if target_index is None:
+                                    target_index = states[successor] = len(state_moves)
+                                    state_moves.append(None)
+                                    next_frontier.append(successor)
+                                wizard_moves[target_index] = wizard_moves.get(target_index, 0.0) + wizard_chance * p_wizard
+                    moves[index] = moves.get(index, 0.0) + p_action * probability
+            state_moves[states[state]] = (win, list(moves.items()))
+        frontier = next_frontier
+    middle_moves = [list(moves.items()) for moves in middle_moves]
+
+    # Gauss-Seidel sweeps, lowest total health first so values flow up from the end of the fight.
+    state_order = [index for _, index in sorted(states.items(), key=lambda item: item[0][0] + item[0][1])]
+    middle_order = [index for _, index in sorted(middles.items(), key=lambda item: item[0][0] + item[0][1])]
+    win_value = [0.0] * len(state_moves)
+    turn_value = [0.0] * len(state_moves)
+    middle_win = [0.0] * len(middle_moves)
+    middle_turns = [0.0] * len(middle_moves)
+    residual = float("inf")
+    iterations = 0
+    while residual > tolerance and iterations < max_iterations:
+        iterations += 1
+        for j in middle_order:
+            win = turns = 0.0
+            for i, probability in middle_moves[j]:
+                win += probability * win_value[i]
+                turns += probability * turn_value[i]
+            middle_win[j] = win
+            middle_turns[j] = turns
+        residual = 0.0
+        for i in state_order:
+            win, moves = state_moves[i]
+            turns = 1.0
+            for j, probability in moves:
+                win += probability * middle_win[j]
+                turns += probability * middle_turns[j]
+            change = abs(win - win_value[i]) + abs(turns - turn_value[i]) / (1.0 + turns)
+            if change > residual:
+                residual = change
+            win_value[i] = win
+            turn_value[i] = turns
+    return SolverResult(win_value[0], turn_value[0], len(state_moves), iterations, residual)
+
+# -----------------------------
+# Damage Distributions
+# -----------------------------
+# An ability's damage is a sum of bounded uniform rolls: its attacks (attack_power ± 5, never below
+# 0, `hits` times, each scaled by the ability's multiplier as Quick Shot doubles its arrow) plus
+# its bonus roll. ability_damage_pmf() convolves them exactly, with integer weights, the first
+# time a (class, ability, attack power) is asked for; ability_damage_stats() gives the mean and
+# variance the ability menu can show. This is the damage number an ability reports. What reaches
+# the target's health is attack_damage_pmf() (see Exact Battle Solver), as bonuses are cosmetic.
+# An AliasTable (Vose's alias method) draws from such a distribution with one uniform number:
+# pick a column, then keep its value or take its alias. ability_sampler() caches one per ability,
+# and the vectorized engine rolls all the attacks of a multi-hit ability with a single draw.
+DamageStats = namedtuple("DamageStats", "mean variance low high")
+
+def _uniform_weights(low, high, multiplier=1):
+    return {value * multiplier: 1 for value in range(low, high + 1)}
+
+def _convolve(left, right):
+    result = {}
+    for value, weight in left.items():
+        for other, other_weight in right.items():
+            result[value + other] = result.get(value + other, 0) + weight * other_weight
+    return result
+
+@functools.lru_cache(maxsize=None)
+def ability_damage_pmf(cls, ability, attack_power=None):
+    """
+    I return the exact distribution of the damage an ability of `cls` reports, as ((damage, probability), ...),
+    at the given attack power (the class's starting attack power by default). "attack" is a normal
+    attack, and abilities that deal no damage give ((0, 1.0),).
+    """
+    if attack_power is None:
+        attack_power = CLASS_STATS[cls.__name__]["attack_power"]
+    if ability == "attack":
+        effect, hits, bonus, multiplier = "strike", 1, None, 1
+    else:
+        spec = ABILITY_LOOKUP[cls][ability]
+        effect, hits, bonus, multiplier = spec.effect, spec.hits, spec.bonus, spec.multiplier
+    weights = {0: 1}
+    if effect in ("strike", "drain"):
+        roll = _uniform_weights(max(0, attack_power - 5), attack_power + 5, multiplier)
+        for _ in range(hits):
+            weights = _convolve(weights, roll)
+        if bonus:
+            weights = _convolve(weights, _uniform_weights(*bonus))
+    total = sum(weights.values())
+    return tuple((damage, weight / total) for damage, weight in sorted(weights.items()))
+
+@functools.lru_cache(maxsize=None)
+def ability_damage_stats(cls, ability, attack_power=None):
+    """
+    I return the mean, variance and range of an ability's damage (see ability_damage_pmf).
+    """
+    pmf = ability_damage_pmf(cls, ability, attack_power)
+    mean = sum(damage * probability for damage, probability in pmf)
+    variance = sum((damage - mean) ** 2 * probability for damage, probability in pmf)
+    return DamageStats(mean, variance, pmf[0][0], pmf[-1][0])
+
+class AliasTable:
+    """
+    I draw values from a finite distribution ((value, probability), ...) in constant time.
+    """
+    __slots__ = ("values", "probability", "alias", "size", "_arrays")
+
+    def __init__(self, pmf):
+        self.values = [value for value, _ in pmf]
+        self.size = len(pmf)
+        scaled = [probability * self.size for _, probability in pmf]
+        self.probability = [1.0] * self.size
+        self.alias = list(range(self.size))
+        small = [column for column, weight in enumerate(scaled) if weight < 1.0]
+        large = [column for column, weight in enumerate(scaled) if weight >= 1.0]
+        while small and large:
+            column, donor = small.pop(), large.pop()
+            self.probability[column] = scaled[column]
+            self.alias[column] = donor
+            scaled[donor] += scaled[column] - 1.0
+            (small if scaled[donor] < 1.0 else large).append(donor)
+        # Whatever is left over is 1.0 up to rounding error and keeps its own value.
+        self._arrays = None
+
+    def sample(self, rng):
+        """
+        I draw one value using a single rng.random() call.
+        """
+        position = rng.random() * self.size
+        column = int(position)
+        return self.values[column] if position - column < self.probability[column] else self.values[self.alias[column]]
+
+    def sample_array(self, generator, size):
+        """
+        I draw `size` values at once from a NumPy Generator.
+        """
+        if self._arrays is None:
+            self._arrays = (np.array(self.values), np.array(self.probability), np.array(self.alias))
+        values, probability, alias = self._arrays
+        position = generator.random(size) * self.size
+        column = position.astype(np.int64)
+        return np.where(position - column < probability[column], values[column], values[alias[column]])
+
+@functools.lru_cache(maxsize=None)
+def ability_sampler(cls, ability, attack_power=None):
+    """
+    I return the cached AliasTable for the damage an ability reports.
+    """
+    return AliasTable(ability_damage_pmf(cls, ability, attack_power))
+
+@functools.lru_cache(maxsize=None)
+def attack_offset_sampler(hits):
+    """
+    I return an AliasTable for the total of `hits` rolls of 0..10. For attack power 5 or more,
+    `hits` normal attacks deal hits * (attack_power - 5) plus such a total.
+    """
+    return AliasTable(attack_damage_pmf(5, hits))
+
+# -----------------------------
+# Optimal Play Solver (Expectimax)
+# -----------------------------
+# An expectimax search over battle states. A state is (player_hp, wizard_hp, attack_power, shield),
+# where shield is the Paladin's divine_shield_active. My action is a max node. The rolls and the
+# wizard's uniform choice among his six abilities are chance nodes. Heals and regeneration make
+# the game tree cyclic, so I do not recurse: Gauss-Seidel value iteration sweeps a dense table of
+# all states until it settles. That table is the transposition table: a state tuple maps straight
+# to a slot holding the state's win probability and best action, so a lookup after warm-up is one
+# index computation. Solved tables are cached on disk and tagged with the balance they were
+# solved for.
+#
+# Strike abilities only differ by their printed bonus, so every action with the same outcomes is
+# evaluated once and the earliest one in menu order wins ties. Healing is always a full heal,
+# since healing less never helps. Attack power from Focus is capped at the first value where the
+# strongest strike kills a full-health wizard outright; more cannot change the outcome.
+OptimalMove = namedtuple("OptimalMove", "action win_probability expected_turns")
+
+SOLVER_CACHE_DIR = "solver_cache"
+SOLVER_VERSION = 1
+TIE_TOLERANCE = 1e-6
+
+def _damage_table(attack_power, hits):
+    """
+    I return (lowest damage, probabilities from highest to lowest damage, tail sums) for one strike.
+    tails[m] is the chance that the damage is not among the m smallest values.
+    """
+    pmf = attack_damage_pmf(attack_power, hits)
+    probabilities = [probability for _, probability in pmf]
+    tails = [sum(probabilities[m:]) for m in range(len(probabilities) + 1)]
+    return pmf[0][0], probabilities[::-1], tails
+
+def balance_fingerprint(class_name=None):
+    """
+    I hash the parts of the balance that one class's battle depends on, or the whole balance.
+    """
+    table = balance_table()
+    relevant = table if class_name is None else [_class_balance(table, name) for name in (class_name, "EvilWizard")]
+    text = json.dumps([SOLVER_VERSION, relevant], sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+class OptimalSolver:
+    """
+    I solve one class's battle for optimal play and answer best-action queries from the result.
+    """
+
+    def __init__(self, class_name):
+        cls = CLASS_ROSTER[class_name]
+        hero = cls("Hero")
+        wizard = EvilWizard("The Dark Wizard")
+        specs = ABILITY_REGISTRY.get(cls, ())
+        self.class_name = class_name
+        self.player_max = hero.max_health
+        self.wizard_max = wizard.max_health
+        self.wizard_attack = wizard.attack_power
+        self.base_attack = hero.attack_power
+        self.attack_cap = hero.attack_power
+        if any(spec.effect == "focus" for spec in specs):
+            hits = [1] + [spec.hits for spec in specs if spec.effect in ("strike", "drain")]
+            self.attack_cap = max(hero.attack_power, min(-(-self.wizard_max // count) + 5 for count in hits))
+        self.shields = 2 if hasattr(hero, "divine_shield_active") else 1
+        self.actions = ([("attack", None)] + [("ability", spec.name) for spec in specs]
+                        + [("heal", None), ("stats", None)])
+        self.fingerprint = balance_fingerprint(class_name)
+        self.size = self.shields * self._attack_levels * (self.player_max + 1) * (self.wizard_max + 1)
+        self.values = array("d", bytes(8 * self.size))
+        self.turns = array("d", bytes(8 * self.size))
+        self.choices = array("b", bytes(self.size))
+        self.iterations = 0
+        self.residual = float("inf")
+
+    @property
+    def _attack_levels(self):
+        return self.attack_cap - self.base_attack + 1
+
+    def index(self, player_hp, wizard_hp, attack_power, shield=False):
+        """
+        I map a state tuple to its slot in the table.
+        """
+        level = min(max(attack_power, self.base_attack), self.attack_cap) - self.base_attack
+        return (((bool(shield) * self._attack_levels + level) * (self.player_max + 1) + player_hp)
+                * (self.wizard_max + 1) + wizard_hp)
+
+    def _evaluators(self):
+        """
+        I group the actions by their outcomes and return one (action index, kind, parameters) per group.
+        """
+        cls = CLASS_ROSTER[self.class_name]
+        seen = {}
+        for action_index, (kind, argument) in enumerate(self.actions):
+            if kind == "attack":
+                key = ("strike", 1, None)
+            elif kind == "heal":
+                key = ("full_heal",)
+            elif kind == "stats":
+                key = ("none",)
+            else:
+                spec = ABILITY_LOOKUP[cls][argument]
+                if spec.name == "divine_shield":
+                    key = ("shield",)
+                elif spec.effect == "none":
+                    key = ("none",)
+                elif spec.effect == "strike":
+                    key = ("strike", spec.hits, None)
+                else:
+                    key = (spec.effect, spec.hits, spec.bonus)
+            seen.setdefault(key, action_index)
+        return [(action_index, key[0], key[1:]) for key, action_index in seen.items()]
+
+    def solve(self, tolerance=1e-9, max_iterations=10_000):
+        """
+        I solve the table in two passes and return self. The first finds every state's best win
+        probability. The second picks, among the actions within TIE_TOLERANCE of that probability,
+        the one that ends the battle in the fewest expected turns; without it, healing forever
+        would tie with attacking whenever a win is certain. Each pass runs until nothing moves by
+        more than `tolerance`.
+        """
+        mul = operator.mul
+        player_max, wizard_max = self.player_max, self.wizard_max
+        row = wizard_max + 1
+        plane = (player_max + 1) * row
+        levels = self._attack_levels
+        shields = self.shields
+        evaluators = self._evaluators()
+        # My strikes per attack level and hit count: (lowest damage, probabilities by damage descending, tails).
+        strikes = {(level, params[0]): _damage_table(self.base_attack + level, params[0])
+                   for level in range(levels) for _, kind, params in evaluators if kind in ("strike", "drain")}
+        # The wizard's turn: strikes grouped by hit count, heals and no-ops, each ability with the same chance.
+        wizard_chance = 1 / len(WIZARD_ABILITIES)
+        wizard_strikes, wizard_heals, wizard_idle = {}, [], 0.0
+        for spec in WIZARD_ABILITIES:
+            if spec.effect == "strike":
+                wizard_strikes[spec.hits] = wizard_strikes.get(spec.hits, 0.0) + wizard_chance
+            elif spec.effect == "heal":
+                wizard_heals.extend((amount, wizard_chance * probability) for amount, probability in uniform_pmf(*spec.bonus))
+            else:
+                wizard_idle += wizard_chance
+        wizard_strikes = [(weight, _damage_table(self.wizard_attack, hits)) for hits, weight in wizard_strikes.items()]
+        suffixes = {}
+
+        def suffix(descending, count):
+            # The probabilities of the `count` smallest damages, largest of them first.
+            key = (id(descending), count)
+            if key not in suffixes:
+                suffixes[key] = descending[len(descending) - count:]
+            return suffixes[key]
+
+        def wizard_turn(values, base, player_hp, wizard_hp):
+            # Chance node: the wizard regenerates, then uses one of his abilities on me. Defeat is worth 0.
+            regenerated = min(wizard_max, wizard_hp + 5)
+            column = base + regenerated
+            total = wizard_idle * values[column + player_hp * row]
+            for weight, (low, descending, _) in wizard_strikes:
+                survivors = min(len(descending), player_hp - low)
+                if survivors > 0:
+                    first = column + (player_hp - low - survivors + 1) * row
+                    total += weight * sum(map(mul, suffix(descending, survivors),
+                                              values[first:column + (player_hp - low) * row + 1:row]))
+            for amount, weight in wizard_heals:
+                total += weight * values[base + player_hp * row + min(wizard_max, regenerated + amount)]
+            return total
+
+        def my_action(middles, win_value, kind, params, index, level, shield, player_hp, wizard_hp):
+            # Chance node after one of my actions; a defeated wizard is worth win_value. None if I cannot act so.
+            if kind == "strike" or kind == "drain":
+                low, descending, tails = strikes[(level, params[0])]
+                survivors = min(len(descending), wizard_hp - low)
+                if survivors <= 0:
+                    return win_value
+                probabilities = suffix(descending, survivors)
+                if kind == "strike":
+                    return win_value * tails[survivors] + sum(map(
+                        mul, probabilities, middles[index - low - survivors + 1:index - low + 1]))
+                total = win_value * tails[survivors]
+                for amount, probability in uniform_pmf(*params[1], 2):
+                    healed = index + (min(player_max, player_hp + amount) - player_hp) * row
+                    total += probability * sum(map(mul, probabilities, middles[healed - low - survivors + 1:healed - low + 1]))
+                return total
+            if kind == "heal":
+                return sum(probability * middles[index + (min(player_max, player_hp + amount) - player_hp) * row]
+                           for amount, probability in uniform_pmf(*params[1]))
+            if kind == "sacrifice":
+                return sum(probability * middles[index - min(player_hp, amount) * row]
+                           for amount, probability in uniform_pmf(*params[1]))
+            if kind == "focus":
+                return sum(probability * middles[index + (min(levels - 1, level + amount) - level) * plane]
+                           for amount, probability in uniform_pmf(*params[1]))
+            if kind == "full_heal":
+                return None if player_hp == player_max else middles[index + (player_max - player_hp) * row]
+            if kind == "shield":
+                return middles[index + (shields - 1 - shield) * levels * plane]
+            return middles[index]
+
+        def cells(base, player_hps):
+            for player_hp in player_hps:
+                start = base + player_hp * row
+                for wizard_hp in range(1, wizard_max + 1):
+                    yield start + wizard_hp, player_hp, wizard_hp
+
+        def allowed_actions(index, level, shield, player_hp, wizard_hp, floor):
+            allowed = []
+            for evaluator in evaluators:
+                value = my_action(win_middles, 1.0, evaluator[1], evaluator[2], index, level, shield, player_hp, wizard_hp)
+                if value is not None and value >= floor:
+                    allowed.append(evaluator)
+            allowed = tuple(allowed)
+            return shared.setdefault(allowed, allowed)
+
+        wins = list(self.values)
+        turns = list(self.turns)
+        win_middles = [0.0] * self.size
+        turn_middles = [0.0] * self.size
+        candidates = [()] * self.size
+        shared = {}
+        choices = self.choices
+        player_hps = range(1, player_max + 1)
+        self.iterations = 0
+        self.residual = 0.0
+        # Shield and attack level only ever go up, so I solve one (shield, level) block at a time,
+        # highest first, each starting from the values of the block solved just before it.
+        previous = None
+        for shield in reversed(range(shields)):
+            for level in reversed(range(levels)):
+                base = (shield * levels + level) * plane
+                if previous is not None:
+                    wins[base:base + plane] = wins[previous:previous + plane]
+                    turns[base:base + plane] = turns[previous:previous + plane]
+                previous = base
+
+                # Pass 1: max node over win probabilities.
+                residual, sweeps = float("inf"), 0
+                while residual > tolerance and sweeps < max_iterations:
+                    sweeps += 1
+                    residual = 0.0
+                    for index, player_hp, wizard_hp in cells(base, player_hps):
+                        win_middles[index] = wizard_turn(wins, base, player_hp, wizard_hp)
+                        best = 0.0
+                        for _, kind, params in evaluators:
+                            value = my_action(win_middles, 1.0, kind, params, index, level, shield, player_hp, wizard_hp)
+                            if value is not None and value > best:
+                                best = value
+                        change = abs(best - wins[index])
+                        if change > residual:
+                            residual = change
+                        wins[index] = best
+                self.iterations += sweeps
+
+                # Pass 2: among the near-best actions, the fewest expected turns to the end of the battle.
+                # Which actions are near-best no longer changes, so I collect them once per state.
+                for index, player_hp, wizard_hp in cells(base, player_hps):
+                    candidates[index] = allowed_actions(index, level, shield, player_hp, wizard_hp,
+                                                        wins[index] - TIE_TOLERANCE)
+                residual, sweeps = float("inf"), 0
+                while residual > tolerance and sweeps < max_iterations:
+                    sweeps += 1
+                    residual = 0.0
+                    for index, player_hp, wizard_hp in cells(base, player_hps):
+                        turn_middles[index] = wizard_turn(turns, base, player_hp, wizard_hp)
+                        best, best_action = float("inf"), 0
+                        for action_index, kind, params in candidates[index]:
+                            value = my_action(turn_middles, 0.0, kind, params, index, level, shield, player_hp, wizard_hp)
+                            if value < best:
+                                best, best_action = value, action_index
+                        best += 1.0
+                        change = abs(best - turns[index]) / best
+                        if change > residual:
+                            residual = change
+                        turns[index] = best
+                        choices[index] = best_action
+                self.iterations += sweeps
+                self.residual = max(self.residual, residual)
+        self.values = array("d", wins)
+        self.turns = array("d", turns)
+        return self
+
+    def best(self, player_hp, wizard_hp, attack_power, shield=False):
+        """
+        I return the OptimalMove for a state: the action pair to take, and the win probability and
+        expected number of remaining turns with optimal play.
+        """
+        index = self.index(player_hp, wizard_hp, attack_power, shield)
+        action = self.actions[self.choices[index]]
+        if action[0] == "heal":
+            action = ("heal", self.player_max - player_hp)
+        return OptimalMove(action, self.values[index], self.turns[index])
+
+    def policy(self, player, wizard):
+        """
+        I am a battle() policy that always takes the best action for the current state.
+        """
+        return self.best(player.health, wizard.health, player.attack_power,
+                         getattr(player, "divine_shield_active", False)).action
+
+    @property
+    def win_probability(self):
+        """
+        I give the win probability from the start of a battle.
+        """
+        return self.values[self.index(self.player_max, self.wizard_max, self.base_attack)]
+
+    def save(self, path):
+        """
+        I write the table: one JSON header line, then the raw win probabilities, turns and choices.
+        The file is replaced in one step, so an interrupted save never leaves half a table behind.
+        """
+        header = {"version": SOLVER_VERSION, "class_name": self.class_name, "fingerprint": self.fingerprint,
+                  "size": self.size, "iterations": self.iterations, "residual": self.residual}
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(json.dumps(header).encode("utf-8") + b"\n")
+            self.values.tofile(file)
+            self.turns.tofile(file)
+            self.choices.tofile(file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        I read a table written by save(). It must match the current balance. A file that does not
+        hold exactly one complete table raises ValueError (or EOFError when it is cut short).
+        """
+        with open(path, "rb") as file:
+            header = json.loads(file.readline())
+            if not isinstance(header, dict) or header.get("class_name") not in CLASS_ROSTER:
+                raise ValueError(f"{path} does not start with a solver table header.")
+            solver = cls(header["class_name"])
+            if header["version"] != SOLVER_VERSION or header["fingerprint"] != solver.fingerprint:
+                raise ValueError(f"{path} was solved for a different version or balance.")
+            if header["size"] != solver.size:
+                raise ValueError(f"{path} has {header['size']} states, expected {solver.size}.")
+            solver.values = array("d")
+            solver.values.fromfile(file, solver.size)
+            solver.turns = array("d")
+            solver.turns.fromfile(file, solver.size)
+            solver.choices = array("b")
+            solver.choices.fromfile(file, solver.size)
+            if file.read(1):
+                raise ValueError(f"{path} has data after its table.")
+        solver.iterations = header["iterations"]
+        solver.residual = header["residual"]
+        return solver
+
+_OPTIMAL_SOLVERS = {}
+
+def optimal_solver(class_name, cache_dir=SOLVER_CACHE_DIR):
+    """
+    I return the solved table for a class: from memory, from the disk cache, or freshly solved
+    (and then saved to the cache).
+    """
+    solver = _OPTIMAL_SOLVERS.get(class_name)
+    if solver is None:
+        path = os.path.join(cache_dir, f"{class_name}-{balance_fingerprint(class_name)}.bin")
+        try:
+            solver = OptimalSolver.load(path)
+            if solver.class_name != class_name:
+                raise ValueError(f"{path} holds the table of {solver.class_name}.")
+        except (OSError, EOFError, ValueError, KeyError):
+            # A missing, torn or foreign file is solved again and overwritten.
+            solver = OptimalSolver(class_name).solve()
+            os.makedirs(cache_dir, exist_ok=True)
+            solver.save(path)
+        _OPTIMAL_SOLVERS[class_name] = solver
+    return solver
+
+def optimal_policy(player, wizard):
+    """
+    I play every class optimally, solving (or loading) its table the first time it is needed.
+    """
+    return optimal_solver(type(player).__name__).policy(player, wizard)
+
+POLICIES["optimal"] = optimal_policy
+
+# -----------------------------
+# Wizard Brains
+# -----------------------------
+# By default the Evil Wizard picks one of his six abilities uniformly at random. A brain makes
+# him choose instead. "greedy" takes the ability with the best immediate result; "lookahead" also
+# plays out my basic-attack reply and his next regeneration before it judges the ability.
+# Positions are scored as wizard_hp / wizard_max - player_hp / player_max, with +2 for a defeated
+# hero and -2 for a defeated wizard. Brains are computed once per balance into a table with one
+# byte per (hero class, wizard_hp bucket, player_hp bucket), so choosing an ability during a battle
+# is a single array lookup.
+WIZARD_BRAINS = ("random", "greedy", "lookahead")
+BRAIN_BUCKET = 5
+
+def _brain_position(wizard_hp, player_hp, wizard_max, player_max):
+    if player_hp <= 0:
+        return 2.0
+    if wizard_hp <= 0:
+        return -2.0
+    return wizard_hp / wizard_max - player_hp / player_max
+
+class WizardBrain:
+    """
+    I pick the Evil Wizard's ability from a table precomputed for one strategy.
+    """
+    __slots__ = ("name", "abilities", "table", "offsets", "stride")
+
+    def __init__(self, name):
+        if name not in WIZARD_BRAINS[1:]:
+            raise ValueError(f"Unknown wizard brain {name!r}; choose from {', '.join(WIZARD_BRAINS)}.")
+        self.name = name
+        self.abilities = WIZARD_ABILITIES
+        wizard = EvilWizard("The Dark Wizard")
+        heroes = [cls("Hero") for cls in CLASS_BY_ID if cls is not EvilWizard]
+        wizard_buckets = wizard.max_health // BRAIN_BUCKET + 1
+        player_buckets = max(hero.max_health for hero in heroes) // BRAIN_BUCKET + 1
+        self.stride = player_buckets
+        self.offsets = {}
+        self.table = array("B", bytes(len(heroes) * wizard_buckets * player_buckets))
+
+        # Abilities with the same outcomes are scored once; the strongest-sounding one of them is used.
+        groups = {}
+        for ability_index, spec in enumerate(self.abilities):
+            key = (spec.effect, spec.hits, spec.bonus if spec.effect != "strike" else None)
+            best = groups.get(key)
+            if best is None or sum(spec.bonus or (0, 0)) > sum(self.abilities[best].bonus or (0, 0)):
+                groups[key] = ability_index
+        groups = sorted(groups.values())
+
+        for hero in heroes:
+            offset = self.offsets[type(hero)] = CLASS_IDS[type(hero)] * wizard_buckets * player_buckets
+            for wizard_bucket in range(wizard_buckets):
+                wizard_hp = min(wizard.max_health, wizard_bucket * BRAIN_BUCKET + BRAIN_BUCKET // 2)
+                for player_bucket in range(player_buckets):
+                    player_hp = min(hero.max_health, player_bucket * BRAIN_BUCKET + BRAIN_BUCKET // 2)
+                    scores = [(self._score(self.abilities[index], wizard, wizard_hp, hero, player_hp), -index)
+                              for index in groups]
+                    self.table[offset + wizard_bucket * player_buckets + player_bucket] = -max(scores)[1]
+
+    def _score(self, spec, wizard, wizard_hp, hero, player_hp):
+        """
+        I give the expected position after the wizard uses `spec` (and, looking ahead, after my reply).
+        """
+        wizard_max, player_max = wizard.max_health, hero.max_health
+        total = 0.0
+        for (wizard_after, _, player_after), probability in _effect_outcomes(
+                spec, wizard_hp, wizard_max, wizard.attack_power, player_hp, wizard.attack_power):
+            if self.name == "greedy" or player_after <= 0:
+                total += probability * _brain_position(wizard_after, player_after, wizard_max, player_max)
+                continue
+            for damage, chance in attack_damage_pmf(hero.attack_power):
+                remaining = wizard_after - damage
+                if remaining > 0:
+                    remaining = min(wizard_max, remaining + 5)
+                total += probability * chance * _brain_position(remaining, player_after, wizard_max, player_max)
+        return total
+
+    def choose(self, wizard, player):
+        """
+        I return the AbilitySpec the wizard uses against `player` right now.
+        """
+        return self.abilities[self.table[self.offsets[player.__class__] + wizard.health // BRAIN_BUCKET * self.stride
+                                         + player.health // BRAIN_BUCKET]]
+
+@functools.lru_cache(maxsize=None)
+def wizard_brain(name):
+    """
+    I return the brain for a strategy name, built on first use; "random" has no brain (None).
+    """
+    return None if name == "random" else WizardBrain(name)
+
+# -----------------------------
+# Compact Combatant Store
+# -----------------------------
+# For population simulations I keep fighters as rows in typed arrays instead of as objects:
+# a fighter is an integer id, its class is a one-byte class id from CLASS_IDS, its name is an index
+# into one shared table of interned names, and class-specific flags share a bit field.
+FLAG_DIVINE_SHIELD = 1
+
+class CombatantStore:
+    """
+    I hold fighters' stats in parallel typed arrays indexed by fighter id (about 12 bytes per fighter).
+    """
+    def __init__(self):
+        self.class_id = array("B")
+        self.name_id = array("I")
+        self.health = array("h")
+        self.max_health = array("h")
+        self.attack_power = array("h")
+        self.flags = array("B")
+        self.names = []
+        self._name_ids = {}
+        self._defaults = {}
+
+    def __len__(self):
+        return len(self.class_id)
+
+    def _intern_name(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return name_id
+
+    def add(self, cls, name):
+        """
+        I add a fresh fighter of class `cls` with the class's starting stats and return its id.
+        """
+        defaults = self._defaults.get(cls)
+        if defaults is None:
+            prototype = cls(name)
+            defaults = self._defaults[cls] = (CLASS_IDS[cls], prototype.health, prototype.attack_power)
+        class_id, health, attack_power = defaults
+        self.class_id.append(class_id)
+        self.name_id.append(self._intern_name(name))
+        self.health.append(health)
+        self.max_health.append(health)
+        self.attack_power.append(attack_power)
+        self.flags.append(0)
+        return len(self.class_id) - 1
+
+    def add_character(self, character):
+        """
+        I copy an existing Character object into the store and return its id.
+        """
+        fighter_id = self.add(type(character), character.name)
+        self.save(fighter_id, character)
+        return fighter_id
+
+    def save(self, fighter_id, character):
+        """
+        I write an object's current stats back into row fighter_id.
+        """
+        self.health[fighter_id] = character.health
+        self.max_health[fighter_id] = character.max_health
+        self.attack_power[fighter_id] = character.attack_power
+        self.flags[fighter_id] = FLAG_DIVINE_SHIELD if getattr(character, "divine_shield_active", False) else 0
+
+    def name(self, fighter_id):
+        return self.names[self.name_id[fighter_id]]
+
+    def character_class(self, fighter_id):
+        return CLASS_BY_ID[self.class_id[fighter_id]]
+
+    def load(self, fighter_id):
+        """
+        I build a Character object for one row, e.g. to run it through battle().
+        """
+        character = self.character_class(fighter_id)(self.name(fighter_id))
+        character.health = self.health[fighter_id]
+        character.max_health = self.max_health[fighter_id]
+        character.attack_power = self.attack_power[fighter_id]
+        if isinstance(character, Paladin):
+            character.divine_shield_active = bool(self.flags[fighter_id] & FLAG_DIVINE_SHIELD)
+        return character
+
+    def nbytes(self):
+        """
+        I report the bytes held by the arrays and the name table.
+        """
+        arrays = (self.class_id, self.name_id, self.health, self.max_health, self.attack_power, self.flags)
+        return (sum(column.itemsize * len(column) for column in arrays)
+                + sum(sys.getsizeof(name) for name in self.names))
+
+class _DictFighter:
+    """
+    I mimic a Character as it was before __slots__: the same attributes, stored in a __dict__.
+    """
+    def __init__(self, name, health, attack_power):
+        self.name = name
+        self.health = health
+        self.attack_power = attack_power
+        self.max_health = health
+        self.sink = CONSOLE_SINK
+        self.rng = random
+
+def benchmark_memory(count=1_000_000, distinct_names=1000):
+    """
+    I measure the memory of `count` fighters (classes and names cycling) held three ways:
+    __dict__ objects as the classes used to be, today's slotted objects, and a CombatantStore.
+    I return bytes per fighter for each.
+    """
+    classes = list(CLASS_MENU.values())
+    names = [f"Hero {index}" for index in range(distinct_names)]
+    kinds = len(classes)
+    prototypes = [cls("") for cls in classes]
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            population = build()
+            used = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del population
+        return used / count
+
+    results = {
+        "dict_objects": measure(lambda: [_DictFighter(names[i % distinct_names], prototypes[i % kinds].health,
+                                                      prototypes[i % kinds].attack_power) for i in range(count)]),
+        "slotted_objects": measure(lambda: [classes[i % kinds](names[i % distinct_names]) for i in range(count)])
+    }
+
+    def build_store():
+        store = CombatantStore()
+        for i in range(count):
+            store.add(classes[i % kinds], names[i % distinct_names])
+        return store
+    results["store"] = measure(build_store)
+    return results
+
+# -----------------------------
+# Asyncio Game Server
+# -----------------------------
+# The server plays the same game over a plain TCP line protocol: it sends exactly the text the
+# console would show, each prompt without a trailing newline, and reads one line per answer.
+# Every connection is a GameSession with its own output buffer, event sink and random stream, all
+# running in one event loop. Sessions play through battle_turns(), so they follow the same rules as
+# battle(): the server's wizard brain, status effects and turn cap apply, and session i's stream is
+# seeded with f"{seed}/{i}" (the string spawn_rng uses), so with record_dir every game is saved
+# as a BattleRecord that `replay` re-runs exactly. A session ends when its battle does, when it stays idle longer than
+# idle_timeout, or when it exceeds its memory cap: an input line longer than max_line bytes, or
+# more than max_buffer bytes of output the client has not read yet.
+class GameSession:
+    """
+    I am one player's connection: I collect the game's output and answer its prompts from the socket.
+    """
+    def __init__(self, reader, writer, idle_timeout, max_buffer, seed=None, brain="random", effects=False,
+                 odds=False, max_turns=None, record_path=None):
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+        self.max_buffer = max_buffer
+        self.seed = seed
+        self.brain = brain
+        self.effects = effects
+        self.odds = odds
+        self.max_turns = max_turns
+        self.record_path = record_path
+        self.pending = []
+
+    def write(self, text):
+        """
+        I accept raw text, so a ConsoleSink can print into this session.
+        """
+        self.pending.append(text)
+        return len(text)
+
+    def say(self, text=""):
+        """
+        I queue one line of output, like print().
+        """
+        self.pending.append(text + "\n")
+
+    async def flush(self):
+        if self.pending:
+            self.writer.write("".join(self.pending).encode())
+            self.pending.clear()
+        if self.writer.transport.get_write_buffer_size() > self.max_buffer:
+            raise MemoryError("session output buffer over its cap")
+        await self.writer.drain()
+
+    async def ask(self, prompt):
+        """
+        I send everything queued plus the prompt and wait (at most idle_timeout) for the reply line.
+        """
+        self.pending.append(prompt)
+        await self.flush()
+        line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+        if not line:
+            raise EOFError("client closed the connection")
+        return line.decode("utf-8", "replace").rstrip("\r\n")
+
+    async def run(self, dialog):
+        """
+        I drive a dialog (see run_dialog) with replies read from the connection.
+        """
+        try:
+            prompt = next(dialog)
+            while True:
+                prompt = dialog.send(await self.ask(prompt))
+        except StopIteration as finished:
+            return finished.value
+
+    async def play(self):
+        """
+        I run one full game: introduction, character creation and the battle. I return its BattleResult.
+        """
+        for line in INTRO:
+            self.say(line)
+        player = await self.run(character_dialog(self.say))
+        wizard = EvilWizard("The Dark Wizard", wizard_brain(self.brain))
+        player.sink = wizard.sink = ConsoleSink(self)
+        player.rng = wizard.rng = random.Random(self.seed)
+        effects = StatusEngine() if self.effects else None
+        player.effects = wizard.effects = effects
+        rounds = battle_turns(player, wizard, self.max_turns, effects=effects)
+        try:
+            next(rounds)
+            while True:
+                rounds.send(await self.run(turn_dialog(player, self.say, self.odds)))
+        except StopIteration as finished:
+            result = finished.value
+        self.say("Game Over.")
+        await self.flush()
+        if self.record_path is not None:
+            save_record(BattleRecord(result.class_name, player.name, self.seed, result.actions, self.brain,
+                                     self.effects), self.record_path)
+        return result
+
+class GameServer:
+    """
+    I accept connections and run one GameSession per connection.
+    """
+    def __init__(self, host="127.0.0.1", port=8765, idle_timeout=300.0, max_line=1024, max_buffer=64 * 1024,
+                 backlog=4096, seed=None, brain="random", effects=False, odds=False, max_turns=None, record_dir=None):
+        wizard_brain(brain)
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.max_line = max_line
+        self.max_buffer = max_buffer
+        self.backlog = backlog
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.brain = brain
+        self.effects = effects
+        self.odds = odds
+        self.max_turns = max_turns
+        self.record_dir = record_dir
+        if record_dir is not None:
+            os.makedirs(record_dir, exist_ok=True)
+        self.started_sessions = 0
+        self.active_sessions = 0
+        self.finished_sessions = 0
+        self.server = None
+
+    async def start(self):
+        """
+        I start listening; port 0 picks a free port, which I store in self.port.
+        """
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=self.max_line,
+                                                 backlog=self.backlog)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        index = self.started_sessions
+        self.started_sessions += 1
+        record_path = None if self.record_dir is None else os.path.join(self.record_dir, f"session-{index}.json")
+        session = GameSession(reader, writer, self.idle_timeout, self.max_buffer, f"{self.seed}/{index}", self.brain,
+                              self.effects, self.odds, self.max_turns, record_path)
+        self.active_sessions += 1
+        try:
+            await session.play()
+        except asyncio.TimeoutError:
+            session.say("\nSession timed out.")
+            with contextlib.suppress(Exception):
+                await session.flush()
+        except (EOFError, ConnectionError, MemoryError, ValueError):
+            # ValueError is how StreamReader reports a line longer than max_line.
+            pass
+        finally:
+            self.active_sessions -= 1
+            self.finished_sessions += 1
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+async def _read_prompt(reader, prompts):
+    """
+    I read until the server's output ends with one of the prompts, or until it closes.
+    """
+    data = b""
+    while not data.endswith(prompts):
+        chunk = await reader.read(65536)
+        if not chunk:
+            return data, True
+        data += chunk
+    return data, False
+
+async def _load_session(host, port, rng, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await _read_prompt(reader, (b"Enter the number of your class choice: ",))
+        writer.write(f"{rng.randint(1, 15)}\n".encode())
+        await _read_prompt(reader, (b"Enter your character's name: ",))
+        writer.write(b"Load Tester\n")
+        await _read_prompt(reader, (b"Choose an action: ",))
+        while True:
+            sent = time.perf_counter()
+            writer.write(b"1\n")
+            _, closed = await _read_prompt(reader, (b"Choose an action: ",))
+            latencies.append(time.perf_counter() - sent)
+            if closed:
+                return
+    finally:
+        writer.close()
+
+async def load_test(host=None, port=None, sessions=1000, concurrency=250, seed=0):
+    """
+    I play `sessions` games against a server (at most `concurrency` at a time, always attacking)
+    and report the round-trip latency of each turn. Without a port I start a server in this loop.
+    """
+    server = None
+    if port is None:
+        server = await GameServer(host or "127.0.0.1", 0).start()
+        host, port = server.host, server.port
+    rng = random.Random(seed)
+    latencies = []
+    failures = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one_session():
+        nonlocal failures
+        async with gate:
+            try:
+                await _load_session(host, port, rng, latencies)
+            except (OSError, EOFError):
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    if server is not None:
+        await server.close()
+    latencies.sort()
+    return {
+        "sessions": sessions,
+        "failures": failures,
+        "turns": len(latencies),
+        "seconds": elapsed,
+        "turns_per_second": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000
+    }
+
+# -----------------------------
+# Scripted Sessions
+# -----------------------------
+# The scripted harness plays the unmodified interactive game, main() and all, from generated
+# keyboard scripts. In-process, each session gets a fresh main() call with sys.stdin and sys.stdout
+# redirected; the stdin stand-in timestamps every read, so the time between two reads is what the
+# game spent answering one reply and showing the next prompt. Sessions are spread over worker
+# processes (stdin is process-wide, so threads cannot share it), or with mode "exec" each one runs
+# as its own interpreter fed through a pipe, which also times start-up. Every session's output is
+# hashed with SHA-256; a golden file of those digests turns the harness into a check that the
+# game's text, not just its speed, is unchanged. Session i's script and game seed come from
+# spawn_rng(seed, i), so a session replays identically in every mode and on every machine.
+SCRIPT_VERSION = 1
+SCRIPT_MODES = ("workers", "inprocess", "exec")
+SCRIPT_NAMES = ("Aria", "Bob", "Load Tester", "Zed", "")
+# Menu replies and their weights: attack, ability, heal, stats, and one that is not on the menu.
+SCRIPT_ACTIONS = ("1", "2", "3", "4", "x")
+SCRIPT_WEIGHTS = (4, 3, 2, 1, 1)
+
+def script_session(rng, actions=300):
+    """
+    I write one session's keyboard input: a class (sometimes not on the menu), a name and up to
+    `actions` menu replies, with ability numbers and heal amounts where the menus ask for them.
+    Invalid replies are mixed in on purpose so the error paths are exercised too.
+    """
+    lines = [str(rng.randint(0, len(CLASS_MENU) + 1)), rng.choice(SCRIPT_NAMES)]
+    for action in rng.choices(SCRIPT_ACTIONS, SCRIPT_WEIGHTS, k=actions):
+        lines.append(action)
+        if action == "2":
+            lines.append(rng.choice(("1", "2", "3", "4", "5", "6", "9", "q")))
+        elif action == "3":
+            lines.append(rng.choice(("10", "25", "-3", "abc", "200")))
+    return lines
+
+def scripted_sessions(sessions, seed=0, actions=300, start=0):
+    """
+    I yield (index, game seed, lines) for sessions start .. start + sessions - 1.
+    """
+    for index in range(start, start + sessions):
+        rng = spawn_rng(seed, index)
+        yield index, rng.randrange(2 ** 32), script_session(rng, actions)
+
+class _PromptCapture(io.StringIO):
+    """
+    I collect a session's output and remember the last thing written, which is the prompt
+    input() shows before it reads.
+    """
+    def __init__(self):
+        super().__init__()
+        self.last = ""
+
+    def write(self, text):
+        if text:
+            self.last = text
+        return super().write(text)
+
+class _ScriptedStdin(io.TextIOBase):
+    """
+    I hand a script to input() line by line and time the game between reads, recording each
+    duration in microseconds under the prompt it ended at.
+    """
+    def __init__(self, lines, stdout, latencies):
+        self.lines = iter(lines)
+        self.stdout = stdout
+        self.latencies = latencies
+        self.reads = 0
+        self.mark = time.perf_counter()
+
+    def readable(self):
+        return True
+
+    def readline(self, size=-1):
+        elapsed = time.perf_counter() - self.mark
+        prompt = self.stdout.last.strip()
+        histogram = self.latencies.get(prompt)
+        if histogram is None:
+            histogram = self.latencies[prompt] = Histogram()
+        histogram.record(int(elapsed * 1e6))
+        self.reads += 1
+        line = next(self.lines, None)
+        self.mark = time.perf_counter()
+        return "" if line is None else line + "\n"
+
+def run_script(lines, game_seed, game_args=(), latencies=None):
+    """
+    I play one scripted session through main() in this process and return (output, prompts).
+    A script that runs out before the game ends is not an error: input() raises EOFError, which
+    I note at the end of the output so it is part of the digest.
+    """
+    stdout = _PromptCapture()
+    stdin = _ScriptedStdin(lines, stdout, {} if latencies is None else latencies)
+    saved = sys.stdin
+    sys.stdin = stdin
+    try:
+        with contextlib.redirect_stdout(stdout):
+            try:
+                main(["--seed", str(game_seed), *game_args])
+            except EOFError:
+                print("<EOF>")
+    finally:
+        sys.stdin = saved
+    return stdout.getvalue(), stdin.reads
+
+def _exec_script(lines, game_seed, game_args=()):
+    """
+    I play one scripted session in a new interpreter and return its output.
+    """
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--seed", str(game_seed), *game_args],
+                               input="".join(line + "\n" for line in lines), capture_output=True, text=True,
+                               encoding="utf-8", check=False)
+    output = completed.stdout
+    if "EOFError" in completed.stderr:
+        output += "<EOF>\n"
+    return output
+
+def _digest(output):
+    return hashlib.sha256(output.encode("utf-8")).hexdigest()
+
+def _script_batch(task):
+    """
+    I play sessions start .. start + count - 1 in this process for a worker pool and return
+    (digests, latency histograms as dicts, prompts).
+    """
+    start, count, seed, actions, game_args = task
+    latencies = {}
+    digests = []
+    prompts = 0
+    for _, game_seed, lines in scripted_sessions(count, seed, actions, start):
+        output, reads = run_script(lines, game_seed, game_args, latencies)
+        digests.append(_digest(output))
+        prompts += reads
+    return digests, {prompt: histogram.to_dict() for prompt, histogram in latencies.items()}, prompts
+
+def run_script_harness(sessions=1000, seed=0, mode="workers", workers=None, batch_size=None, actions=300,
+                       game_args=()):
+    """
+    I play `sessions` scripted sessions and return a report: sessions per second, the latency of
+    every prompt (in-process modes) or of whole sessions (exec mode), and the output digests.
+    `mode` is one of SCRIPT_MODES; `game_args` are extra interactive-game flags such as --effects.
+    """
+    if mode not in SCRIPT_MODES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {', '.join(SCRIPT_MODES)}.")
+    game_args = tuple(game_args)
+    latencies = {}
+    digests = []
+    prompts = 0
+    started = time.perf_counter()
+    if mode == "inprocess":
+        digests, snapshot, prompts = _script_batch((0, sessions, seed, actions, game_args))
+        latencies = {prompt: Histogram.from_dict(data) for prompt, data in snapshot.items()}
+    elif mode == "workers":
+        workers = workers or os.cpu_count() or 1
+        batch_size = batch_size or max(1, min(250, -(-sessions // (workers * 4))))
+        tasks = [(start, min(batch_size, sessions - start), seed, actions, game_args)
+                 for start in range(0, sessions, batch_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch_digests, snapshot, batch_prompts in pool.map(_script_batch, tasks):
+                digests.extend(batch_digests)
+                prompts += batch_prompts
+                for prompt, data in snapshot.items():
+                    histogram = Histogram.from_dict(data)
+                    if prompt in latencies:
+                        latencies[prompt].merge(histogram)
+                    else:
+                        latencies[prompt] = histogram
+    else:
+        workers = workers or os.cpu_count() or 1
+        session_times = Histogram()
+
+        def one_session(session):
+            _, game_seed, lines = session
+            began = time.perf_counter()
+            output = _exec_script(lines, game_seed, game_args)
+            return _digest(output), time.perf_counter() - began
+
+        # The threads only wait on child processes, so the GIL does not get in the way.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for digest, seconds in pool.map(one_session, scripted_sessions(sessions, seed, actions)):
+                digests.append(digest)
+                session_times.record(int(seconds * 1e6))
+        latencies["<session>"] = session_times
+    elapsed = time.perf_counter() - started
+    return {
+        "version": SCRIPT_VERSION,
+        "mode": mode,
+        "sessions": sessions,
+        "seed": seed,
+        "actions": actions,
+        "game_args": list(game_args),
+        "seconds": elapsed,
+        "sessions_per_second": sessions / elapsed if elapsed else 0.0,
+        "prompts": prompts,
+        "latency_us": {prompt: {"count": histogram.count, "mean": histogram.mean(),
+                                "p50": histogram.percentile(0.50), "p99": histogram.percentile(0.99),
+                                "max": histogram.max}
+                       for prompt, histogram in sorted(latencies.items())},
+        "digests": digests
+    }
+
+def check_golden(path, report, update=False):
+    """
+    I compare a harness report's digests with a golden file and return the indexes of the
+    sessions whose output changed. When the file does not exist yet (or with update) I write it
+    instead and return an empty list. Sessions beyond the shorter of the two runs are not compared,
+    but the seed, script length and game flags must match, or I raise ValueError.
+    """
+    config = {key: report[key] for key in ("version", "seed", "actions", "game_args")}
+    if update or not os.path.exists(path):
+        write_json(path, {**config, "sessions": report["sessions"], "digests": report["digests"]})
+        return []
+    with open(path, encoding="utf-8") as file:
+        golden = json.load(file)
+    expected = {key: golden.get(key) for key in config}
+    if expected != config:
+        raise ValueError(f"{path} was written for {expected}, not {config}.")
+    return [index for index, (old, new) in enumerate(zip(golden["digests"], report["digests"])) if old != new]
+
+# -----------------------------
+# Benchmark Suite
+# -----------------------------
+# Micro benchmarks time single calls of attack, heal, random_bonus and every ability in the
+# registry (the 13 hero classes' abilities and the Evil Wizard's six); macro benchmarks time full
+# headless battles per class. Everything runs with a NullSink and a seeded stream, and each result
+# is the best of `repeat` timings, which keeps numbers stable from run to run. Results are plain
+# JSON so two runs can be compared later. Each run also times a fixed pure-Python loop; comparisons
+# divide by the change in that calibration so a machine that is simply busier or slower today
+# does not show up as a regression.
+def _bench_pair(cls):
+    """
+    I build a fighter and a target that will not die or run out of health while being benchmarked.
+    """
+    user = cls("Bencher")
+    target = EvilWizard("Target") if cls is not EvilWizard else Warrior("Target")
+    for character in (user, target):
+        character.sink = NULL_SINK
+        character.rng = random.Random(0)
+        character.health = character.max_health = 10 ** 9
+    return user, target
+
+def _best_time(function, number, repeat, setup="pass"):
+    return min(timeit.repeat(function, setup=setup, number=number, repeat=repeat)) / number
+
+def _calibration_loop():
+    total = 0
+    for value in range(1000):
+        total += value % 7
+    return total
+
+def run_benchmarks(number=20_000, battles=200, repeat=5):
+    """
+    I run the whole suite and return {"meta": {...}, "results": {name: seconds per call}}.
+    """
+    calibration = _best_time(_calibration_loop, 200, repeat)
+    results = {}
+    user, target = _bench_pair(Warrior)
+    results["micro.attack"] = _best_time(lambda: user.attack(target), number, repeat)
+    results["micro.heal"] = _best_time(lambda: user.heal(10), number, repeat)
+    results["micro.random_bonus"] = _best_time(lambda: user.random_bonus(3, 10), number, repeat)
+    sampler, rng = ability_sampler(Archer, "arrow_rain"), random.Random(0)
+    results["micro.alias_sample"] = _best_time(lambda: sampler.sample(rng), number, repeat)
+    block = BlockRandom(0)
+    results["micro.randint"] = _best_time(lambda: rng.randint(15, 25), number, repeat)
+    results["micro.block_randint"] = _best_time(lambda: block.randint(15, 25), number, repeat)
+    for cls, specs in ABILITY_REGISTRY.items():
+        for spec in specs:
+            user, target = _bench_pair(cls)
+            results[f"ability.{cls.__name__}.{spec.name}"] = _best_time(
+                lambda: spec.use(user, target), number, repeat)
+    for class_name, cls in CLASS_ROSTER.items():
+        # I reseed before every timing so each one plays the same battles.
+        rng = random.Random(0)
+        results[f"battle.{class_name}"] = _best_time(
+            lambda: battle(cls("Hero"), EvilWizard("The Dark Wizard"), random_ability_policy, 200, NULL_SINK, rng),
+            battles, repeat, setup=lambda: rng.seed(0))
+    meta = {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "number": number,
+        "battles": battles,
+        "repeat": repeat,
+        "calibration": min(calibration, _best_time(_calibration_loop, 200, repeat)),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    return {"meta": meta, "results": results}
+
+def compare_benchmarks(baseline, current, threshold=0.10, normalize=True):
+    """
+    I compare two benchmark runs and return rows (name, baseline, current, ratio, status), where
+    status is "regression" when current is more than `threshold` slower, "improvement" when it is
+    more than `threshold` faster, and "ok" otherwise. Benchmarks missing from either run are skipped.
+    With normalize, ratios are divided by the ratio of the two runs' calibration loops.
+    """
+    machine = 1.0
+    if normalize and baseline["meta"].get("calibration") and current["meta"].get("calibration"):
+        machine = current["meta"]["calibration"] / baseline["meta"]["calibration"]
+    rows = []
+    for name in sorted(set(baseline["results"]) & set(current["results"])):
+        before = baseline["results"][name]
+        after = current["results"][name]
+        ratio = after / before / machine if before else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+def print_benchmark_comparison(rows):
+    """
+    I print the rows from compare_benchmarks, times in microseconds.
+    """
+    print(f"{'Benchmark':<40} {'Before us':>10} {'After us':>10} {'Ratio':>7}  Status")
+    for name, before, after, ratio, status in rows:
+        print(f"{name:<40} {before * 1e6:>10.3f} {after * 1e6:>10.3f} {ratio:>7.2f}  {status}")
+
+# -----------------------------
+# Command Line
+# -----------------------------
+def build_parser():
+    """
+    I describe the command line: no arguments starts the interactive game, subcommands run tools.
+    """
+    parser = argparse.ArgumentParser(description="Defeat the Evil Wizard")
+    parser.add_argument("--seed", type=int, help="seed the game's random stream")
+    parser.add_argument("--record", metavar="PATH", help="save the battle (seed and actions) for replay")
+    parser.add_argument("--balance", metavar="PATH", help="load class stats and bonus ranges from a JSON table")
+    parser.add_argument("--effects", action="store_true", help="turn status effects on (curses, fear, shields, ...)")
+    parser.add_argument("--checkpoint", metavar="PATH", help="snapshot the battle to PATH after every round")
+    parser.add_argument("--odds", action="store_true", help="show each ability's damage statistics in the menu")
+    parser.add_argument("--wizard", choices=WIZARD_BRAINS, default="random", help="how the Evil Wizard picks his abilities")
+    parser.add_argument("--ui", choices=UI_MODES, default="auto",
+                        help="draw the battle as frames on a terminal, or print plain scrolling text")
+    commands = parser.add_subparsers(dest="command")
+
+    simulate = commands.add_parser("simulate", help="run headless battles and report per-class statistics")
+    simulate.add_argument("battles", type=int, help="number of battles per class")
+    simulate.add_argument("--classes", nargs="+", choices=list(CLASS_ROSTER), help="classes to simulate (default: all)")
+    simulate.add_argument("--policy", choices=list(POLICIES), default="random")
+    simulate.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    simulate.add_argument("--chunk-size", type=int, help="battles per task sent to a worker")
+    simulate.add_argument("--seed", type=int, default=0)
+    simulate.add_argument("--max-turns", type=int, default=200)
+    simulate.add_argument("--engine", choices=["process", "numpy"], default="process",
+                          help="process pool of scalar battles, or the vectorized NumPy engine")
+    simulate.add_argument("--profile", metavar="PATH", help="profile the run and write the snapshot to PATH")
+    simulate.add_argument("--rng", choices=RNG_KINDS, default="mersenne",
+                          help="random stream per battle: random.Random, or buffered (see BlockRandom)")
+    simulate.add_argument("--start", type=int, default=0, help="number of the first battle (battle i uses seed/i)")
+    simulate.add_argument("--cache", metavar="PATH", nargs="?", const=SIM_CACHE_PATH,
+                          help=f"reuse and keep results in an SQLite cache (default path: {SIM_CACHE_PATH})")
+    simulate.add_argument("--cache-rows", type=int, default=SIM_CACHE_ROWS, help="cached ranges kept before eviction")
+
+    compare = commands.add_parser("compare", help="compare classes' win rates with paired, variance-reduced battles")
+    compare.add_argument("classes", nargs="+", choices=list(CLASS_ROSTER), help="two or more classes")
+    compare.add_argument("--pairs", type=int, default=10_000, help="antithetic battle pairs per class")
+    compare.add_argument("--policy", choices=list(POLICIES), default="random")
+    compare.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    compare.add_argument("--chunk-size", type=int, help="pairs per task sent to a worker")
+    compare.add_argument("--seed", type=int, default=0)
+    compare.add_argument("--max-turns", type=int, default=200)
+    compare.add_argument("--confidence", type=float, default=0.95, help="confidence level of the intervals")
+    compare.add_argument("--output", metavar="PATH", help="write the report to this JSON file")
+
+    solve = commands.add_parser("solve", help="compute the exact win probability of a class under a policy")
+    solve.add_argument("class_name", choices=list(CLASS_ROSTER))
+    solve.add_argument("actions", nargs="*", default=["attack"],
+                       help="actions to mix, e.g. 'smite' or 'attack=1 smite=3' or 'heal:40=1'")
+    solve.add_argument("--tolerance", type=float, default=1e-12)
+    solve.add_argument("--optimal", action="store_true",
+                       help="ignore the actions and solve for optimal play (the table is cached on disk)")
+    solve.add_argument("--cache-dir", default=SOLVER_CACHE_DIR, help="where optimal-play tables are kept")
+
+    tune = commands.add_parser("tune", help="search class stats toward a target win-rate band")
+    tune.add_argument("output", help="write the tuned balance table to this JSON file")
+    tune.add_argument("--band", type=float, nargs=2, default=[0.45, 0.55], metavar=("LOW", "HIGH"))
+    tune.add_argument("--classes", nargs="+", choices=list(CLASS_ROSTER), help="classes to tune (default: all)")
+    tune.add_argument("--policy", choices=list(POLICIES), default="random")
+    tune.add_argument("--candidates", type=int, default=27, help="candidates per class and round")
+    tune.add_argument("--eta", type=int, default=3, help="keep 1/eta of the candidates after each rung")
+    tune.add_argument("--min-battles", type=int, default=200, help="battles per candidate in the first rung")
+    tune.add_argument("--max-battles", type=int, default=5400, help="battles per candidate in the last rung")
+    tune.add_argument("--rounds", type=int, default=2)
+    tune.add_argument("--spread", type=float, default=0.25, help="largest relative change per parameter")
+    tune.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    tune.add_argument("--seed", type=int, default=0)
+
+    memory = commands.add_parser("memory-bench", help="compare fighter memory: objects versus the compact store")
+    memory.add_argument("--count", type=int, default=1_000_000)
+
+    serve = commands.add_parser("serve", help="host many concurrent games over TCP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--idle-timeout", type=float, default=300.0, help="seconds a session may wait for input")
+    serve.add_argument("--max-line", type=int, default=1024, help="longest accepted input line in bytes")
+    serve.add_argument("--max-buffer", type=int, default=64 * 1024, help="unread output a session may hold in bytes")
+    serve.add_argument("--max-turns", type=int, help="end a session's battle as a timeout after this many turns")
+    serve.add_argument("--record-dir", metavar="DIR", help="save every session's battle (seed and actions) for replay")
+
+    loadtest = commands.add_parser("loadtest", help="play many scripted sessions against a server")
+    loadtest.add_argument("--host", default="127.0.0.1")
+    loadtest.add_argument("--port", type=int, help="server port (default: start a server in-process)")
+    loadtest.add_argument("--sessions", type=int, default=1000)
+    loadtest.add_argument("--concurrency", type=int, default=250)
+
+    scripted = commands.add_parser("scripted", help="play scripted keyboard sessions through the interactive game")
+    scripted.add_argument("--sessions", type=int, default=1000)
+    scripted.add_argument("--seed", type=int, default=0, help="master seed for the scripts and game seeds")
+    scripted.add_argument("--mode", choices=SCRIPT_MODES, default="workers",
+                          help="worker processes, this process only, or one interpreter per session")
+    scripted.add_argument("--workers", type=int, help="worker processes or concurrent interpreters (default: CPU count)")
+    scripted.add_argument("--batch-size", type=int, help="sessions per task sent to a worker")
+    scripted.add_argument("--actions", type=int, default=300, help="menu replies per script")
+    scripted.add_argument("--golden", metavar="PATH", help="check output digests against this file (written if missing)")
+    scripted.add_argument("--update", action="store_true", help="rewrite the golden file instead of checking it")
+    scripted.add_argument("--output", metavar="PATH", help="write the full report to this JSON file")
+
+    bench = commands.add_parser("bench", help="run the benchmark suite and write JSON results")
+    bench.add_argument("--output", metavar="PATH", help="write results to this JSON file (default: stdout)")
+    bench.add_argument("--number", type=int, default=20_000, help="calls per micro benchmark timing")
+    bench.add_argument("--battles", type=int, default=200, help="battles per macro benchmark timing")
+    bench.add_argument("--repeat", type=int, default=5, help="timings per benchmark (the best one counts)")
+    bench.add_argument("--compare", metavar="BASELINE", help="compare this run against an earlier JSON file")
+    bench.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    bench.add_argument("--raw", action="store_true", help="do not normalize by the calibration loop")
+
+    bench_compare = commands.add_parser("bench-compare", help="compare two benchmark JSON files")
+    bench_compare.add_argument("baseline")
+    bench_compare.add_argument("current")
+    bench_compare.add_argument("--threshold", type=float, default=0.10)
+    bench_compare.add_argument("--raw", action="store_true", help="do not normalize by the calibration loop")
+
+    resume = commands.add_parser("resume", help="continue battles from a checkpoint file")
+    resume.add_argument("path", help="file written with --checkpoint")
+    resume.add_argument("--battle-id", type=int, default=0, help="battle to continue interactively")
+    resume.add_argument("--policy", choices=list(POLICIES),
+                        help="finish every battle in the file headlessly with this policy instead")
+
+    snapshot_bench = commands.add_parser("snapshot-bench", help="compare battle snapshots with pickle")
+    snapshot_bench.add_argument("--number", type=int, default=10_000)
+
+    tournament = commands.add_parser("tournament", help="play every class against every wizard brain, streaming rows to CSV")
+    tournament.add_argument("output", help="CSV file for the per-battle rows (resumed if it has a progress file)")
+    tournament.add_argument("--seeds", type=int, default=1000, help="battles per class and brain")
+    tournament.add_argument("--wizards", nargs="+", choices=WIZARD_BRAINS, default=list(WIZARD_BRAINS))
+    tournament.add_argument("--policy", choices=list(POLICIES), default="random")
+    tournament.add_argument("--batch-size", type=int, default=1000, help="battles per batch written at once")
+    tournament.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    tournament.add_argument("--seed", type=int, default=0)
+    tournament.add_argument("--max-turns", type=int, default=200)
+    tournament.add_argument("--overwrite", action="store_true",
+                            help="start over when the CSV exists but has no progress file")
+
+    raid = commands.add_parser("raid", help="play a party of heroes against several wizards and their minions")
+    raid.add_argument("--heroes", type=int, default=100, help="party size")
+    raid.add_argument("--wizards", type=int, default=75, help="number of Evil Wizards")
+    raid.add_argument("--classes", nargs="+", choices=list(CLASS_ROSTER), help="classes in the party (default: all)")
+    raid.add_argument("--policy", choices=list(POLICIES), default="random")
+    raid.add_argument("--hero-target", choices=RAID_TARGETS, default="lowest", help="whom the heroes attack")
+    raid.add_argument("--wizard-target", choices=RAID_TARGETS, default="threat", help="whom the wizards and minions attack")
+    raid.add_argument("--max-rounds", type=int, default=500)
+    raid.add_argument("--rng", choices=RNG_KINDS, default="mersenne", help="the raid's random stream")
+    raid.add_argument("--verbose", action="store_true", help="print every event of the raid")
+    raid.add_argument("--bench", action="store_true", help="time raids of growing size instead")
+
+    log = commands.add_parser("log", help="play seeded battles and append their events to a battle log")
+    log.add_argument("path", help="battle log directory (created if needed, appended to otherwise)")
+    log.add_argument("battles", type=int, help="number of battles per class")
+    log.add_argument("--classes", nargs="+", choices=list(CLASS_ROSTER), help="classes to play (default: all)")
+    log.add_argument("--policy", choices=list(POLICIES), default="random")
+    log.add_argument("--seed", type=int, default=0)
+    log.add_argument("--max-turns", type=int, default=200)
+
+    query = commands.add_parser("query", help="find battles in a battle log")
+    query.add_argument("path", help="battle log directory written by the log command")
+    query.add_argument("--class", dest="class_name", choices=list(CLASS_ROSTER))
+    query.add_argument("--outcome", choices=LOG_OUTCOMES)
+    query.add_argument("--ability", help="only battles in which this ability was used")
+    query.add_argument("--min-hits", type=int, default=0, help="... and landed at least this many times")
+    query.add_argument("--max-turns", type=int, help="only battles that lasted at most this many turns")
+    query.add_argument("--show", type=int, default=0, metavar="N", help="print the events of the first N matches")
+
+    analyze_command = commands.add_parser("analyze", help="stream battle events into damage and time-to-kill statistics")
+    analyze_command.add_argument("battles", type=int, nargs="?", help="number of battles per class to simulate")
+    analyze_command.add_argument("--log", metavar="PATH", help="analyze a battle log instead of simulating battles")
+    analyze_command.add_argument("--classes", nargs="+", choices=list(CLASS_ROSTER), help="classes to simulate (default: all)")
+    analyze_command.add_argument("--policy", choices=list(POLICIES), default="random")
+    analyze_command.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    analyze_command.add_argument("--chunk-size", type=int, help="battles per task sent to a worker")
+    analyze_command.add_argument("--seed", type=int, default=0)
+    analyze_command.add_argument("--max-turns", type=int, default=200)
+    analyze_command.add_argument("--every", type=int, default=10_000, help="battles between snapshots of a battle log")
+    analyze_command.add_argument("--output", metavar="PATH", help="rewrite this JSON file with every snapshot")
+    analyze_command.add_argument("--limit", type=int, default=15, help="abilities to print")
+
+    replay_command = commands.add_parser("replay", help="re-run a recorded battle at full speed")
+    replay_command.add_argument("path", help="file written with --record")
+    replay_command.add_argument("--quiet", action="store_true", help="only print the outcome")
+    return parser
+
+INTRO = [
+    "Welcome, brave adventurer!",
+    "In this epic quest, you will choose a hero from an elite roster of champions, each with legendary abilities.",
+    "Your mission is to defeat the powerful Evil Wizard who threatens to plunge the realm into darkness.",
+    "Face challenging battles, master unique skills, and forge your destiny on the battlefield!",
+    "Good luck, and may your hero triumph over evil!\n"
+]
+
+def play_game(seed=None, record_path=None, brain="random", checkpoint_path=None, effects=False, odds=False,
+              ui="auto"):
+    """
+    I run the main game loop.
+    I introduce the adventure, create my hero, and then start the battle against the Evil Wizard.
+    With a seed (or when recording) the battle gets its own random stream so it can be replayed.
+    `brain` names the Evil Wizard's strategy (see WIZARD_BRAINS). With a checkpoint path every
+    round is snapshotted there, and the `resume` command picks the battle up again.
+    `effects` turns status effects on (see Status Effects), and `odds` adds damage statistics to
+    the ability menu. `ui` is one of UI_MODES (see Terminal Renderer).
+    """
+    # Exciting introduction to draw the player in
+    for line in INTRO:
+        print(line)
+    
+    player = create_character()
+    wizard = EvilWizard("The Dark Wizard", wizard_brain(brain))
+    if seed is None and record_path is not None:
+        seed = random.randrange(2 ** 32)
+    checkpoint = Checkpointer(checkpoint_path) if checkpoint_path is not None else None
+    policy = functools.partial(console_policy, odds=True) if odds else None
+    renderer = FrameRenderer(player, wizard) if use_frames(ui) else None
+    if renderer is not None:
+        policy = renderer.policy(odds)
+    try:
+        result = battle(player, wizard, policy, sink=renderer,
+                        rng=random.Random(seed) if seed is not None else None, checkpoint=checkpoint,
+                        effects=StatusEngine() if effects else None)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if renderer is not None:
+            renderer.finish()
+    print("Game Over.")
+    if record_path is not None:
+        save_record(BattleRecord(result.class_name, player.name, seed, result.actions, brain, effects), record_path)
+
+def main(argv=None):
+    """
+    I start the interactive game, or run one of the command line tools when a subcommand is given.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.balance:
+        load_balance(args.balance)
+    if args.command == "simulate":
+        started = time.perf_counter()
+        profile = None
+        if args.engine == "numpy":
+            if args.wizard != "random" or args.effects:
+                parser.error("the numpy engine only plays the classic rules against the random wizard")
+            if args.start or args.cache:
+                parser.error("the numpy engine does not take --start or --cache")
+            summary = {class_name: simulate_vectorized(class_name, args.battles, args.policy, args.seed, args.max_turns)
+                       for class_name in args.classes or CLASS_ROSTER}
+        else:
+            if args.profile:
+                profile = {}
+            with contextlib.ExitStack() as stack:
+                cache = stack.enter_context(SimulationCache(args.cache, args.cache_rows)) if args.cache else None
+                summary = run_simulations(args.battles, args.classes, args.policy, args.workers,
+                                          args.chunk_size, args.seed, args.max_turns, profile, args.wizard,
+                                          args.effects, args.rng, args.start, cache)
+            if profile is not None:
+                write_json(args.profile, profile, indent=2, sort_keys=True)
+        elapsed = time.perf_counter() - started
+        print_simulation_summary(summary)
+        total = sum(stats["battles"] for stats in summary.values())
+        print(f"\n{total} battles in {elapsed:.2f}s ({total / elapsed:,.0f} battles/s)")
+        cached = sum(stats.get("cached", 0) for stats in summary.values())
+        if cached:
+            print(f"{cached} of them came from the cache")
+        if profile is not None:
+            print()
+            print_profile(profile)
+    elif args.command == "compare":
+        started = time.perf_counter()
+        try:
+            report = compare_classes(args.classes, args.pairs, args.policy, args.seed, args.max_turns, args.wizard,
+                                     args.effects, args.workers, args.chunk_size, args.confidence)
+        except ValueError as error:
+            parser.error(str(error))
+        print_comparison(report)
+        print(f"\n{report['battles_per_class'] * len(report['classes'])} battles in "
+              f"{time.perf_counter() - started:.2f}s")
+        if args.output:
+            write_json(args.output, report)
+    elif args.command == "solve" and args.optimal:
+        started = time.perf_counter()
+        solver = optimal_solver(args.class_name, args.cache_dir)
+        elapsed = time.perf_counter() - started
+        state = (solver.player_max, solver.wizard_max, solver.base_attack)
+        lookup = _best_time(lambda: solver.best(*state), 100_000, 3)
+        move = solver.best(*state)
+        print(f"Win probability: {move.win_probability:.6f}")
+        print(f"Expected turns:  {move.expected_turns:.3f}")
+        print(f"Opening move:    {move.action[0]} {move.action[1] or ''}".rstrip())
+        print(f"({solver.size} states, {solver.iterations} sweeps, ready in {elapsed:.1f}s, "
+              f"{lookup * 1e6:.2f} us per lookup)")
+    elif args.command == "solve":
+        policy = {}
+        for token in args.actions:
+            action, _, weight = token.partition("=")
+            if action.startswith("heal:"):
+                action = ("heal", int(action[5:]))
+            policy[action] = float(weight or 1)
+        result = solve_battle(args.class_name, policy, args.tolerance)
+        print(f"Win probability: {result.win_probability:.6f}")
+        print(f"Expected turns:  {result.expected_turns:.3f}")
+        print(f"({result.states} states, {result.iterations} sweeps, residual {result.residual:.1e})")
+    elif args.command == "tune":
+        started = time.perf_counter()
+        table, report = tune_balance(tuple(args.band), args.classes, args.candidates, args.eta, args.min_battles,
+                                     args.max_battles, args.rounds, args.spread, args.workers, args.seed, args.policy)
+        save_balance(args.output, table)
+        print(f"{'Class':<10} {'Health':>6} {'Attack':>6} {'Win %':>7} {'Battles':>8}")
+        for class_name, (win_rate, battles) in report.items():
+            stats = table["classes"][class_name]
+            print(f"{class_name:<10} {stats['health']:>6} {stats['attack_power']:>6} {win_rate * 100:>6.1f}% {battles:>8}")
+        print(f"\nWrote {args.output} in {time.perf_counter() - started:.1f}s")
+    elif args.command == "memory-bench":
+        results = benchmark_memory(args.count)
+        for layout, per_fighter in results.items():
+            print(f"{layout:<16} {per_fighter:8.1f} bytes/fighter {per_fighter * args.count / 2 ** 20:10.1f} MiB")
+    elif args.command == "serve":
+        # The global game flags apply to every session; --seed makes the sessions reproducible.
+        server = GameServer(args.host, args.port, args.idle_timeout, args.max_line, args.max_buffer, seed=args.seed,
+                            brain=args.wizard, effects=args.effects, odds=args.odds, max_turns=args.max_turns,
+                            record_dir=args.record_dir)
+        print(f"Serving Defeat the Evil Wizard on {args.host}:{args.port}")
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(server.serve_forever())
+    elif args.command == "loadtest":
+        report = asyncio.run(load_test(args.host, args.port, args.sessions, args.concurrency))
+        print(f"{report['sessions']} sessions ({report['failures']} failed), {report['turns']} turns "
+              f"in {report['seconds']:.2f}s ({report['turns_per_second']:,.0f} turns/s)")
+        print(f"turn latency p50 {report['p50_ms']:.2f} ms, p99 {report['p99_ms']:.2f} ms, max {report['max_ms']:.2f} ms")
+    elif args.command == "scripted":
+        # The global game flags are passed on to every scripted session.
+        game_args = ["--wizard", args.wizard] + ["--effects"] * args.effects + ["--odds"] * args.odds
+        if args.balance:
+            game_args += ["--balance", args.balance]
+        report = run_script_harness(args.sessions, args.seed, args.mode, args.workers, args.batch_size,
+                                    args.actions, game_args)
+        if args.output:
+            write_json(args.output, report)
+        print(f"{report['sessions']} sessions ({args.mode}), {report['prompts']} prompts in "
+              f"{report['seconds']:.2f}s ({report['sessions_per_second']:,.1f} sessions/s)")
+        for prompt, stats in report["latency_us"].items():
+            print(f"  {prompt or '<no prompt>':<44} {stats['count']:>9}  p50 {stats['p50']:>8.1f} us  "
+                  f"p99 {stats['p99']:>8.1f} us  max {stats['max']:>8} us")
+        if args.golden:
+            try:
+                changed = check_golden(args.golden, report, args.update)
+            except ValueError as error:
+                parser.error(str(error))
+            if changed:
+                print(f"{len(changed)} sessions differ from {args.golden}, first: {changed[:10]}")
+                sys.exit(1)
+            print(f"output matches {args.golden}")
+    elif args.command in ("bench", "bench-compare"):
+        if args.command == "bench":
+            current = run_benchmarks(args.number, args.battles, args.repeat)
+            if args.output:
+                write_json(args.output, current, indent=2, sort_keys=True)
+            elif not args.compare:
+                print(json.dumps(current, indent=2, sort_keys=True))
+            baseline_path = args.compare
+        else:
+            with open(args.current, encoding="utf-8") as file:
+                current = json.load(file)
+            baseline_path = args.baseline
+        if baseline_path:
+            with open(baseline_path, encoding="utf-8") as file:
+                baseline = json.load(file)
+            rows = compare_benchmarks(baseline, current, args.threshold, not args.raw)
+            print_benchmark_comparison(rows)
+            regressions = sum(status == "regression" for *_, status in rows)
+            print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+            if regressions:
+                sys.exit(1)
+    elif args.command == "replay":
+        record = load_record(args.path)
+        result = replay(record, NULL_SINK if args.quiet else CONSOLE_SINK)
+        print(f"\n{record.name} the {record.class_name}: {result.outcome} after {result.turns} turns.")
+    elif args.command == "tournament":
+        started = time.perf_counter()
+        try:
+            totals, done, batches = run_tournament(args.output, args.seeds, args.wizards, args.policy,
+                                                   args.batch_size, args.workers, args.seed, args.max_turns,
+                                                   overwrite=args.overwrite)
+        except (ValueError, FileExistsError) as error:
+            parser.error(str(error))
+        print_tournament(totals, args.wizards)
+        print(f"\n{done}/{batches} batches in {args.output} ({time.perf_counter() - started:.1f}s this run)")
+    elif args.command == "resume":
+        states = load_checkpoints(args.path)
+        if args.policy:
+            outcomes = {}
+            for state in states.values():
+                result = resume_battle(state, POLICIES[args.policy], 200, NULL_SINK)
+                outcomes[result.outcome] = outcomes.get(result.outcome, 0) + 1
+            print(f"Resumed {len(states)} battle(s): " + ", ".join(f"{count} {outcome}" for outcome, count in outcomes.items()))
+        else:
+            if args.battle_id not in states:
+                parser.error(f"no battle {args.battle_id} in {args.path}")
+            state = states[args.battle_id]
+            if state.outcome is not None:
+                print(f"Battle {args.battle_id} is already over: {state.outcome} after turn {state.turn}.")
+                return
+            print(f"Resuming {state.player.name} the {type(state.player).__name__} after turn {state.turn}.")
+            state.player.display_stats()
+            state.wizard.display_stats()
+            with Checkpointer(args.path, args.battle_id) as checkpoint:
+                resume_battle(state, checkpoint=checkpoint)
+            print("Game Over.")
+    elif args.command == "raid":
+        if args.bench:
+            for size, per_action in benchmark_raid().items():
+                print(f"{size:>7} heroes  {per_action:6.2f} us/action")
+            return
+        started = time.perf_counter()
+        result = run_raid(args.heroes, args.wizards, args.classes, args.policy, args.hero_target, args.wizard_target,
+                          args.wizard, args.seed, args.max_rounds, CONSOLE_SINK if args.verbose else None, args.effects,
+                          args.rng)
+        elapsed = time.perf_counter() - started
+        print(f"Raid {result.outcome} after {result.rounds} rounds: {result.heroes_left}/{args.heroes} heroes and "
+              f"{result.enemies_left} enemies left, {result.minions_summoned} minions summoned.")
+        print(f"Damage dealt {result.damage_dealt}, taken {result.damage_taken}; {result.actions} actions in "
+              f"{elapsed:.2f}s ({result.actions / elapsed:,.0f} actions/s)")
+    elif args.command == "log":
+        started = time.perf_counter()
+        battles, events = log_battles(args.path, args.battles, args.classes, args.policy, args.seed, args.max_turns,
+                                      args.wizard)
+        elapsed = time.perf_counter() - started
+        print(f"Logged {battles} battles ({events} events) to {args.path} in {elapsed:.2f}s "
+              f"({events / elapsed:,.0f} events/s)")
+    elif args.command == "query":
+        started = time.perf_counter()
+        with BattleLogReader(args.path) as reader:
+            matches = 0
+            for battle_record in reader.find(args.class_name, args.outcome, args.ability, args.max_turns, args.min_hits):
+                matches += 1
+                if matches <= args.show:
+                    print(f"Battle {battle_record.battle}: {battle_record.class_name} {battle_record.outcome} "
+                          f"after {battle_record.turns} turns")
+                    for event in reader.events(battle_record):
+                        print(f"  turn {event.turn:>3} {'wizard' if event.side else 'hero':<6} {event.kind:<14} "
+                              f"{event.ability or '':<20} {event.amount:>4}  hp {event.health}/{event.target_health}")
+            print(f"{matches} of {len(reader)} battles match ({time.perf_counter() - started:.3f}s)")
+    elif args.command == "analyze":
+        if args.log:
+            snapshots = analyze(logged_battles(args.log), args.every)
+        elif args.battles:
+            snapshots = analyze_simulations(args.battles, args.classes, args.policy, args.workers, args.chunk_size,
+                                            args.seed, args.max_turns, args.wizard)
+        else:
+            parser.error("give a number of battles to simulate or --log PATH")
+        started = time.perf_counter()
+        snapshot = None
+        for snapshot in snapshots:
+            if args.output:
+                write_json(args.output, snapshot)
+        elapsed = time.perf_counter() - started
+        if snapshot is None or not snapshot["battles"]:
+            print("No battles to analyze.")
+            return
+        print_analytics(snapshot, args.limit)
+        print(f"\n{snapshot['battles']} battles, {snapshot['events']} events in {elapsed:.2f}s "
+              f"({snapshot['events'] / elapsed:,.0f} events/s)")
+    elif args.command == "snapshot-bench":
+        for layout, (size, save, restore) in benchmark_snapshots(args.number).items():
+            print(f"{layout:<9} {size:>6} bytes  save {save:7.2f} us  restore {restore:7.2f} us")
+    else:
+        play_game(args.seed, args.record, args.wizard, args.checkpoint, args.effects, args.odds, args.ui)
 
 if __name__ == "__main__":
     main()
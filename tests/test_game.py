@@ -0,0 +1,1081 @@
+import asyncio
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import sys
+from fractions import Fraction
+
+import pytest
+
+GAME_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Defeat the Evil Wizard.py")
+_spec = importlib.util.spec_from_file_location("evil_wizard", GAME_PATH)
+game = importlib.util.module_from_spec(_spec)
+# Worker processes unpickle functions by module name, so the module has to be findable.
+sys.modules["evil_wizard"] = game
+_spec.loader.exec_module(game)
+
+
+class ListSink(game.EventSink):
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+class FixedRandom(random.Random):
+    """A stream whose random() always returns the same value."""
+
+    def __init__(self, value):
+        super().__init__(0)
+        self.value = value
+
+    def random(self):
+        return self.value
+
+
+def _cast(engine, wizard, player, ability):
+    engine.trigger(game.ABILITY_LOOKUP[game.EvilWizard][ability], wizard, player, None)
+
+
+# -----------------------------
+# Batch simulator
+# -----------------------------
+def test_simulations_are_reproducible_however_they_are_split():
+    serial = game.run_simulations(300, ["Cleric", "Ranger"], workers=1, seed=11)
+    assert game.run_simulations(300, ["Cleric", "Ranger"], workers=1, seed=11) == serial
+    assert game.run_simulations(300, ["Cleric", "Ranger"], workers=2, chunk_size=37, seed=11) == serial
+    assert game.run_simulations(300, ["Cleric", "Ranger"], workers=1, seed=12) != serial
+
+
+def test_simulation_totals_add_up_the_individual_battles():
+    results = [game.battle(game.Paladin("Hero"), game.EvilWizard("The Dark Wizard"), game.random_ability_policy, 30,
+                           game.NULL_SINK, game.spawn_rng(6, index)) for index in range(120)]
+    summary = game.run_simulations(120, ["Paladin"], workers=1, chunk_size=50, seed=6, max_turns=30)["Paladin"]
+    assert summary["battles"] == 120
+    assert summary["wins"] == sum(result.outcome == "victory" for result in results)
+    assert summary["timeouts"] == sum(result.outcome == "timeout" for result in results)
+    assert summary["turns"] == sum(result.turns for result in results)
+    assert summary["damage_dealt"] == sum(result.damage_dealt for result in results)
+    assert summary["win_rate"] == summary["wins"] / 120
+
+
+@pytest.mark.parametrize("options", [{"classes": ["Necromancer"]}, {"policy": "telepathy"}, {"wizard": "psychic"}])
+def test_simulations_reject_unknown_names(options):
+    with pytest.raises(ValueError):
+        game.run_simulations(10, workers=1, **options)
+
+
+# -----------------------------
+# Vectorized engine
+# -----------------------------
+def test_vectorized_engine_matches_the_interactive_rules():
+    pytest.importorskip("numpy")
+    report = game.compare_engines("Cleric", 20_000, "attack", seed=5)
+    assert abs(report["win_rate_z"]) < 4
+    assert abs(report["avg_turns_z"]) < 4
+
+
+def test_vectorized_engine_is_reproducible_per_seed():
+    pytest.importorskip("numpy")
+    first = game.simulate_vectorized("Rogue", 2000, seed=9, batch_size=300)
+    assert game.simulate_vectorized("Rogue", 2000, seed=9, batch_size=300) == first
+    assert first["battles"] == sum(first["turn_histogram"]) == 2000
+    assert first["wins"] + first["timeouts"] <= first["battles"]
+
+
+def test_vectorized_engine_needs_numpy(monkeypatch):
+    monkeypatch.setattr(game, "np", None)
+    with pytest.raises(RuntimeError, match="NumPy"):
+        game.simulate_vectorized("Rogue", 10)
+
+
+# -----------------------------
+# Event sinks
+# -----------------------------
+def test_disabled_sinks_never_see_an_event(monkeypatch):
+    class Disabled(ListSink):
+        enabled = False
+
+    def refuse(*fields):
+        raise AssertionError("an Event was built for a disabled sink")
+
+    monkeypatch.setattr(game, "Event", refuse)
+    sink = Disabled()
+    player, wizard = game.Archer("Hero"), game.EvilWizard("The Dark Wizard")
+    game.battle(player, wizard, game.random_ability_policy, 200, sink, random.Random(1))
+    assert sink.events == []
+
+
+def test_console_sink_prints_the_classic_text():
+    stream = io.StringIO()
+    sink = game.ConsoleSink(stream)
+    player, wizard = game.Warrior("Hero"), game.EvilWizard("The Dark Wizard")
+    player.sink = wizard.sink = sink
+    player.rng = random.Random(3)
+    damage = player.attack(wizard)
+    player.health = 100
+    player.heal(15)
+    player.heal(0)
+    player.display_stats()
+    wizard.regenerate()
+    wizard.health = 1
+    final = player.attack(wizard)
+    assert stream.getvalue().splitlines() == [
+        f"Hero attacks The Dark Wizard for {damage} damage!",
+        "Hero heals for 15. Current health: 115/140",
+        "Heal amount must be positive.",
+        "Hero's Stats - Health: 115/140, Attack Power: 25",
+        f"The Dark Wizard regenerates 5 health! (Health: {150 - damage + 5}/150)",
+        f"Hero attacks The Dark Wizard for {final} damage!",
+        "The Dark Wizard has been defeated!"
+    ]
+
+
+def test_jsonl_sink_buffers_until_full_or_flushed(tmp_path):
+    path = tmp_path / "events.jsonl"
+    with game.JsonlSink(str(path), buffer_size=3) as sink:
+        player = game.Cleric("Hero")
+        player.sink = sink
+        player.health = 50
+        for _ in range(2):
+            player.heal(5)
+        assert path.read_text() == ""
+        player.heal(5)
+        assert len(path.read_text().splitlines()) == 3
+        player.heal(5)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 4
+    assert lines[-1] == {"kind": "heal", "actor": "Hero", "target": None, "ability": None, "amount": 5, "health": 70,
+                         "max_health": 120, "target_health": 65}
+
+
+# -----------------------------
+# Seeded streams and replays
+# -----------------------------
+def test_spawned_streams_are_fixed_per_index_and_distinct():
+    first = [game.spawn_rng(3, index).random() for index in range(5)]
+    assert [game.spawn_rng(3, index).random() for index in range(5)] == first
+    assert len(set(first)) == 5
+    assert game.spawn_rng(4, 0).random() != first[0]
+
+
+def test_replay_round_trip(tmp_path):
+    # The choices come from their own stream, as a player's would, so the battle stream only rolls dice.
+    choices = random.Random(7)
+    policy = lambda player, wizard: ("ability", choices.choice(game.SPECIAL_ABILITIES[game.Bard]))
+    result = game.battle(game.Bard("Bo"), game.EvilWizard("The Dark Wizard"), policy, 200, game.NULL_SINK,
+                         random.Random(42))
+    path = str(tmp_path / "battle.json")
+    game.save_record(game.BattleRecord("Bard", "Bo", 42, result.actions), path)
+    assert game.replay(game.load_record(path)) == result
+
+
+def test_replay_refuses_a_truncated_record():
+    result = game.battle(game.Monk("Hero"), game.EvilWizard("The Dark Wizard"), game.attack_policy, 200,
+                         game.NULL_SINK, random.Random(5))
+    with pytest.raises(ValueError, match="ran out"):
+        game.replay(game.BattleRecord("Monk", "Hero", 5, result.actions[:-1]))
+
+
+# -----------------------------
+# Ability registry
+# -----------------------------
+# The ability menus as the original getattr dispatch listed them.
+ORIGINAL_MENUS = {
+    "Archer": ["quick_shot", "evade", "precision_strike", "rapid_fire", "piercing_arrow", "arrow_rain"],
+    "Paladin": ["holy_strike", "divine_shield", "sacred_aura", "smite_evil", "blessing", "righteous_charge"],
+    "Barbarian": ["berserk", "war_cry", "rage", "smash", "intimidate", "ground_slam"],
+    "Bard": ["inspire", "distract", "serenade", "charm", "rally", "echo_voice"],
+    "Cleric": ["smite", "heal_self", "divine_intervention", "sanctify", "exorcise", "bless"],
+    "Druid": ["nature_call", "wild_shape", "entangle", "rejuvenate", "earth_shock", "storm_brew"],
+    "Fighter": ["power_attack", "shield_bash", "parry", "riposte", "charge", "fortify"],
+    "Monk": ["flurry", "meditative_strike", "swift_kick", "focus", "inner_peace", "acrobatic_dodge"],
+    "Ranger": ["rapid_fire", "aim_shot", "track", "camouflage", "double_strike", "natures_favor"],
+    "Rogue": ["backstab", "stealth", "disarm_trap", "evade", "critical_strike", "quick_escape"],
+    "Sorcerer": ["arcane_blast", "fireball", "lightning_bolt", "frost_nova", "mana_surge", "mystic_shield"],
+    "Warlock": ["eldritch_blast", "dark_pact", "curse", "summon_familiar", "soul_drain", "infernal_power"],
+    "Wizard": ["magic_missile", "teleport", "shield_spell", "polymorph", "time_warp", "arcane_explosion"]
+}
+
+
+@pytest.mark.parametrize("class_name", list(game.CLASS_ROSTER))
+def test_every_ability_resolves_and_runs(class_name):
+    cls = game.CLASS_ROSTER[class_name]
+    assert game.SPECIAL_ABILITIES.get(game.ability_owner(cls), []) == ORIGINAL_MENUS.get(class_name, [])
+    for spec in game.ABILITY_REGISTRY.get(cls, ()):
+        assert spec.arity in (0, 1)
+        assert spec.label == spec.name.replace("_", " ").title()
+        player, wizard = cls("Hero"), game.EvilWizard("The Dark Wizard")
+        player.sink = wizard.sink = game.NULL_SINK
+        player.rng = random.Random(0)
+        game.use_special_ability(player, wizard, spec.name)
+    if class_name in ORIGINAL_MENUS:
+        assert game.ability_menu(cls) == tuple(f"{index}. {name.replace('_', ' ').title()}"
+                                               for index, name in enumerate(ORIGINAL_MENUS[class_name], 1))
+
+
+def test_subclasses_fight_with_their_parent_class_abilities():
+    class Assassin(game.Rogue):
+        __slots__ = ()
+
+    assert game.ability_owner(Assassin) is game.Rogue
+    assert game.ability_owner(type("Squire", (game.Warrior,), {"__slots__": ()})) is None
+    result = game.battle(Assassin("Vex"), game.EvilWizard("The Dark Wizard"), game.random_ability_policy, 200,
+                         game.NULL_SINK, random.Random(2))
+    assert {argument for _, argument in result.actions} <= set(ORIGINAL_MENUS["Rogue"])
+    written = []
+    dialog = game.ability_dialog(Assassin("Vex"), lambda text="": written.append(text))
+    next(dialog)
+    with pytest.raises(StopIteration) as finished:
+        dialog.send("1")
+    assert finished.value.value == "backstab"
+    assert "1. Backstab" in written
+
+
+# -----------------------------
+# Exact solver
+# -----------------------------
+def test_exact_solver_agrees_with_monte_carlo():
+    exact = game.solve_battle("Rogue", "attack", tolerance=1e-9)
+    battles = 4000
+    simulated = game.run_simulations(battles, ["Rogue"], "attack", workers=1, seed=2)["Rogue"]
+    error = (exact.win_probability * (1 - exact.win_probability) / battles) ** 0.5
+    assert abs(simulated["win_rate"] - exact.win_probability) < 4 * error
+    assert abs(simulated["avg_turns"] - exact.expected_turns) < 0.5
+
+
+def test_exact_solver_converges_to_a_probability():
+    result = game.solve_battle("Wizard", "attack", tolerance=1e-10)
+    assert result.residual < 1e-10
+    assert -1e-9 < result.win_probability < 1 + 1e-9
+    assert result.expected_turns >= 1
+    with pytest.raises(KeyError):
+        game.solve_battle("Necromancer")
+
+
+# -----------------------------
+# Combatant store
+# -----------------------------
+@pytest.mark.parametrize("cls", [*game.CLASS_ROSTER.values(), game.EvilWizard, game.Minion])
+def test_characters_have_no_instance_dict(cls):
+    assert "__slots__" in vars(cls)
+    assert not hasattr(cls("Hero"), "__dict__")
+
+
+def test_combatant_store_tracks_object_battles():
+    store = game.CombatantStore()
+    ids = [store.add(cls, f"Hero {index}") for index, cls in enumerate(game.CLASS_ROSTER.values())]
+    finished = []
+    for fighter_id in ids:
+        player = store.load(fighter_id)
+        game.battle(player, game.EvilWizard("The Dark Wizard"), game.random_ability_policy, 6, game.NULL_SINK,
+                    game.spawn_rng(1, fighter_id))
+        store.save(fighter_id, player)
+        finished.append(player)
+    assert list(store.health) == [player.health for player in finished]
+    assert list(store.attack_power) == [player.attack_power for player in finished]
+    for fighter_id, player in zip(ids, finished):
+        again = store.load(fighter_id)
+        assert (type(again), again.name, again.health, again.max_health) == \
+            (type(player), player.name, player.health, player.max_health)
+    paladin = store.load(ids[list(game.CLASS_ROSTER).index("Paladin")])
+    paladin.divine_shield_active = True
+    assert store.load(store.add_character(paladin)).divine_shield_active
+
+
+# -----------------------------
+# Game server
+# -----------------------------
+async def _play_session(port, replies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for reply in replies:
+        writer.write(reply.encode() + b"\n")
+    output = await reader.read()
+    writer.close()
+    return output.decode()
+
+
+def _serve(server, client):
+    async def run():
+        await server.start()
+        try:
+            return await client(server.port)
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_server_plays_a_recorded_session_to_the_end(tmp_path):
+    server = game.GameServer(port=0, seed=4, brain="greedy", effects=True, max_turns=40, record_dir=str(tmp_path))
+    output = _serve(server, lambda port: _play_session(port, ["10", "Vex"] + ["2", "1", "1"] * 40))
+    assert output.startswith(game.INTRO[0])
+    assert output.rstrip().endswith("Game Over.")
+    record = game.load_record(str(tmp_path / "session-0.json"))
+    assert (record.class_name, record.name, record.seed, record.wizard, record.effects) == \
+        ("Monk", "Vex", "4/0", "greedy", True)
+    replayed = io.StringIO()
+    assert game.replay(record, game.ConsoleSink(replayed)).turns <= 40
+    # The replay prints the same battle the player saw, without the menus and prompts in between.
+    lines = iter(output.splitlines())
+    assert all(any(seen.endswith(line) for seen in lines) for line in replayed.getvalue().splitlines())
+    assert server.finished_sessions == 1 and server.active_sessions == 0
+
+
+def test_server_closes_idle_and_oversized_sessions():
+    async def idle(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        output = await reader.read()
+        writer.close()
+        return output.decode()
+
+    assert _serve(game.GameServer(port=0, idle_timeout=0.2), idle).rstrip().endswith("Session timed out.")
+    output = _serve(game.GameServer(port=0, max_line=64), lambda port: _play_session(port, ["x" * 500]))
+    assert "Enter your character's name" not in output
+
+
+def test_load_test_finishes_every_session():
+    report = asyncio.run(game.load_test(sessions=6, concurrency=3))
+    assert report["failures"] == 0
+    assert report["turns"] >= 6
+
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+def _bench_run(calibration, **results):
+    return {"meta": {"calibration": calibration}, "results": results}
+
+
+def test_benchmark_comparison_classifies_by_threshold():
+    baseline = _bench_run(1.0, fast=1.0, same=1.0, slow=1.0, gone=1.0, new_zero=0.0)
+    current = _bench_run(1.0, fast=0.85, same=1.05, slow=1.2, added=5.0, new_zero=1.0)
+    rows = {name: (ratio, status) for name, _, _, ratio, status in game.compare_benchmarks(baseline, current)}
+    assert set(rows) == {"fast", "same", "slow", "new_zero"}
+    assert [rows[name][1] for name in ("fast", "same", "slow")] == ["improvement", "ok", "regression"]
+    assert rows["new_zero"] == (float("inf"), "regression")
+    assert game.compare_benchmarks(baseline, current, threshold=0.25)[2][4] == "ok"
+
+
+def test_benchmark_comparison_normalizes_by_calibration():
+    baseline, current = _bench_run(1.0, battle=2.0), _bench_run(2.0, battle=4.0)
+    assert game.compare_benchmarks(baseline, current)[0][3:] == (1.0, "ok")
+    assert game.compare_benchmarks(baseline, current, normalize=False)[0][3:] == (2.0, "regression")
+    assert game.compare_benchmarks(_bench_run(None, battle=2.0), current)[0][3:] == (2.0, "regression")
+
+
+def test_benchmark_suite_times_every_ability_and_class():
+    report = game.run_benchmarks(number=3, battles=1, repeat=1)
+    results = report["results"]
+    assert all(value > 0 for value in results.values())
+    assert {f"battle.{name}" for name in game.CLASS_ROSTER} <= set(results)
+    assert {f"ability.{cls.__name__}.{spec.name}" for cls, specs in game.ABILITY_REGISTRY.items() for spec in specs} \
+        <= set(results)
+    assert report["meta"]["calibration"] > 0
+
+
+# -----------------------------
+# Balance tuning
+# -----------------------------
+@pytest.fixture
+def restore_balance():
+    saved = game.balance_table()
+    yield saved
+    game.load_balance(saved)
+
+
+def test_balance_tables_round_trip_through_a_file(tmp_path, restore_balance):
+    table = game.balance_table()
+    table["classes"]["Rogue"] = {"health": 111, "attack_power": 7}
+    table["abilities"]["Rogue"]["backstab"] = [1, 2]
+    path = str(tmp_path / "balance.json")
+    game.save_balance(path, table)
+    game.load_balance(path)
+    assert game.balance_table() == table
+    rogue = game.Rogue("Hero")
+    assert (rogue.health, rogue.attack_power) == (111, 7)
+    assert game.ABILITY_LOOKUP[game.Rogue]["backstab"].bonus == (1, 2)
+    game.load_balance(restore_balance)
+    assert game.balance_table() == restore_balance
+
+
+@pytest.mark.parametrize("table", [{"classes": {"Necromancer": {"health": 1, "attack_power": 1}}},
+                                   {"abilities": {"Rogue": {"fireball": [1, 2]}}},
+                                   {"abilities": {"Rogue": {"backstab": [5, 2]}}}])
+def test_bad_balance_tables_are_refused(table, restore_balance):
+    with pytest.raises(ValueError):
+        game.load_balance(table)
+
+
+def test_evaluating_a_candidate_restores_the_balance(restore_balance):
+    candidate = {"classes": {"Rogue": {"health": 999, "attack_power": 99}}, "abilities": {"Rogue": {}}}
+    key, wins, battles = game._evaluate_candidate((("Rogue", 1), candidate, "Rogue", 0, 20, "random", 0, 200))
+    assert (key, wins, battles) == (("Rogue", 1), 20, 20)
+    assert game.balance_table() == restore_balance
+
+
+def test_tuning_is_seeded_and_leaves_the_balance_alone(restore_balance):
+    options = dict(classes=["Rogue", "Wizard"], candidates=3, min_battles=20, max_battles=60, rounds=1, workers=1,
+                   seed=3)
+    table, report = game.tune_balance(**options)
+    assert game.balance_table() == restore_balance
+    assert game.tune_balance(**options) == (table, report)
+    assert set(report) == {"Rogue", "Wizard"}
+    assert all(0 <= win_rate <= 1 and battles in (20, 60) for win_rate, battles in report.values())
+
+
+def test_tuning_workers_see_a_loaded_balance(restore_balance):
+    table = game.balance_table()
+    table["classes"]["Rogue"] = {"health": 60, "attack_power": 12}
+    game.load_balance(table)
+    options = dict(classes=["Rogue"], candidates=3, min_battles=20, max_battles=60, rounds=1, seed=1)
+    assert game.tune_balance(workers=2, **options) == game.tune_balance(workers=1, **options)
+
+
+# -----------------------------
+# Wizard brains
+# -----------------------------
+@pytest.mark.parametrize("name", ["greedy", "lookahead"])
+def test_wizard_brains_always_pick_a_wizard_ability(name):
+    brain = game.wizard_brain(name)
+    assert max(brain.table) < len(game.WIZARD_ABILITIES)
+    wizard = game.EvilWizard("The Dark Wizard", brain)
+    for cls in game.CLASS_ROSTER.values():
+        player = cls("Hero")
+        for wizard.health in range(1, wizard.max_health + 1, 7):
+            for player.health in range(1, player.max_health + 1, 7):
+                assert brain.choose(wizard, player) in game.WIZARD_ABILITIES
+        # A hero on their last hit point is finished off, not healed against.
+        player.health = 1
+        assert brain.choose(wizard, player).effect == "strike"
+
+
+def test_random_wizard_picks_like_the_original_game():
+    original = ["summon_minions", "dark_curse", "shadow_strike", "fear_induction", "arcane_barrier", "chaos_blast"]
+    assert [spec.name for spec in game.WIZARD_ABILITIES] == original
+    assert game.wizard_brain("random") is None
+    sink = ListSink()
+    player, wizard = game.Fighter("Hero"), game.EvilWizard("The Dark Wizard")
+    player.health = player.max_health = wizard.health = wizard.max_health = 10 ** 6
+    player.sink = wizard.sink = sink
+    player.rng = wizard.rng = random.Random(8)
+    expected = random.Random(8)
+    for _ in range(30):
+        game.play_round(player, wizard, "pass")
+        # Each round draws the ability first and then rolls its dice from the same stream.
+        used = [event.ability for event in sink.events if event.kind == "ability_used"]
+        assert used[-1] == original[expected.randrange(len(original))]
+        expected.setstate(wizard.rng.getstate())
+
+
+def test_unknown_brains_are_refused():
+    with pytest.raises(ValueError):
+        game.WizardBrain("psychic")
+
+
+# -----------------------------
+# Raids
+# -----------------------------
+def test_raid_side_picks_match_a_full_scan():
+    rng = random.Random(4)
+    units = [game.Minion(f"Minion {index}") for index in range(40)]
+    side = game.RaidSide(units)
+    threat = {unit: unit.attack_power for unit in units}
+    for _ in range(3000):
+        unit = rng.choice(units)
+        if unit not in side.position:
+            continue
+        if rng.random() < 0.5:
+            unit.health = max(0, unit.health - rng.randint(0, 8))
+            side.update(unit)
+        else:
+            amount = rng.randint(0, 5)
+            side.add_threat(unit, amount)
+            threat[unit] += amount
+        alive = [unit for unit in units if unit.health > 0]
+        assert sorted(map(id, side.alive)) == sorted(map(id, alive))
+        if alive:
+            assert side.pick("lowest", rng).health == min(unit.health for unit in alive)
+            assert threat[side.pick("threat", rng)] == max(threat[unit] for unit in alive)
+            assert side.pick("random", rng) in alive
+    assert len(side.health_heap) <= 2 * len(side) + 65
+
+
+def test_heroes_attack_the_weakest_enemy():
+    checked = []
+
+    def policy(hero, target):
+        checked.append(target.health == min(enemy.health for enemy in raid.enemies.alive))
+        return "attack", None
+
+    raid = game.Raid(game.raid_party(12), [game.EvilWizard(f"Evil Wizard {index}") for index in range(3)], policy,
+                     rng=random.Random(1))
+    raid.play(30)
+    assert checked and all(checked)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_raids_cap_minions_and_count_survivors(seed, monkeypatch):
+    monkeypatch.setitem(game.CLASS_STATS, "Minion", {"health": 400, "attack_power": 5})
+    wizards = [game.EvilWizard(f"Evil Wizard {index}") for index in range(3)]
+    for wizard in wizards:
+        wizard.health = wizard.max_health = 2000
+    heroes = game.raid_party(4)
+    for hero in heroes:
+        hero.health = hero.max_health = 3000
+    raid = game.Raid(heroes, wizards, wizard_target="threat", rng=random.Random(seed))
+    peak = 0
+    for rounds in range(1, 200):
+        result = raid.play(rounds)
+        minions = [unit for unit in raid.enemies.alive if isinstance(unit, game.Minion)]
+        for wizard in wizards:
+            living = sum(minion.master is wizard for minion in minions)
+            assert living == raid.minions.get(wizard, 0) <= game.MINION_LIMIT
+            peak = max(peak, living)
+        if result.outcome != "timeout":
+            break
+    assert result.heroes_left == sum(hero.health > 0 for hero in heroes)
+    assert result.enemies_left == len(raid.enemies.alive)
+    assert (result.outcome == "victory") == (result.enemies_left == 0)
+    assert (result.outcome == "defeat") == (result.heroes_left == 0)
+    assert result.minions_summoned >= len(minions)
+    assert peak == game.MINION_LIMIT
+
+
+# -----------------------------
+# Battle log
+# -----------------------------
+def test_recorder_tells_sides_apart_by_identity_and_counts_battle_turns():
+    recorder = game.EventRecorder()
+    for seed in range(50):
+        player, wizard = game.Monk("The Dark Wizard"), game.EvilWizard("The Dark Wizard")
+        recorder.begin_battle(player, wizard)
+        result = game.battle(player, wizard, game.random_ability_policy, 200, rng=random.Random(seed),
+                             effects=game.StatusEngine())
+        recorder.end_battle(result)
+        assert {event.side for event in recorder.events if event.kind == "regen"} == {1}
+        assert {event.side for event in recorder.events if event.kind == "turn_lost"} <= {0}
+        assert all(event.side == 0 for event in recorder.events if event.ability in game.SPECIAL_ABILITIES[game.Monk])
+        assert recorder.events[-1].turn == result.turns
+        assert [event.turn for event in recorder.events] == sorted(event.turn for event in recorder.events)
+
+
+def test_battle_log_indexes_agree_with_a_full_scan(tmp_path):
+    path = str(tmp_path / "log")
+    battles, events = game.log_battles(path, 30, ["Rogue", "Cleric"], seed=8)
+    with game.BattleLogReader(path) as reader:
+        assert (len(reader), sum(1 for _ in reader.scan(block_events=100))) == (battles, events)
+        landed = {}
+        for event in reader.scan(block_events=100):
+            if event.kind == "attack" and event.ability == "shadow_strike" and event.amount > 0:
+                landed[event.battle] = landed.get(event.battle, 0) + 1
+        for outcome in (None, "defeat"):
+            expected = [battle_id for battle_id in range(len(reader)) if landed.get(battle_id, 0) >= 2
+                        and reader.battle(battle_id).class_name == "Rogue"
+                        and outcome in (None, reader.battle(battle_id).outcome)]
+            found = reader.find("Rogue", outcome, "shadow_strike", min_hits=2)
+            assert [battle.battle for battle in found] == expected
+            assert expected
+
+
+def test_battle_log_keeps_long_battles_and_large_health(tmp_path):
+    path = str(tmp_path / "log")
+    with game.BattleLog(path) as log:
+        player, wizard = game.Warrior("Hero"), game.EvilWizard("The Dark Wizard")
+        player.health = player.max_health = wizard.health = wizard.max_health = 10 ** 9
+        log.begin_battle(player, wizard)
+        result = game.battle(player, wizard, lambda player, wizard: ("attack", None), 65_600, rng=random.Random(0))
+        log.end_battle(result)
+    with game.BattleLogReader(path) as reader:
+        assert reader.battle(0).turns == 65_600
+        events = reader.events(0)
+    assert events[-1].turn == 65_600
+    assert [event.turn for event in events] == sorted(event.turn for event in events)
+    assert min(event.health for event in events) > 10 ** 8
+    assert events[-1].health == player.health or events[-1].health == wizard.health
+
+
+# -----------------------------
+# Analytics
+# -----------------------------
+def test_heal_efficiency_uses_the_health_before_each_heal():
+    player, wizard = game.Cleric("Hero"), game.EvilWizard("The Dark Wizard")
+    recorder = game.EventRecorder()
+    recorder.begin_battle(player, wizard)
+    player.health = 30
+    player.heal(10)
+    player.health -= 7  # lost without an event, as to a Dark Pact
+    player.heal(200)
+    recorder.end_battle(game.BattleResult("Cleric", "defeat", 1, 0, 0, []))
+    analytics = game.BattleAnalytics()
+    analytics.add(game.LogBattle(0, "Cleric", "defeat", 1, 0, len(recorder.events)), recorder.events)
+    stats = analytics.classes["Cleric"]
+    assert (stats["heal_requested"], stats["heal_effective"]) == (210, 10 + player.max_health - 33)
+
+
+def test_analyzing_an_empty_log_reports_no_battles(tmp_path, capsys, monkeypatch):
+    path = str(tmp_path / "log")
+    game.log_battles(path, 0)
+    monkeypatch.setattr(sys, "argv", ["game", "analyze", "--log", path])
+    game.main()
+    assert "No battles" in capsys.readouterr().out
+
+
+# -----------------------------
+# Status effects
+# -----------------------------
+def test_fear_can_cost_the_next_turn():
+    engine = game.StatusEngine()
+    player, wizard = game.Monk("Hero"), game.EvilWizard("The Dark Wizard")
+    player.sink = wizard.sink = game.NULL_SINK
+    player.rng = FixedRandom(0.0)
+    _cast(engine, wizard, player, "fear_induction")
+    engine.tick()
+    assert engine.loses_turn(player)
+    engine.tick()
+    assert not engine.has(player, "feared")
+
+
+def test_curse_weakens_two_player_attacks():
+    engine = game.StatusEngine()
+    player, wizard = game.Warrior("Hero"), game.EvilWizard("The Dark Wizard")
+    player.sink = wizard.sink = game.NULL_SINK
+    _cast(engine, wizard, player, "dark_curse")
+    engine.tick()
+    assert engine.adjust_attack(player, wizard, 20) == 15
+    engine.tick()
+    assert engine.adjust_attack(player, wizard, 20) == 15
+    engine.tick()
+    assert engine.adjust_attack(player, wizard, 20) == 20
+
+
+def test_seeded_battles_with_effects_lose_turns_to_fear():
+    sink = ListSink()
+    for seed in range(100):
+        game.battle(game.Monk("Hero"), game.EvilWizard("The Dark Wizard"), game.random_ability_policy, 200, sink,
+                    random.Random(seed), effects=game.StatusEngine())
+    assert any(event.kind == "turn_lost" for event in sink.events)
+
+
+# -----------------------------
+# Profiling
+# -----------------------------
+def test_profiling_does_not_change_results_and_merges_exactly():
+    profile = {}
+    plain = game.run_simulations(200, ["Monk"], workers=1, seed=3)
+    profiled = game.run_simulations(200, ["Monk"], workers=1, seed=3, profile=profile)
+    assert profiled == plain
+    profiler = game.Profiler()
+    for seed in range(200):
+        game.battle(game.Monk("Hero"), game.EvilWizard("The Dark Wizard"), game.random_ability_policy, 200,
+                    game.NULL_SINK, game.spawn_rng(3, seed), profiler=profiler)
+    halves = game.merge_snapshots(profiler.snapshot(), game.Profiler().snapshot())
+    for key, stats in profile["actions"].items():
+        assert stats["calls"] == halves["actions"][key]["calls"]
+        assert stats["damage_histogram"]["counts"] == halves["actions"][key]["damage_histogram"]["counts"]
+
+
+# -----------------------------
+# Snapshots and checkpoints
+# -----------------------------
+@pytest.mark.parametrize("effects", [False, True])
+def test_resuming_any_snapshot_finishes_the_battle_the_same_way(effects):
+    for seed in range(20):
+        records = []
+
+        def checkpoint(player, wizard, turn, damage_dealt, damage_taken, outcome=None):
+            records.append(game.snapshot_battle(player, wizard, turn, damage_dealt, damage_taken, outcome=outcome))
+
+        expected = game.battle(game.Monk("Hero"), game.EvilWizard("The Dark Wizard"), game.random_ability_policy,
+                               200, game.NULL_SINK, random.Random(seed), checkpoint,
+                               effects=game.StatusEngine() if effects else None)
+        *rounds, final = records
+        assert game.restore_battle(final).outcome == expected.outcome
+        for record in rounds:
+            state = game.restore_battle(record)
+            assert game.snapshot_battle(state.player, state.wizard, state.turn, state.damage_dealt,
+                                        state.damage_taken) == record
+            resumed = game.resume_battle(state, game.random_ability_policy, 200, game.NULL_SINK)
+            assert resumed[:5] == expected[:5]
+
+
+def test_checkpoint_file_marks_finished_battles(tmp_path):
+    path = tmp_path / "game.bin"
+    with game.Checkpointer(path) as checkpoint:
+        expected = game.battle(game.Cleric("Hero"), game.EvilWizard("The Dark Wizard"), game.random_ability_policy,
+                               200, game.NULL_SINK, random.Random(1), checkpoint)
+    state = game.load_checkpoints(path)[0]
+    assert state.outcome == expected.outcome
+    assert game.resume_battle(state, game.attack_policy)[:5] == expected[:5]
+
+
+# -----------------------------
+# Optimal-play cache
+# -----------------------------
+def test_corrupt_solver_cache_is_solved_again(tmp_path, monkeypatch):
+    # Solving takes seconds; an unsolved table is enough to exercise the cache.
+    monkeypatch.setattr(game.OptimalSolver, "solve", lambda self: self)
+    monkeypatch.setattr(game, "_OPTIMAL_SOLVERS", {})
+    path = tmp_path / f"Rogue-{game.balance_fingerprint('Rogue')}.bin"
+    game.OptimalSolver("Rogue").save(str(path))
+    complete = path.read_bytes()
+    path.write_bytes(complete[:len(complete) // 2])
+    game.optimal_solver("Rogue", str(tmp_path))
+    assert path.read_bytes() == complete
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+# -----------------------------
+# Tournaments
+# -----------------------------
+def test_tournament_does_not_wipe_a_csv_without_progress(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(b"precious,data\r\n")
+    with pytest.raises(FileExistsError):
+        game.run_tournament(str(path), 2, ["random"], workers=1)
+    assert path.read_bytes() == b"precious,data\r\n"
+    totals, done, batches = game.run_tournament(str(path), 2, ["random"], workers=1, overwrite=True)
+    assert done == batches
+    assert sum(stats["battles"] for stats in totals.values()) == 2 * len(game.CLASS_ROSTER)
+
+
+# -----------------------------
+# Damage distributions
+# -----------------------------
+class PathRandom(random.Random):
+    """A stream whose randint() calls follow a given path of results, then take their lowest value."""
+
+    def __init__(self, path):
+        super().__init__(0)
+        self.path = path
+        self.calls = []
+
+    def randint(self, low, high):
+        value = self.path[len(self.calls)] if len(self.calls) < len(self.path) else low
+        self.calls.append((low, high, value))
+        return value
+
+
+def _enumerate_damage(cls, ability, attack_power):
+    """Play the ability once along every possible sequence of rolls and add up the reported damage."""
+    weights = {}
+    path = []
+    while True:
+        player, wizard = cls("Hero"), game.EvilWizard("The Dark Wizard")
+        player.attack_power = attack_power
+        player.sink, wizard.sink = ListSink(), game.NULL_SINK
+        player.rng = PathRandom(path)
+        if ability == "attack":
+            result = player.attack(wizard)
+        else:
+            result = game.ABILITY_LOOKUP[cls][ability].use(player, wizard)
+        damage = result if any(event.kind == "attack" for event in player.sink.events) else 0
+        chance = Fraction(1)
+        for low, high, _ in player.rng.calls:
+            chance /= high - low + 1
+        weights[damage] = weights.get(damage, 0) + chance
+        calls = player.rng.calls
+        while calls and calls[-1][2] == calls[-1][1]:
+            calls = calls[:-1]
+        if not calls:
+            return weights
+        path = [value for _, _, value in calls[:-1]] + [calls[-1][2] + 1]
+
+
+@pytest.mark.parametrize("attack_power", [3, 12])
+def test_ability_damage_pmfs_match_enumerating_every_roll(attack_power):
+    for cls, specs in game.ABILITY_REGISTRY.items():
+        if cls is game.EvilWizard:
+            continue
+        for ability in ["attack"] + [spec.name for spec in specs]:
+            pmf = game.ability_damage_pmf(cls, ability, attack_power)
+            assert sum(probability for _, probability in pmf) == pytest.approx(1.0)
+            expected = _enumerate_damage(cls, ability, attack_power)
+            assert [damage for damage, _ in pmf] == sorted(expected)
+            assert [probability for _, probability in pmf] == \
+                pytest.approx([float(expected[damage]) for damage, _ in pmf], abs=1e-12)
+
+
+@pytest.mark.parametrize("sampler, pmf", [
+    (lambda: game.ability_sampler(game.Archer, "quick_shot", 12), lambda: game.ability_damage_pmf(game.Archer, "quick_shot", 12)),
+    (lambda: game.ability_sampler(game.Barbarian, "berserk", 12), lambda: game.ability_damage_pmf(game.Barbarian, "berserk", 12)),
+    (lambda: game.ability_sampler(game.Fighter, "parry", 12), lambda: game.ability_damage_pmf(game.Fighter, "parry", 12)),
+    (lambda: game.attack_offset_sampler(3), lambda: game.attack_damage_pmf(5, 3)),
+])
+def test_alias_tables_sample_their_distribution(sampler, pmf):
+    table, expected = sampler(), dict(pmf())
+    rng = random.Random(5)
+    draws = 200_000
+    counts = {}
+    for _ in range(draws):
+        value = table.sample(rng)
+        counts[value] = counts.get(value, 0) + 1
+    assert set(counts) <= set(expected)
+    for value, probability in expected.items():
+        assert abs(counts.get(value, 0) / draws - probability) <= 5 * (probability * (1 - probability) / draws) ** 0.5 + 1e-9
+
+
+# -----------------------------
+# Block random streams
+# -----------------------------
+class SweepRandom(random.Random):
+    """A source whose randbytes() returns every byte value once and whose getrandbits() returns given words."""
+
+    def __init__(self, words=()):
+        super().__init__(0)
+        self.words = list(words)
+
+    def randbytes(self, count):
+        return bytes(range(256))
+
+    def getrandbits(self, bits):
+        return sum(word << (32 * index) for index, word in enumerate(self.words))
+
+
+def _chi_square(counts, draws):
+    expected = draws / len(counts)
+    return sum((count - expected) ** 2 / expected for count in counts)
+
+
+@pytest.mark.parametrize("width", [1, 3, 6, 7, 100, 255, 256])
+def test_byte_translation_drops_the_biased_tail(width):
+    rng = game.BlockRandom(0)
+    rng.source = SweepRandom()
+    offsets = rng._draw(width, 256)
+    limit = 256 - 256 % width
+    assert len(offsets) == limit
+    assert [offsets.count(offset) for offset in range(width)] == [limit // width] * width
+
+
+def test_word_multiplication_rejects_below_the_threshold():
+    width = 1000
+    threshold = (1 << 32) % width
+    # 12884902 * 1000 lands 112 past a multiple of 2**32, inside the biased band, so it is dropped.
+    words = [0, 1, 12884901, 12884902, (1 << 31) + 17, (1 << 32) - 1]
+    rng = game.BlockRandom(0)
+    rng.source = SweepRandom(words)
+    expected = [word * width >> 32 for word in words if (word * width) & 0xFFFFFFFF >= threshold]
+    assert rng._draw(width, len(words)) == expected == [0, 2, 500, 999]
+
+
+@pytest.mark.parametrize("low, high", [(5, 5), (0, 2), (15, 25), (-3, 252), (0, 255), (1, 300), (-500, 499),
+                                       (0, 1 << 33)])
+def test_block_random_stays_in_range(low, high):
+    rng = game.BlockRandom(3)
+    draws = [rng.randint(low, high) for _ in range(5000)]
+    assert low <= min(draws) and max(draws) <= high
+    if high - low < 300:
+        assert {low, high} <= set(draws)
+    assert all(low <= rng.randrange(low, high + 1) <= high for _ in range(100))
+    with pytest.raises(ValueError):
+        rng.randint(high, low - 1)
+
+
+@pytest.mark.parametrize("width", [6, 300])
+def test_block_random_is_uniform_on_odd_widths(width):
+    rng = game.BlockRandom(21)
+    draws = 60 * width
+    counts = [0] * width
+    for _ in range(draws):
+        counts[rng.randint(0, width - 1)] += 1
+    # Well above the 99.99th percentile of chi-square with width - 1 degrees of freedom.
+    assert _chi_square(counts, draws) < width - 1 + 8 * (2 * (width - 1)) ** 0.5
+
+
+def _mixed_draws(rng):
+    return [(rng.randint(0, 5), rng.randint(1, 300), rng.choice("abc"), rng.random()) for _ in range(500)]
+
+
+@pytest.mark.parametrize("kind", ["block", "numpy"])
+def test_block_streams_are_determined_by_their_seed(kind):
+    if kind == "numpy":
+        pytest.importorskip("numpy")
+    first = _mixed_draws(game.make_rng("seed", kind))
+    assert _mixed_draws(game.make_rng("seed", kind)) == first
+    assert _mixed_draws(game.make_rng("other", kind)) != first
+    rng = game.make_rng("seed", kind)
+    _mixed_draws(rng)
+    state = rng.getstate()
+    later = _mixed_draws(rng)
+    rng.setstate(state)
+    assert _mixed_draws(rng) == later
+    rng.seed("seed")
+    assert _mixed_draws(rng) == first
+
+
+def test_numpy_block_random_stays_in_range_and_is_uniform():
+    pytest.importorskip("numpy")
+    rng = game.NumpyBlockRandom(4)
+    counts = [0] * 300
+    for _ in range(18_000):
+        counts[rng.randint(-150, 149) + 150] += 1
+    assert all(counts)
+    assert _chi_square(counts, 18_000) < 299 + 8 * (2 * 299) ** 0.5
+    assert all(0.0 <= rng.random() < 1.0 for _ in range(1000))
+
+
+# -----------------------------
+# Script harness
+# -----------------------------
+@pytest.mark.parametrize("game_args", [(), ("--effects",)])
+def test_inprocess_and_exec_sessions_print_the_same_output(game_args):
+    inprocess = game.run_script_harness(4, seed=3, mode="inprocess", actions=40, game_args=game_args)
+    executed = game.run_script_harness(4, seed=3, mode="exec", workers=2, actions=40, game_args=game_args)
+    assert inprocess["digests"] == executed["digests"]
+    assert len(set(inprocess["digests"])) == 4
+    assert game.run_script_harness(4, seed=4, mode="inprocess", actions=40, game_args=game_args)["digests"] != \
+        inprocess["digests"]
+
+
+def test_golden_digests_report_changed_sessions(tmp_path):
+    path = str(tmp_path / "golden.json")
+    report = game.run_script_harness(5, seed=2, mode="inprocess", actions=30)
+    assert game.check_golden(path, report) == []
+    assert game.check_golden(path, report) == []
+    changed = dict(report, digests=list(report["digests"]))
+    changed["digests"][1] = changed["digests"][3] = "0" * 64
+    assert game.check_golden(path, changed) == [1, 3]
+    assert game.check_golden(path, dict(changed, digests=changed["digests"][:2])) == [1]
+    assert game.check_golden(path, changed, update=True) == []
+    assert game.check_golden(path, changed) == []
+    assert game.check_golden(path, report) == [1, 3]
+
+
+@pytest.mark.parametrize("key, value", [("seed", 9), ("actions", 31), ("game_args", ["--effects"]),
+                                        ("version", -1)])
+def test_golden_digests_refuse_a_different_configuration(tmp_path, key, value):
+    path = str(tmp_path / "golden.json")
+    report = game.run_script_harness(2, seed=2, mode="inprocess", actions=30)
+    game.check_golden(path, report)
+    with pytest.raises(ValueError):
+        game.check_golden(path, dict(report, **{key: value}))
+    assert game.check_golden(path, report) == []
+
+
+# -----------------------------
+# Simulation cache
+# -----------------------------
+def test_simulation_cache_reuses_ranges_exactly(tmp_path):
+    expected = game.run_simulations(400, ["Druid"], workers=1, seed=4)
+    with game.SimulationCache(str(tmp_path / "cache.sqlite")) as cache:
+        game.run_simulations(150, ["Druid"], workers=1, seed=4, cache=cache)
+        first = game.run_simulations(400, ["Druid"], workers=1, seed=4, cache=cache)
+        again = game.run_simulations(400, ["Druid"], workers=1, seed=4, cache=cache)
+    assert first["Druid"]["cached"] == 150
+    assert again["Druid"]["cached"] == 400
+    for summary in (first, again):
+        assert {key: value for key, value in summary["Druid"].items() if key != "cached"} == \
+            {key: value for key, value in expected["Druid"].items() if key != "cached"}
+
+
+def test_simulation_cache_misses_after_a_stat_change(tmp_path, monkeypatch):
+    with game.SimulationCache(str(tmp_path / "cache.sqlite")) as cache:
+        game.run_simulations(50, ["Druid"], workers=1, cache=cache)
+        monkeypatch.setitem(game.CLASS_STATS, "Druid", {"health": 999, "attack_power": 1})
+        assert game.run_simulations(50, ["Druid"], workers=1, cache=cache)["Druid"]["cached"] == 0
+
+
+# -----------------------------
+# Terminal renderer
+# -----------------------------
+def _frames_at(monkeypatch, columns, lines):
+    monkeypatch.setattr(game.shutil, "get_terminal_size", lambda *args, **kwargs: os.terminal_size((columns, lines)))
+
+
+def _renderer_after_a_fight(monkeypatch, hits=20):
+    player, wizard = game.Barbarian("Hero"), game.EvilWizard("The Dark Wizard")
+    stream = io.StringIO()
+    renderer = game.FrameRenderer(player, wizard, stream)
+    player.sink = wizard.sink = renderer
+    player.rng = wizard.rng = random.Random(2)
+    for _ in range(hits):
+        player.attack(wizard)
+    return renderer, stream
+
+
+def _play_ability_turn(monkeypatch, renderer):
+    replies = iter(["2", "1"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(replies))
+    return renderer.run_dialog(game.turn_dialog(renderer.player, renderer.write, True))
+
+
+def test_frames_fit_a_24_row_terminal_at_the_ability_prompt(monkeypatch):
+    _frames_at(monkeypatch, 80, 24)
+    renderer, stream = _renderer_after_a_fight(monkeypatch)
+    assert _play_ability_turn(monkeypatch, renderer) == ("ability", "berserk")
+    output = stream.getvalue()
+    rows = [int(row) for row in re.findall(r"\x1b\[(\d+);1H", output)]
+    assert rows and max(rows) <= 24
+    # The log gave up rows to the ability menu, so the frame fills the screen exactly.
+    assert renderer.height == 24
+    assert list(renderer.log)[-1] in renderer.shown
+    assert any("Choose a special ability" in line for line in renderer.shown)
+
+
+def test_frames_show_the_whole_log_on_a_tall_terminal(monkeypatch):
+    _frames_at(monkeypatch, 80, 60)
+    renderer, stream = _renderer_after_a_fight(monkeypatch)
+    _play_ability_turn(monkeypatch, renderer)
+    assert renderer.shown[5:5 + game.FRAME_LOG_LINES] == list(renderer.log)[-game.FRAME_LOG_LINES:]
+
+
+def test_frames_fall_back_to_plain_text_and_redraw_after_a_resize(monkeypatch):
+    _frames_at(monkeypatch, 80, 24)
+    renderer, stream = _renderer_after_a_fight(monkeypatch)
+    renderer.draw()
+    _frames_at(monkeypatch, 60, 12)
+    stream.seek(0)
+    stream.truncate()
+    _play_ability_turn(monkeypatch, renderer)
+    plain = stream.getvalue()
+    assert "\x1b[" not in plain
+    assert plain.count("2. Use Special Ability") == 1
+    assert "Choose a special ability:" in plain
+    renderer.player.attack(renderer.wizard)
+    _frames_at(monkeypatch, 100, 30)
+    stream.seek(0)
+    stream.truncate()
+    renderer.draw()
+    framed = stream.getvalue()
+    assert framed.startswith("\x1b[H\x1b[2J")
+    assert max(int(row) for row in re.findall(r"\x1b\[(\d+);1H", framed)) <= 30
+    assert renderer.columns == 99
+
+
+# -----------------------------
+# Class comparisons
+# -----------------------------
+@pytest.mark.parametrize("seed", [0, "hero/7", 12345])
+def test_antithetic_streams_mirror_every_draw(seed):
+    plain, mirrored = random.Random(seed), game.AntitheticRandom(seed)
+    sequence = "abcdefg"
+    for _ in range(2000):
+        assert plain.randint(15, 25) + mirrored.randint(15, 25) == 40
+        assert plain.randint(0, 1000) + mirrored.randint(0, 1000) == 1000
+        assert sequence.index(plain.choice(sequence)) + sequence.index(mirrored.choice(sequence)) == len(sequence) - 1
+        assert plain.randrange(3, 9) + mirrored.randrange(3, 9) == 11
+        u, v = plain.random(), mirrored.random()
+        assert 0.0 <= v < 1.0
+        assert u + v == pytest.approx(1.0) if u else v == 0.0
+        assert plain.uniform(2.0, 5.0) + mirrored.uniform(2.0, 5.0) == pytest.approx(7.0)
+
+
+def test_class_comparisons_are_determined_by_their_seed():
+    report = game.compare_classes(["Rogue", "Cleric", "Druid"], 60, seed=3, workers=1, chunk_size=25)
+    assert game.compare_classes(["Rogue", "Cleric", "Druid"], 60, seed=3, workers=1, chunk_size=7) == report
+    assert game.compare_classes(["Rogue", "Cleric", "Druid"], 60, seed=3, workers=2, chunk_size=13) == report
+    assert game.compare_classes(["Rogue", "Cleric", "Druid"], 60, seed=4, workers=1) != report
+    assert report["battles_per_class"] == 120
+    assert [(comparison["first"], comparison["second"]) for comparison in report["comparisons"]] == \
+        [("Rogue", "Cleric"), ("Rogue", "Druid"), ("Cleric", "Druid")]
+    for stats in report["classes"].values():
+        assert stats["low"] <= stats["win_rate"] <= stats["high"]
+
+
+@pytest.mark.parametrize("classes", [[], ["Rogue"], ["Rogue", "Rogue"], ["Rogue", "Necromancer"]])
+def test_class_comparisons_need_two_known_classes(classes):
+    with pytest.raises(ValueError):
+        game.compare_classes(classes, 10, workers=1)